@@ -5,20 +5,16 @@ import pytz
 import numpy as np
 from datetime import datetime, time, timedelta
 import time as time_module
-from streamlit_autorefresh import st_autorefresh
-from nsepython import get_bhavcopy as nse_get_bhavcopy
-import nselib
-from config import DB_CONFIG
+from config import validate_config
 
 # Import shared trading engine functions for Supabase connectivity
 # NOTE: This is a READ-ONLY dashboard - no trading actions are performed here
 # All trading is done by autonomous_trader.py
 from trading_engine import (
-    get_db_connection, get_open_trades, get_trades_by_date,
-    get_pnl_history, get_cumulative_pnl, now_ist, is_market_hours,
-    is_market_open, get_current_price, last_two_trading_days,
-    get_watchlist_from_db
+    now_ist, is_market_hours, is_market_open, trade_history_cursor, TRADE_HISTORY_PAGE_SIZE
 )
+# DB reads go through the shared, version-keyed cache
+import dashboard_data as data
 
 # Use shared constants
 IST = pytz.timezone("Asia/Kolkata")
@@ -26,7 +22,7 @@ MARKET_OPEN_HOUR = 9
 MARKET_OPEN_MINUTE = 15
 MARKET_CLOSE_HOUR = 15
 MARKET_CLOSE_MINUTE = 15
-REFRESH_SECONDS = 30  # Changed to seconds for more granular control
+REFRESH_SECONDS = 10  # Live panels only; static panels follow data versions
 
 
 # Use shared constants from trading_engine
@@ -50,16 +46,6 @@ def is_market_hours() -> bool:
 def ensure_session_state():
     if "watchlist" not in st.session_state:
         st.session_state.watchlist = pd.DataFrame()
-    if "positions" not in st.session_state:
-        # Initialize positions with proper columns even if empty
-        positions = get_open_trades()
-        if positions.empty:
-            positions = pd.DataFrame(columns=[
-                "id", "SYMBOL", "entry_price", "qty", "max_profit_pct",
-                "is_open", "exit_reason", "entry_time", "exit_time",
-                "exit_price", "pnl_pct", "current_price", "pnl_abs"
-            ])
-        st.session_state.positions = positions
     if "last_filter_date" not in st.session_state:
         st.session_state.last_filter_date = None
     if "initial_margin" not in st.session_state:
@@ -71,23 +57,45 @@ def is_market_open(now: datetime) -> bool:
 	end = now.replace(hour=MARKET_CLOSE_HOUR, minute=MARKET_CLOSE_MINUTE, second=0, microsecond=0)
 	return start <= now <= end
 
-# get_current_price is imported from trading_engine.py
+# Current prices come from the marks the trader publishes - the dashboard makes no quote calls
 
 # ============================================================================
 # READ-ONLY VIEWER FUNCTIONS
 # All trading actions are performed by autonomous_trader.py
 # ============================================================================
 
+def load_positions(versions: dict) -> None:
+    """Load open positions (shared cache, refreshed when the trades table changes)"""
+    positions = data.open_trades(versions["trades"])
+    if positions.empty:
+        # Initialize positions with proper columns even if empty
+        positions = pd.DataFrame(columns=[
+            "id", "SYMBOL", "entry_price", "qty", "max_profit_pct",
+            "is_open", "exit_reason", "entry_time", "exit_time",
+            "exit_price", "pnl_pct", "current_price", "pnl_abs", "strategy"
+        ])
+    st.session_state.positions = positions
+
+
 def update_positions_display() -> None:
-    """Update position display with current prices and P&L (read-only)."""
+    """Update position display with the trader's latest marks (read-only)."""
     positions = st.session_state.positions
     if positions.empty:
         return
     
+    try:
+        marks = data.live_marks().set_index("id")
+    except Exception as e:
+        st.warning(f"Live prices unavailable: {e}")
+        marks = pd.DataFrame(columns=["current_price", "max_profit_pct", "marked_at"])
+    if not marks.empty:
+        st.caption(f"Prices as of {pd.to_datetime(marks['marked_at']).max():%H:%M:%S} (published by autonomous_trader.py)")
+    
     rows = []
     for _, pos in positions.iterrows():
-        # Get current price for display purposes only
-        current_price = get_current_price(pos["SYMBOL"]) if pos["is_open"] else pos.get("exit_price")
+        mark = marks.loc[pos["id"]] if pos["is_open"] and pos["id"] in marks.index else None
+        current_price = pos.get("exit_price") if not pos["is_open"] else (
+            float(mark["current_price"]) if mark is not None else np.nan)
         
         # Create a copy of the position dictionary
         pos_dict = pos.to_dict()
@@ -112,7 +120,7 @@ def update_positions_display() -> None:
         # Calculate PnL for display
         pnl_abs = (current_price - pos["entry_price"]) * pos["qty"]
         pnl_pct = (current_price - pos["entry_price"]) / pos["entry_price"] * 100.0
-        max_profit_pct = pos.get("max_profit_pct", 0.0)
+        max_profit_pct = float(mark["max_profit_pct"])
         
         # Update position with current values (display only)
         pos_dict.update({
@@ -131,16 +139,15 @@ def update_positions_display() -> None:
 # CACHED DATA FUNCTIONS
 # ============================================================================
 
-def get_daily_watchlist_display():
+def get_daily_watchlist_display(versions: dict):
     """
     Fetch watchlist from database (populated by autonomous_trader.py)
     """
     try:
-        watchlist = get_watchlist_from_db()
+        watchlist = data.watchlist(versions["watchlist"])
         
         # Calculate dates for display only
-        trade_date_last = last_two_trading_days(datetime.now().date())
-        trade_date_previous = last_two_trading_days(trade_date_last)
+        trade_date_last, trade_date_previous = data.trading_days(now_ist().date())
         
         return watchlist, trade_date_last, trade_date_previous
     except Exception as e:
@@ -148,83 +155,14 @@ def get_daily_watchlist_display():
         return pd.DataFrame(), None, None
 
 
-def main():
-    
-    # init_db() - Removed to prevent potential interference, DB should be initialized by autonomous_trader.py or manually
-    st.set_page_config(page_title="NSE Momentum Screener - Monitoring Dashboard", layout="wide")
-    ensure_session_state()
-    
-    # Auto-refresh only during market hours
-    if is_market_hours():
-        st_autorefresh(interval=REFRESH_SECONDS * 1000, key="autorefresh")
-    else:
-        st.info("🕒 Market is closed. Auto-refresh is disabled outside market hours (9:15 AM - 3:30 PM IST).")
-    
-    
-    st.title("📊 Day Trader - Monitoring Dashboard")
-    st.caption("**READ-ONLY VIEWER** - Displaying trades executed by autonomous_trader.py on Railway.app")
-    st.info("ℹ️ This dashboard only displays data. All trading actions are performed by the autonomous bot running on Railway.", icon="ℹ️")
-    
+def live_panels(current_cash: float, cumulative_pnl: float) -> None:
+    """Market status, today's P&L and positions - the only panels that change intraday"""
+    versions = data.data_versions()
+    # A changed table means the static panels are stale too - rerun the whole page once
+    if static_versions(versions) != st.session_state.get("static_versions"):
+        st.rerun()
+    load_positions(versions)
     now = now_ist()
-    st.sidebar.subheader("Controls")
-    
-    # Total Available Margin input
-    total_margin = st.sidebar.number_input(
-        "Total Available Margin (₹)", 
-        min_value=10000, 
-        max_value=10000000, 
-        value=int(st.session_state.initial_margin), 
-        step=10000,
-        help="Your total trading capital"
-    )
-    
-    # Update initial margin if changed
-    if total_margin != st.session_state.initial_margin:
-        st.session_state.initial_margin = total_margin
-    
-    capital_per_trade = st.sidebar.number_input("Capital per trade (₹)", min_value=1000, max_value=1000000, value=10000, step=1000)
-    
-    # Display Entry Rules
-    st.sidebar.subheader("Entry Rules")
-    st.sidebar.info(
-        "✓ Time: After 9:20 AM only\n\n"
-        "✓ Price: Entry > 1.01 * Prev Close\n\n"
-        "(No entries in first 5 mins)"
-    )
-    
-    # Calculate and display current cash in hand
-    cumulative_pnl = float(get_cumulative_pnl())
-    current_cash = st.session_state.initial_margin + cumulative_pnl
-    
-    st.sidebar.subheader("Account Summary")
-    st.sidebar.metric("Initial Margin", f"₹{st.session_state.initial_margin:,.2f}")
-    st.sidebar.metric("Cumulative P&L", f"₹{cumulative_pnl:,.2f}", delta=f"₹{cumulative_pnl:,.2f}")
-    st.sidebar.metric("Current Cash in Hand", f"₹{current_cash:,.2f}", delta=None)
-    
-    # Removed the refresh slider as we're using a fixed 30-second refresh
- 
-    # Get cached watchlist
-    today_str = now.strftime("%Y-%m-%d")
-    
-    with st.spinner("Checking watchlist..."):
-        data_filtered, trade_date_last, trade_date_previous = get_daily_watchlist_display()
-        if not data_filtered.empty:
-            st.toast(f"Loaded {len(data_filtered)} candidates from DB", icon="✅")
-        else:
-            st.toast("No candidates found in DB", icon="⚠️")
-    
-    st.write(f"Prev day: {trade_date_previous} | Last day: {trade_date_last} | Now: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-    
-    if not data_filtered.empty:
-        st.subheader("Filtered candidates")
-        # Display available columns from database
-        st.dataframe(data_filtered[['SYMBOL', 'CLOSE_PRICE_last', 'CLOSE_PRICE_previous', 'price_change_pct', 'volume_ratio']])
-        
-        st.session_state.watchlist = data_filtered[["SYMBOL", "CLOSE_PRICE_last", "HIGH_PRICE_last"]].copy()
-    else:
-        st.info("No candidates met the criteria today.")
-        
-   
     
     # Show market status (read-only info)
     entry_start_time = now.replace(hour=9, minute=20, second=0, microsecond=0)
@@ -244,13 +182,7 @@ def main():
     today_date = now.strftime("%Y-%m-%d")
     
     # Get today's P&L from Supabase
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT total_pnl FROM daily_pnl WHERE date = %s", (today_date,))
-    result = cursor.fetchone()
-    today_pnl = float(result[0]) if result else 0.0
-    cursor.close()
-    conn.close()
+    today_pnl = data.daily_pnl(today_date, versions["daily_pnl"])
     
     # Calculate unrealized P&L from open positions
     unrealized_pnl = 0.0
@@ -281,9 +213,9 @@ def main():
         display_cols = [
             "SYMBOL", "entry_price", "current_price", "qty", 
             "pnl_abs", "pnl_pct", "max_profit_pct", "is_open", 
-            "exit_reason", "entry_time", "exit_time"
+            "exit_reason", "entry_time", "exit_time", "strategy"
         ]
-        display_positions = positions[display_cols].copy()
+        display_positions = positions[[col for col in display_cols if col in positions.columns]].copy()
         
         # Format numeric columns
         display_positions["entry_price"] = display_positions["entry_price"].round(2)
@@ -304,110 +236,202 @@ def main():
             "is_open": "Open?",
             "exit_reason": "Exit Reason",
             "entry_time": "Entry Time",
-            "exit_time": "Exit Time"
+            "exit_time": "Exit Time",
+            "strategy": "Strategy"
         })
 
         st.dataframe(display_positions, use_container_width=True)
     else:
         st.write("No positions yet.")
-        
 
+
+def static_versions(versions: dict) -> tuple:
+    """Versions of the tables behind the panels outside the live fragment"""
+    return versions["trades"], versions["watchlist"], versions["daily_pnl"]
+
+
+@st.fragment
+def display_trade_history(versions: dict) -> None:
+    """Closed trades over a date range, filtered and summarised in SQL, one keyset page at a time"""
+    st.subheader("Historical Trades")
     
-	 # Display P&L Summary
-    st.subheader("P&L Summary")
-    pnl_history = get_pnl_history()
-    if not pnl_history.empty:
-    # Weekly Summary
-        st.write("#### Weekly P&L")
-        pnl_history["week"] = pnl_history["date"].dt.to_period("W")
-        weekly_pnl = pnl_history.groupby("week")["total_pnl"].sum().reset_index()
-        weekly_pnl["week"] = weekly_pnl["week"].astype(str)
-        st.dataframe(weekly_pnl, use_container_width=True)
-
-        # Monthly Summary
-        st.write("#### Monthly P&L")
-        pnl_history["month"] = pnl_history["date"].dt.to_period("M")
-        monthly_pnl = pnl_history.groupby("month")["total_pnl"].sum().reset_index()
-        monthly_pnl["month"] = monthly_pnl["month"].astype(str)
-        st.dataframe(monthly_pnl, use_container_width=True)
-
-        # Yearly Summary
-        st.write("#### Yearly P&L")
-        pnl_history["year"] = pnl_history["date"].dt.to_period("Y")
-        yearly_pnl = pnl_history.groupby("year")["total_pnl"].sum().reset_index()
-        yearly_pnl["year"] = yearly_pnl["year"].astype(str)
-        st.dataframe(yearly_pnl, use_container_width=True)
-    else:
-        st.write("No P&L history available.")
+    today = now_ist().date()
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        selected_range = st.date_input(
+            "Date range",
+            value=(today - timedelta(days=30), today),
+            max_value=today,
+            key="trade_history_range"
+        )
+    with col2:
+        symbol = st.text_input("Symbol", key="trade_history_symbol").strip().upper()
+    with col3:
+        exit_reason = st.selectbox("Exit reason", ["All"] + data.exit_reasons(versions["trades"]),
+                                   key="trade_history_reason")
     
-    # Historical Trades by Date Section
-    st.subheader("Historical Trades")
-    st.write("Select a date to view all trades closed on that day:")
-    
-    # Date picker
-    selected_date = st.date_input(
-        "Select Date",
-        value=datetime.now(IST).date(),
-        max_value=datetime.now(IST).date(),
-        key="trade_history_date"
+    # The range picker returns a single date while the second end is being chosen
+    if len(selected_range) != 2:
+        st.info("Select an end date")
+        return
+    start_date, end_date = selected_range
+    exit_reason = None if exit_reason == "All" else exit_reason
+    
+    # Page cursors restart whenever a filter or the underlying trades change
+    filters = (start_date, end_date, symbol, exit_reason, versions["trades"])
+    if st.session_state.get("trade_history_filters") != filters:
+        st.session_state.trade_history_filters = filters
+        st.session_state.trade_history_cursors = [None]
+    cursors = st.session_state.trade_history_cursors
+    
+    summary = data.trade_history_summary(start_date, end_date, symbol, exit_reason, versions["trades"])
+    if not summary["trades"]:
+        st.info(f"No closed trades found from {start_date} to {end_date}")
+        return
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Total Trades", summary["trades"])
+    with col2:
+        st.metric("Winning", summary["winners"], delta=None)
+    with col3:
+        st.metric("Losing", summary["losers"], delta=None)
+    with col4:
+        st.metric("Win Rate", f"{summary['win_rate']:.1f}%")
+    with col5:
+        st.metric("Total P&L", f"₹{summary['total_profit']:.2f}")
+    
+    page = data.trade_history_page(start_date, end_date, symbol, exit_reason, cursors[-1], versions["trades"])
+    next_cursor = trade_history_cursor(page)
+    
+    # Format and display trades
+    display_trades = page.drop(columns=["id"])
+    for column in ("entry_price", "exit_price", "pnl_pct", "profit_abs", "max_profit_pct"):
+        display_trades[column] = display_trades[column].astype(float).round(2)
+    display_trades = display_trades.rename(columns={
+        "SYMBOL": "Symbol",
+        "entry_price": "Entry Price",
+        "exit_price": "Exit Price",
+        "qty": "Quantity",
+        "pnl_pct": "P&L %",
+        "max_profit_pct": "Max PnL %",
+        "profit_abs": "Profit (₹)",
+        "exit_reason": "Exit Reason",
+        "entry_time": "Entry Time",
+        "exit_time": "Exit Time",
+        "strategy": "Strategy"
+    })
+    st.dataframe(display_trades, use_container_width=True, hide_index=True)
+    
+    first_row = (len(cursors) - 1) * TRADE_HISTORY_PAGE_SIZE + 1
+    st.caption(f"Trades {first_row}-{first_row + len(page) - 1} of {summary['trades']}, newest first")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("◀ Newer", disabled=len(cursors) == 1, key="trade_history_newer", on_click=cursors.pop)
+    with col2:
+        st.button("Older ▶", disabled=next_cursor is None, key="trade_history_older",
+                  on_click=cursors.append, args=(next_cursor,))
+
+
+def main():
+    
+    # init_db() - Removed to prevent potential interference, DB should be initialized by autonomous_trader.py or manually
+    st.set_page_config(page_title="NSE Momentum Screener - Monitoring Dashboard", layout="wide")
+    validate_config()
+    ensure_session_state()
+    versions = data.data_versions()
+    st.session_state.static_versions = static_versions(versions)
+    
+    # Live panels auto-refresh only during market hours
+    if not is_market_hours():
+        st.info("🕒 Market is closed. Auto-refresh is disabled outside market hours (9:15 AM - 3:30 PM IST).")
+    
+    
+    st.title("📊 Day Trader - Monitoring Dashboard")
+    st.caption("**READ-ONLY VIEWER** - Displaying trades executed by autonomous_trader.py on Railway.app")
+    st.info("ℹ️ This dashboard only displays data. All trading actions are performed by the autonomous bot running on Railway.", icon="ℹ️")
+    
+    now = now_ist()
+    st.sidebar.subheader("Controls")
+    
+    # Total Available Margin input
+    total_margin = st.sidebar.number_input(
+        "Total Available Margin (₹)", 
+        min_value=10000, 
+        max_value=10000000, 
+        value=int(st.session_state.initial_margin), 
+        step=10000,
+        help="Your total trading capital"
     )
     
-    # Convert date to string format for database query
-    date_str = selected_date.strftime("%Y-%m-%d")
+    # Update initial margin if changed
+    if total_margin != st.session_state.initial_margin:
+        st.session_state.initial_margin = total_margin
     
-    # Get trades for selected date
-    trades_on_date = get_trades_by_date(date_str)
+    capital_per_trade = st.sidebar.number_input("Capital per trade (₹)", min_value=1000, max_value=1000000, value=10000, step=1000)
     
-    if not trades_on_date.empty:
-        # Calculate summary statistics
-        total_trades = len(trades_on_date)
-        winning_trades = len(trades_on_date[trades_on_date['profit_abs'] > 0])
-        losing_trades = len(trades_on_date[trades_on_date['profit_abs'] < 0])
-        total_profit = trades_on_date['profit_abs'].sum()
-        win_rate = (winning_trades / total_trades * 100) if total_trades > 0 else 0
-        
-        # Display summary metrics
-        col1, col2, col3, col4, col5 = st.columns(5)
-        with col1:
-            st.metric("Total Trades", total_trades)
-        with col2:
-            st.metric("Winning", winning_trades, delta=None)
-        with col3:
-            st.metric("Losing", losing_trades, delta=None)
-        with col4:
-            st.metric("Win Rate", f"{win_rate:.1f}%")
-        with col5:
-            st.metric("Total P&L", f"₹{total_profit:.2f}")
-        
-        # Format and display trades
-        display_trades = trades_on_date.copy()
-        display_trades["entry_price"] = display_trades["entry_price"].round(2)
-        display_trades["exit_price"] = display_trades["exit_price"].round(2)
-        display_trades["pnl_pct"] = display_trades["pnl_pct"].round(2)
-        display_trades["profit_abs"] = display_trades["profit_abs"].round(2)
-        if "max_profit_pct" in display_trades.columns:
-            display_trades["max_profit_pct"] = display_trades["max_profit_pct"].round(2)
+    # Display Entry Rules
+    st.sidebar.subheader("Entry Rules")
+    st.sidebar.info(
+        "✓ Time: After 9:20 AM only\n\n"
+        "✓ Price: Entry > 1.01 * Prev Close\n\n"
+        "(No entries in first 5 mins)"
+    )
+    
+    # Calculate and display current cash in hand
+    cumulative_pnl = data.cumulative_pnl(versions["daily_pnl"])
+    current_cash = st.session_state.initial_margin + cumulative_pnl
+    
+    st.sidebar.subheader("Account Summary")
+    st.sidebar.metric("Initial Margin", f"₹{st.session_state.initial_margin:,.2f}")
+    st.sidebar.metric("Cumulative P&L", f"₹{cumulative_pnl:,.2f}", delta=f"₹{cumulative_pnl:,.2f}")
+    st.sidebar.metric("Current Cash in Hand", f"₹{current_cash:,.2f}", delta=None)
+    
+    # Removed the refresh slider as we're using a fixed 30-second refresh
+ 
+    # Get cached watchlist
+    today_str = now.strftime("%Y-%m-%d")
+    
+    with st.spinner("Checking watchlist..."):
+        data_filtered, trade_date_last, trade_date_previous = get_daily_watchlist_display(versions)
+        if not data_filtered.empty:
+            st.toast(f"Loaded {len(data_filtered)} candidates from DB", icon="✅")
+        else:
+            st.toast("No candidates found in DB", icon="⚠️")
+    
+    st.write(f"Prev day: {trade_date_previous} | Last day: {trade_date_last} | Now: {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+    
+    if not data_filtered.empty:
+        st.subheader("Filtered candidates")
+        # Display available columns from database
+        st.dataframe(data_filtered[['SYMBOL', 'CLOSE_PRICE_last', 'CLOSE_PRICE_previous', 'price_change_pct', 'volume_ratio']])
         
-        # Rename columns for better display
-        display_trades = display_trades.rename(columns={
-            "SYMBOL": "Symbol",
-            "entry_price": "Entry Price",
-            "exit_price": "Exit Price",
-            "qty": "Quantity",
-            "pnl_pct": "P&L %",
-            "max_profit_pct": "Max PnL %",
-            "profit_abs": "Profit (₹)",
-            "exit_reason": "Exit Reason",
-            "entry_time": "Entry Time",
-            "exit_time": "Exit Time"
-        })
+        st.session_state.watchlist = data_filtered[["SYMBOL", "CLOSE_PRICE_last", "HIGH_PRICE_last"]].copy()
+    else:
+        st.info("No candidates met the criteria today.")
         
-        st.dataframe(display_trades, use_container_width=True)
+   
+    
+    # Positions and today's P&L refresh on their own; everything above and below
+    # reruns only when the watchlist, trades or daily P&L change
+    live_interval = REFRESH_SECONDS if is_market_hours() else None
+    st.fragment(live_panels, run_every=live_interval)(current_cash, cumulative_pnl)
+    
+	 # Display P&L Summary
+    st.subheader("P&L Summary")
+    rollups = {period: data.pnl_rollup(period, versions["daily_pnl"]) for period in ("week", "month", "year")}
+    if not rollups["year"].empty:
+        for period, title in (("week", "Weekly"), ("month", "Monthly"), ("year", "Yearly")):
+            st.write(f"#### {title} P&L")
+            rollup = rollups[period].rename(columns={"period_start": period})
+            st.dataframe(rollup, use_container_width=True, hide_index=True)
     else:
-        st.info(f"No closed trades found for {date_str}")
+        st.write("No P&L history available.")
+    
+    # Historical Trades Section
+    display_trade_history(versions)
     
     
-    #st_autorefresh(interval=120000, key="datarefresh")
         
     
     
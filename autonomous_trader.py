@@ -3,60 +3,94 @@ Autonomous Trading Bot - Runs independently without Streamlit
 This service runs the trading logic on a schedule throughout the trading day
 """
 
+import asyncio
+import contextlib
+import signal
 import schedule
 import time
 import logging
-from datetime import datetime
+import threading
+import numpy as np
 import pandas as pd
-from nsepython import get_bhavcopy as nse_get_bhavcopy
-import nselib
 
 # Load configuration
-from config import CAPITAL_PER_TRADE, PRICE_CHANGE_THRESHOLD, VOLUME_RATIO_THRESHOLD
+from config import (
+    validate_config, PRICE_CHANGE_THRESHOLD, VOLUME_RATIO_THRESHOLD, ENGINE_MODE, STRATEGIES,
+    SHARD_WORKERS, MAX_CAPITAL_DEPLOYED, SNAPSHOT_PATH, METRICS_PORT, BARS_DIR, POLL_BUDGET,
+    TRADE_RETENTION_DAYS
+)
 
 from trading_engine import (
-    now_ist, is_market_hours, is_market_open, last_two_trading_days,
-    init_db, get_open_trades, open_positions_for_watchlist,
+    now_ist, sleep, is_market_hours, is_market_open, is_entry_time, is_eod_exit_time, last_two_trading_days,
+    add_screen_metrics, screen_mask, init_db, get_open_trades, open_positions_for_watchlist,
     update_positions_and_apply_exits, force_eod_exit,
-    calculate_and_save_daily_pnl, save_watchlist,
-    get_watchlist_from_db, get_watchlist_date
+    calculate_and_save_daily_pnl, save_watchlist, archive_closed_trades,
+    get_watchlist_from_db, get_watchlist_date, get_traded_symbols,
+    get_price_cache_state, restore_price_cache_state, close_quote_journal,
+    fetch_prices, run_blocking, fetch_prices_async, QUOTE_CONCURRENCY,
+    publish_live_marks, EOD_QUOTE_DEADLINE_SECONDS
 )
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('trading_bot.log'),
-        logging.StreamHandler()
-    ]
+from bars import BarStore, bars_path, save_bars
+from governor import PRIORITY_EXIT, PRIORITY_ENTRY
+from polling import (
+    PollScheduler, poll_interval, exit_distance_pct, entry_distance_pct, volatility_pct,
+    MAX_EXIT_POLL_SECONDS, MAX_ENTRY_POLL_SECONDS
 )
+from sharding import ShardPool
+from snapshot import save_snapshot, load_snapshot
+from metrics import REGISTRY, timed, start_metrics_server
+from profiling import TickProfiler
+from log_setup import setup_logging
+
+# Logging is configured in main() (queue-based, see log_setup.py)
 logger = logging.getLogger(__name__)
 
+# Task cadence - exits are checked far more often than new entries are scanned
+EXIT_MONITOR_SECONDS = 5
+ENTRY_SCAN_SECONDS = 30
+SCHEDULE_CHECK_SECONDS = 60
+SNAPSHOT_SECONDS = 60
+METRICS_LOG_SECONDS = 60
+
+# Async engine mode - max concurrent DB calls from the event loop
+DB_CONCURRENCY = 4
+# Async engine mode - pricing gets half a tick; a pass is cancelled only well past its
+# tick, and never once its rule/DB phase has started (that phase is shielded)
+EXIT_QUOTE_TIMEOUT_SECONDS = EXIT_MONITOR_SECONDS / 2
+PASS_DEADLINE_TICKS = 3
+# The EOD exit pass quotes for up to EOD_QUOTE_DEADLINE_SECONDS, then closes positions in the DB
+EXIT_PASS_DEADLINE_SECONDS = max(PASS_DEADLINE_TICKS * EXIT_MONITOR_SECONDS,
+                                 EOD_QUOTE_DEADLINE_SECONDS + 2 * EXIT_MONITOR_SECONDS)
+
+
+def log_trade_events(events, phase: str):
+    """Log the engine's TradeEvents, with their symbol/exit_reason/price fields for the JSON log"""
+    for event in events:
+        logger.info("%s", event, extra={"phase": phase, **event.fields})
+
 
 def get_bhavcopy(trade_date_str: str):
     """Fetch bhavcopy data for a given date"""
+    # nsepython pulls in scipy - only worth loading once a day, when the watchlist is built
+    from nsepython import get_bhavcopy as nse_get_bhavcopy
     try:
-        logger.info(f"Fetching bhavcopy for {trade_date_str}")
+        logger.info("Fetching bhavcopy for %s", trade_date_str)
         data = nse_get_bhavcopy(trade_date_str)
         return data
     except Exception as e:
-        logger.error(f"Error fetching bhavcopy: {e}")
+        logger.error("Error fetching bhavcopy: %s", e)
         return []
 
 
-def generate_watchlist() -> pd.DataFrame:
+def load_bhavcopy_metrics() -> pd.DataFrame:
     """
-    Generate watchlist based on momentum criteria:
-    - Price change > 5% from previous day
-    - Volume ratio >= 5x from previous day
+    Load the last two trading days' bhavcopies and compute the screening metrics.
+    This is the parameter-independent part of watchlist generation, shared by all strategies.
     """
-    logger.info("Generating watchlist...")
-    
-    trade_date_last = last_two_trading_days(datetime.now().date())
+    trade_date_last = last_two_trading_days(now_ist().date())
     trade_date_previous = last_two_trading_days(trade_date_last)
     
-    logger.info(f"Prev day: {trade_date_previous} | Last day: {trade_date_last}")
+    logger.info("Prev day: %s | Last day: %s", trade_date_previous, trade_date_last)
     
     # Load bhavcopy data
     data_prev = pd.DataFrame(get_bhavcopy(trade_date_previous.strftime('%d-%m-%Y')))
@@ -72,23 +106,18 @@ def generate_watchlist() -> pd.DataFrame:
                                              ' OPEN_PRICE_last'])
     
     # Calculate metrics
-    data_merged["price_change_pct"] = (
-        (data_merged[" CLOSE_PRICE_last"] - data_merged[" CLOSE_PRICE_previous"]) / 
-        data_merged[" CLOSE_PRICE_previous"] * 100.0
-    )
-    data_merged["volume_ratio"] = (
-        data_merged[" TTL_TRD_QNTY_last"] / data_merged[" TTL_TRD_QNTY_previous"]
-    )
+    return add_screen_metrics(data_merged)
+
+
+def screen_watchlist(data_merged: pd.DataFrame,
+                     price_change_threshold: float = PRICE_CHANGE_THRESHOLD,
+                     volume_ratio_threshold: float = VOLUME_RATIO_THRESHOLD) -> pd.DataFrame:
+    """Filter bhavcopy metrics (from load_bhavcopy_metrics) down to a watchlist"""
+    if data_merged.empty:
+        return pd.DataFrame()
     
     # Filter based on criteria
-    # 1. Price change >= Threshold
-    # 2. Volume ratio >= Threshold
-    # 3. Bullish candle: Close > Open
-    filtered = data_merged[
-        (data_merged["price_change_pct"] >= PRICE_CHANGE_THRESHOLD) &
-        (data_merged["volume_ratio"] >= VOLUME_RATIO_THRESHOLD) &
-        (data_merged[" CLOSE_PRICE_last"] > data_merged[" OPEN_PRICE_last"])
-    ]
+    filtered = data_merged[screen_mask(data_merged, price_change_threshold, volume_ratio_threshold)]
     
     # Select required columns
     watchlist = filtered[["SYMBOL", "price_change_pct", "volume_ratio", " HIGH_PRICE_last", " CLOSE_PRICE_last", " CLOSE_PRICE_previous"]].copy()
@@ -98,17 +127,73 @@ def generate_watchlist() -> pd.DataFrame:
         " CLOSE_PRICE_previous": "CLOSE_PRICE_previous"
     })
     watchlist = watchlist.sort_values("price_change_pct", ascending=False)
+    return watchlist
+
+
+def generate_watchlist(price_change_threshold: float = PRICE_CHANGE_THRESHOLD,
+                       volume_ratio_threshold: float = VOLUME_RATIO_THRESHOLD) -> pd.DataFrame:
+    """
+    Generate watchlist based on momentum criteria:
+    - Price change > 5% from previous day
+    - Volume ratio >= 5x from previous day
+    """
+    logger.info("Generating watchlist...")
+    
+    watchlist = screen_watchlist(load_bhavcopy_metrics(), price_change_threshold, volume_ratio_threshold)
     
-    logger.info(f"Watchlist generated with {len(watchlist)} stocks")
+    logger.info("Watchlist generated with %s stocks", len(watchlist))
     return watchlist
 
 
+class Strategy:
+    """A named parameter set with its own watchlist; its trades are tagged with its name"""
+    
+    def __init__(self, name: str, capital_per_trade: float,
+                 price_change_threshold: float, volume_ratio_threshold: float,
+                 require_breakout: bool = False):
+        self.name = name
+        self.capital_per_trade = capital_per_trade
+        self.price_change_threshold = price_change_threshold
+        self.volume_ratio_threshold = volume_ratio_threshold
+        # Also require a 1-minute close above the previous day's high
+        self.require_breakout = require_breakout
+        self.watchlist = pd.DataFrame()
+        self.last_generation_date = None
+    
+    def positions_in(self, positions: pd.DataFrame) -> pd.DataFrame:
+        """This strategy's rows of a positions frame covering all strategies"""
+        if positions.empty or "strategy" not in positions.columns:
+            return positions.iloc[0:0]
+        return positions[positions["strategy"] == self.name]
+
+
 class TradingBot:
     def __init__(self):
+        # Open positions of all strategies (tagged by the 'strategy' column)
         self.positions = pd.DataFrame()
-        self.watchlist = pd.DataFrame()
+        self.strategies = {config["name"]: Strategy(**config) for config in STRATEGIES}
         self.is_running = False
-        self.last_generation_date = None
+        # Worker processes for pricing/screening large watchlists (SHARD_WORKERS > 0)
+        self.shard_pool = None
+        # Guards self.positions, shared by the exit monitor and entry scanner threads
+        self._positions_lock = threading.RLock()
+        self._stop_event = threading.Event()
+        self._workers = []
+        # Symbols each strategy already traded today (no re-entry after exit)
+        self._traded_today = {}
+        self._traded_today_date = None
+        # Local /metrics endpoint (METRICS_PORT > 0)
+        self.metrics_server = None
+        # On-demand cProfile capture of the next N ticks (SIGUSR1 or trigger file)
+        self.profiler = TickProfiler()
+        # 1-minute OHLC bars of every symbol priced today, built from the ticks' quotes
+        self.bars = BarStore()
+        # Adaptive polling (POLL_BUDGET > 0): each symbol is quoted when it could be near a
+        # trigger, so the entry scanner can tick as often as the exit monitor
+        self.poller = PollScheduler(POLL_BUDGET) if POLL_BUDGET > 0 else None
+        self.entry_scan_seconds = EXIT_MONITOR_SECONDS if self.poller else ENTRY_SCAN_SECONDS
+        # Latest quote per symbol, for positions not due a fresh one this tick
+        self._last_prices = {}
         
     def initialize(self):
         """Initialize the bot and database"""
@@ -116,98 +201,433 @@ class TradingBot:
         try:
             init_db()
             self.positions = get_open_trades()
-            logger.info(f"Loaded {len(self.positions)} open positions")
+            logger.info("Loaded %s open positions", len(self.positions))
         except Exception as e:
-            logger.error(f"Error initializing bot: {e}")
+            logger.error("Error initializing bot: %s", e)
             raise
     
+    # ============= STATE SNAPSHOT =============
+    
+    def snapshot_state(self) -> dict:
+        """Capture the in-memory state needed to resume trading after a restart"""
+        with self._positions_lock:
+            positions = self.positions.copy()
+        return {
+            "saved_at": now_ist(),
+            "positions": positions,
+            "watchlists": {
+                name: (strategy.watchlist, strategy.last_generation_date)
+                for name, strategy in self.strategies.items()
+            },
+            "traded_today": (self._traded_today_date,
+                             {name: set(symbols) for name, symbols in self._traded_today.items()}),
+            "price_cache": get_price_cache_state(),
+            "bars": self.bars.to_frame(),
+        }
+    
+    def save_snapshot(self):
+        """Write the state snapshot to SNAPSHOT_PATH"""
+        if not SNAPSHOT_PATH:
+            return
+        try:
+            save_snapshot(SNAPSHOT_PATH, self.snapshot_state())
+        except Exception as e:
+            logger.error("❌ Error saving state snapshot: %s", e)
+    
+    def restore_snapshot(self) -> bool:
+        """
+        Restore state from SNAPSHOT_PATH.
+        Quote caches are always restored; positions, watchlists and the traded-today
+        sets only if the snapshot was taken today.
+        
+        Returns:
+            True if today's trading state was restored
+        """
+        if not SNAPSHOT_PATH:
+            return False
+        state = load_snapshot(SNAPSHOT_PATH)
+        if state is None:
+            return False
+        
+        restore_price_cache_state(state["price_cache"])
+        
+        today = now_ist().date()
+        if state["saved_at"].date() != today:
+            logger.info("Snapshot is from %s, restored quote caches only", state['saved_at'].date())
+            return False
+        
+        self.positions = state["positions"]
+        for name, (watchlist, generation_date) in state["watchlists"].items():
+            if name in self.strategies:
+                self.strategies[name].watchlist = watchlist
+                self.strategies[name].last_generation_date = generation_date
+        self._traded_today_date, self._traded_today = state["traded_today"]
+        if "bars" in state:
+            self.bars = BarStore.from_frame(state["bars"])
+        
+        logger.info("⚡ Restored snapshot from %s: %d positions",
+                    state['saved_at'].strftime('%H:%M:%S'), len(self.positions))
+        return True
+    
+    def reconcile_with_db(self):
+        """Check restored state against the DB, which stays the source of truth"""
+        try:
+            init_db()
+            db_positions = get_open_trades()
+            
+            with self._positions_lock:
+                restored_ids = set(self.positions["id"]) if not self.positions.empty else set()
+                db_ids = set(db_positions["id"]) if not db_positions.empty else set()
+                self.positions = db_positions
+            if restored_ids != db_ids:
+                logger.warning("Snapshot positions differed from DB (snapshot: %d, DB: %d), using DB",
+                               len(restored_ids), len(db_ids))
+            
+            now = now_ist()
+            for strategy in self.strategies.values():
+                self._traded_today_for(strategy).update(get_traded_symbols(now, strategy.name))
+            
+            self.ensure_daily_watchlist()
+            logger.info("✅ Snapshot reconciled with DB")
+        except Exception as e:
+            logger.error("❌ Error reconciling snapshot with DB: %s", e, exc_info=True)
+    
+    def _traded_today_for(self, strategy: Strategy) -> set:
+        """Symbols the strategy traded today, loaded from DB the first time each day"""
+        today = now_ist().date()
+        if self._traded_today_date != today:
+            self._traded_today = {}
+            self._traded_today_date = today
+        if strategy.name not in self._traded_today:
+            self._traded_today[strategy.name] = get_traded_symbols(now_ist(), strategy.name)
+        return self._traded_today[strategy.name]
+    
+    def _mark_closed(self, positions: pd.DataFrame):
+        """Record symbols of positions closed this pass as traded today"""
+        if positions.empty or "strategy" not in positions.columns:
+            return
+        closed = positions[~positions["is_open"].astype(bool)]
+        for name, symbol in zip(closed["strategy"], closed["SYMBOL"]):
+            if name in self.strategies:
+                self._traded_today_for(self.strategies[name]).add(symbol)
+    
     def ensure_daily_watchlist(self):
         """
-        Ensure watchlist exists for today.
+        Ensure every strategy has a watchlist for today.
         1. Check if already in memory.
         2. Check if exists in DB (from previous run/crash recovery).
-        3. Only generate new if missing from both.
+        3. Only generate new if missing from both - one bhavcopy load is shared by all strategies.
         """
         today = now_ist().date()
         
         # 1. Check memory cache
-        if self.last_generation_date == today:
-            logger.info(f"Watchlist already generated for today ({today})")
+        pending = [s for s in self.strategies.values() if s.last_generation_date != today]
+        if not pending:
+            logger.info("Watchlist already generated for today (%s)", today)
             return
             
         # 2. Check database cache (handle restarts/crashes)
         # This ensures we don't regenerate if the bot restarts
-        db_date = get_watchlist_date()
-        if db_date == today:
-            logger.info(f"Found existing watchlist in DB for today ({today}). Loading from DB...")
-            try:
-                self.watchlist = get_watchlist_from_db()
-                self.last_generation_date = today
-                logger.info(f"✅ Loaded {len(self.watchlist)} stocks from DB (No regeneration needed)")
-                return
-            except Exception as e:
-                logger.error(f"Error loading from DB, will regenerate: {e}")
+        missing = []
+        for strategy in pending:
+            if get_watchlist_date(strategy.name) == today:
+                logger.info("Found existing watchlist in DB for today (%s) [%s]. Loading from DB...", today, strategy.name)
+                try:
+                    strategy.watchlist = get_watchlist_from_db(strategy.name)
+                    strategy.last_generation_date = today
+                    logger.info("✅ Loaded %s stocks from DB [%s] (No regeneration needed)", len(strategy.watchlist), strategy.name)
+                    continue
+                except Exception as e:
+                    logger.error("Error loading from DB, will regenerate [%s]: %s", strategy.name, e)
+            missing.append(strategy)
+        
+        if not missing:
+            return
         
         # 3. Generate new (Only if not in DB)
         logger.info("🔍 DB is empty/outdated. Generating daily watchlist...")
         try:
-            self.watchlist = generate_watchlist()
+            data_merged = load_bhavcopy_metrics()
             
-            # Save to database for Streamlit app
-            save_watchlist(self.watchlist)
+            for strategy in missing:
+                strategy.watchlist = screen_watchlist(
+                    data_merged, strategy.price_change_threshold, strategy.volume_ratio_threshold
+                )
+                
+                # Save to database for Streamlit app
+                save_watchlist(strategy.watchlist, strategy.name)
+                
+                strategy.last_generation_date = today
+                logger.info("✅ Watchlist generated [%s]: %s stocks", strategy.name, len(strategy.watchlist))
+                if not strategy.watchlist.empty:
+                    logger.info("Top stocks [%s]: %s", strategy.name, strategy.watchlist['SYMBOL'].head(5).tolist())
             logger.info("💾 Watchlist saved to database")
-            
-            self.last_generation_date = today
-            logger.info(f"✅ Watchlist generated: {len(self.watchlist)} stocks")
-            if not self.watchlist.empty:
-                logger.info(f"Top stocks: {self.watchlist['SYMBOL'].head(5).tolist()}")
         except Exception as e:
-            logger.error(f"❌ Error generating watchlist: {e}")
+            logger.error("❌ Error generating watchlist: %s", e)
     
-    def monitor_and_trade(self):
-        """Main trading loop - runs every 30 seconds during market hours"""
+    def in_trading_window(self) -> bool:
+        """Check if the bot should be monitoring/trading right now"""
         now = now_ist()
         
         # Stop monitoring after 3:25 PM (give 10 mins buffer after 3:15 exit)
         cutoff_time = now.replace(hour=15, minute=25, second=0, microsecond=0)
         if now > cutoff_time:
-            #logger.info("🛑 Market closed (post 3:25 PM). Stopping monitoring.")
-            return
-
+            return False
+        
         # Use is_market_hours (up to 3:30 PM) instead of is_market_open (up to 3:15 PM)
         # This ensures we keep running to trigger the 3:15 PM EOD exit
-        if not is_market_hours():
-            #logger.debug("Market is closed, skipping monitoring")
+        return is_market_hours()
+    
+    @contextlib.contextmanager
+    def _tick(self, task: str, interval: float):
+        """Profile (when armed) and time one pass, warning when it overruns its interval"""
+        started = time.perf_counter()
+        with self.profiler.tick(), timed("trader_tick_seconds", task=task):
+            yield
+        latency_ms = (time.perf_counter() - started) * 1000
+        if latency_ms > interval * 1000:
+            logger.warning("⏱️ Slow %s tick: %.0f ms (interval %ss)", task, latency_ms, interval,
+                           extra={"task": task, "latency_ms": round(latency_ms, 1)})
+    
+    def monitor_exits(self):
+        """Exit monitor - runs every few seconds, applies stop loss, trailing stop and EOD exit"""
+        if not self.in_trading_window():
             return
         
-        logger.info("📊 Monitoring positions...")
-        
         try:
-            # Reload current positions from database
-            self.positions = get_open_trades()
+            with self._tick("exit_monitor", EXIT_MONITOR_SECONDS):
+                eod = is_eod_exit_time(now_ist())
+                if not eod:
+                    # Price outside the lock, so a slow quote never holds up the entry scanner's
+                    # merge; one quote per symbol, even when several strategies hold it
+                    with timed("trader_phase_seconds", phase="price_positions"):
+                        symbols = self._due_symbols(self._open_symbols())
+                        fresh = self._price_positions(symbols) if len(symbols) else {}
+                    self.bars.record(fresh, now_ist())
+                
+                # Hold the lock from the reload on, so the entry scanner never merges
+                # into a positions frame that is about to be replaced
+                with self._positions_lock:
+                    with timed("trader_phase_seconds", phase="reload_positions"):
+                        positions = get_open_trades()
+                    
+                    if eod:
+                        # EOD: force_eod_exit quotes every position concurrently, within its deadline
+                        # (entries have stopped by then, so nothing waits on the lock)
+                        exit_messages = []
+                        with timed("trader_phase_seconds", phase="eod_exit"):
+                            positions, eod_messages = force_eod_exit(positions)
+                    else:
+                        # Update positions with current prices and apply exit conditions
+                        prices = self._with_last_prices(positions, fresh)
+                        with timed("trader_phase_seconds", phase="exit_eval"):
+                            positions, exit_messages = update_positions_and_apply_exits(positions, prices)
+                        self._reschedule_positions(positions, fresh)
+                        eod_messages = []
+                    
+                    self.positions = positions
+                    self._mark_closed(positions)
             
-            # Update positions with current prices and apply exit conditions
-            self.positions, exit_messages = update_positions_and_apply_exits(self.positions)
-            for msg in exit_messages:
-                logger.info(msg)
+            self._publish_marks(positions)
             
-            # Check for EOD exit
-            self.positions, eod_messages = force_eod_exit(self.positions)
-            for msg in eod_messages:
-                logger.info(msg)
+            log_trade_events(exit_messages + eod_messages, "exit")
+                
+        except Exception as e:
+            logger.error("❌ Error in exit monitor: %s", e, exc_info=True)
+    
+    def _publish_marks(self, positions):
+        """Publish this tick's marks for the dashboard (a failure only leaves the dashboard a tick behind)"""
+        try:
+            with timed("trader_phase_seconds", phase="publish_marks"):
+                publish_live_marks(positions)
+        except Exception as e:
+            logger.warning("Could not publish live marks: %s", e)
+    
+    def scan_entries(self):
+        """Entry scanner - runs every 30 seconds (5 with adaptive polling), opens new positions from each strategy's watchlist"""
+        if not self.in_trading_window():
+            return
+        
+        with self._tick("entry_scan", self.entry_scan_seconds):
+            self._scan_entries()
+    
+    def _scan_entries(self):
+        """One entry scan pass (timed by scan_entries)"""
+        plan, candidates = self._plan_entry_scan()
+        if not plan:
+            return
+        
+        logger.info("📊 Scanning watchlist for entries...")
+        
+        try:
+            # One quote per symbol, shared by every strategy watching it
+            with timed("trader_phase_seconds", phase="entry_prices"):
+                if self.poller:
+                    symbols = self._due_symbols(candidates, PRIORITY_ENTRY)
+                    prices = self._price_positions(symbols, PRIORITY_ENTRY) if symbols else {}
+                elif self.shard_pool:
+                    _, prices = self.shard_pool.evaluate(entry_candidates=candidates)
+                else:
+                    prices = fetch_prices(candidates, PRIORITY_ENTRY)
+            self.bars.record(prices, now_ist())
+            self._reschedule_candidates(candidates, prices)
             
-            # Try to open new positions from watchlist
-            if not self.watchlist.empty:
-                self.positions, entry_messages = open_positions_for_watchlist(
-                    self.watchlist, self.positions, CAPITAL_PER_TRADE
-                )
-                for msg in entry_messages:
-                    logger.info(msg)
+            with timed("trader_phase_seconds", phase="entry_rules"):
+                capital_left = self._capital_left()
+                for strategy, held in plan:
+                    new_positions = self._open_positions(strategy, held, prices, capital_left)
+                    capital_left = self._spend(capital_left, new_positions)
+                    self._merge_new_positions(new_positions)
             
-            logger.info(f"Current open positions: {len(self.positions[self.positions['is_open']])}")
+            with self._positions_lock:
+                open_count = len(self.positions[self.positions['is_open']]) if not self.positions.empty else 0
+            logger.info("Current open positions: %d", open_count)
             
         except Exception as e:
-            logger.error(f"❌ Error in monitoring loop: {e}", exc_info=True)
+            logger.error("❌ Error in entry scanner: %s", e, exc_info=True)
+    
+    def _plan_entry_scan(self):
+        """
+        Snapshot each strategy's positions and collect the symbols any strategy could enter.
+        Works on a snapshot so pricing the watchlists never blocks the exit monitor.
+        
+        Returns:
+            Tuple of (list of (strategy, its positions snapshot), dict of symbol -> previous close)
+        """
+        with self._positions_lock:
+            snapshot = self.positions.copy()
+        
+        # Outside 9:20 - 3:15 the entry rules reject everything, so don't price anything
+        entries_allowed = is_entry_time(now_ist())
+        
+        plan = []
+        candidates = {}
+        for strategy in self.strategies.values():
+            watchlist = strategy.watchlist
+            if watchlist.empty:
+                continue
+            held = strategy.positions_in(snapshot)
+            held_symbols = set(held["SYMBOL"]) if not held.empty else set()
+            plan.append((strategy, held))
+            if entries_allowed:
+                for symbol, last_day_close in zip(watchlist["SYMBOL"], watchlist["CLOSE_PRICE_last"]):
+                    if symbol not in held_symbols:
+                        candidates[symbol] = last_day_close
+        return plan, candidates
+    
+    def _open_symbols(self) -> list:
+        """Symbols of the open positions as of the last exit pass or entry merge"""
+        with self._positions_lock:
+            positions = self.positions
+            if positions.empty:
+                return []
+            return positions.loc[positions["is_open"].astype(bool), "SYMBOL"].tolist()
+    
+    def _price_positions(self, symbols, priority: int = PRIORITY_EXIT) -> dict:
+        """Price open positions (or due watchlist symbols), across the shard pool when enabled"""
+        if self.shard_pool:
+            prices, _ = self.shard_pool.evaluate(exit_symbols=symbols, priority=priority)
+            return prices
+        return fetch_prices(symbols, priority)
+    
+    # ============= ADAPTIVE POLLING =============
+    
+    def _due_symbols(self, symbols, priority: int = PRIORITY_EXIT) -> list:
+        """The symbols to quote this tick - all of them, or with adaptive polling only those due at `priority`"""
+        symbols = list(dict.fromkeys(symbols))
+        if not self.poller:
+            return symbols
+        return self.poller.take(symbols, now_ist().timestamp(), priority)
+    
+    def _with_last_prices(self, positions: pd.DataFrame, fresh: dict) -> dict:
+        """This tick's quotes, plus the last known price of every position not quoted this tick"""
+        if not self.poller:
+            return fresh
+        self._last_prices.update({symbol: price for symbol, price in fresh.items() if pd.notna(price)})
+        if positions.empty:
+            return fresh
+        prices = {symbol: self._last_prices.get(symbol, np.nan) for symbol in positions["SYMBOL"]}
+        prices.update({symbol: price for symbol, price in fresh.items() if pd.notna(price)})
+        return prices
+    
+    def _next_poll(self, symbol: str, distance_pct: float, max_interval: float, now) -> float:
+        """Seconds until the symbol's next quote, from its distance to a trigger and its bars' volatility"""
+        return poll_interval(distance_pct, volatility_pct(self.bars.completed_closes(symbol, now)), max_interval)
+    
+    def _reschedule_positions(self, positions: pd.DataFrame, fresh: dict):
+        """Schedule each position quoted this tick by its nearest stop (positions that closed drop out)"""
+        if not self.poller or not fresh:
+            return
+        now = now_ist()
+        distances = {}
+        if not positions.empty:
+            for pos in positions[positions["is_open"] & positions["SYMBOL"].isin(fresh)].itertuples(index=False):
+                distance = exit_distance_pct(float(pos.pnl_pct or 0.0), float(pos.max_profit_pct or 0.0))
+                distances[pos.SYMBOL] = min(distance, distances.get(pos.SYMBOL, distance))
+        for symbol in fresh:
+            # A failed quote (or a just-closed position) is retried on the next tick
+            distance = distances.get(symbol, 0.0)
+            self.poller.reschedule(symbol, now.timestamp(), self._next_poll(symbol, distance, MAX_EXIT_POLL_SECONDS, now))
+    
+    def _reschedule_candidates(self, candidates: dict, prices: dict):
+        """Schedule each watchlist symbol quoted this scan by its distance to the entry level"""
+        if not self.poller:
+            return
+        now = now_ist()
+        for symbol, price in prices.items():
+            if symbol not in candidates:
+                continue
+            distance = entry_distance_pct(price, candidates[symbol])
+            self.poller.reschedule(symbol, now.timestamp(), self._next_poll(symbol, distance, MAX_ENTRY_POLL_SECONDS, now),
+                                   PRIORITY_ENTRY)
+    
+    def _capital_left(self):
+        """Capital still available under MAX_CAPITAL_DEPLOYED (None when there is no cap)"""
+        if not MAX_CAPITAL_DEPLOYED:
+            return None
+        with self._positions_lock:
+            positions = self.positions
+            if positions.empty:
+                return MAX_CAPITAL_DEPLOYED
+            open_positions = positions[positions["is_open"]]
+            deployed = float((open_positions["entry_price"] * open_positions["qty"]).sum())
+        return max(0.0, MAX_CAPITAL_DEPLOYED - deployed)
+    
+    @staticmethod
+    def _spend(capital_left, new_positions: pd.DataFrame):
+        """Deduct newly opened positions from the remaining capital"""
+        if capital_left is None or new_positions.empty:
+            return capital_left
+        return capital_left - float((new_positions["entry_price"] * new_positions["qty"]).sum())
+    
+    def _open_positions(self, strategy: Strategy, held: pd.DataFrame, prices: dict,
+                        capital_left=None) -> pd.DataFrame:
+        """Run the entry rules for one strategy, returning only the positions it opened"""
+        positions, entry_messages = open_positions_for_watchlist(
+            strategy.watchlist, held, strategy.capital_per_trade, prices, strategy.name, capital_left,
+            self._traded_today_for(strategy), self.bars, strategy.require_breakout
+        )
+        for event in entry_messages:
+            logger.info("[%s] %s", strategy.name, event,
+                        extra={"phase": "entry", **event.fields, "strategy": strategy.name})
+        return positions.iloc[len(held):]
+    
+    def _merge_new_positions(self, new_positions: pd.DataFrame):
+        """Add newly opened positions, skipping any the exit monitor already reloaded from DB"""
+        if new_positions.empty:
+            return
+        
+        with self._positions_lock:
+            if not self.positions.empty and "id" in self.positions.columns:
+                known_ids = set(self.positions["id"].dropna())
+                new_positions = new_positions[~new_positions["id"].isin(known_ids)]
+            if not new_positions.empty:
+                self.positions = pd.concat([self.positions, new_positions], ignore_index=True)
+    
+    def monitor_and_trade(self):
+        """Run one exit-monitor pass followed by one entry scan"""
+        self.monitor_exits()
+        self.scan_entries()
     
     def end_of_day_tasks(self):
         """End of day tasks - calculate and save P&L"""
@@ -215,88 +635,385 @@ class TradingBot:
         
         try:
             # Force close any remaining open positions
-            self.positions, messages = force_eod_exit(self.positions)
-            for msg in messages:
-                logger.info(msg)
+            with self._positions_lock:
+                self.positions, messages = force_eod_exit(self.positions)
+            log_trade_events(messages, "exit")
             
             # Calculate and save daily P&L
             total_pnl = calculate_and_save_daily_pnl()
-            logger.info(f"💰 Daily P&L saved: ₹{total_pnl:.2f}")
+            logger.info("💰 Daily P&L saved: ₹%.2f", total_pnl)
+            
+            self.save_session_bars()
+            close_quote_journal()
+            self.archive_old_trades()
             
             # Reset watchlist for next day (not strictly necessary with date check, but good for cleanup)
             # self.last_generation_date will be updated when generate_daily_watchlist runs tomorrow
             
         except Exception as e:
-            logger.error(f"❌ Error in EOD tasks: {e}", exc_info=True)
+            logger.error("❌ Error in EOD tasks: %s", e, exc_info=True)
+    
+    def save_session_bars(self):
+        """Save today's bars under BARS_DIR for replay, then start tomorrow with empty rings"""
+        if BARS_DIR:
+            try:
+                path = bars_path(BARS_DIR, now_ist().date())
+                save_bars(self.bars, path)
+                logger.info("🕯️ Saved 1-minute bars to %s", path)
+            except Exception as e:
+                logger.error("❌ Error saving bars: %s", e)
+        self.bars.clear()
+        if self.poller:
+            self.poller.clear()
+    
+    def archive_old_trades(self):
+        """Move trades closed more than TRADE_RETENTION_DAYS ago out of the hot trades table"""
+        if not TRADE_RETENTION_DAYS:
+            return
+        try:
+            archived = archive_closed_trades(TRADE_RETENTION_DAYS)
+            logger.info("🗄️ Archived %s trades closed over %s days ago", archived, TRADE_RETENTION_DAYS)
+        except Exception as e:
+            logger.error("❌ Error archiving trades: %s", e)
+    
+    def log_metrics_summary(self):
+        """Log p50/p95/p99 tick latency of the exit monitor and entry scanner"""
+        parts = []
+        for task in ("exit_monitor", "entry_scan"):
+            summary = REGISTRY.quantiles("trader_tick_seconds", task=task)
+            if summary:
+                (p50, p95, p99), count = summary
+                parts.append(f"{task} {p50 * 1000:.1f}/{p95 * 1000:.1f}/{p99 * 1000:.1f} ms (n={count})")
+        if parts:
+            logger.info("⏱️ Tick p50/p95/p99: %s", ' | '.join(parts))
+    
+    @staticmethod
+    def is_watchlist_time(now) -> bool:
+        """9:15 AM - Generate Watchlist (a range, so a slightly delayed loop doesn't miss it)"""
+        return now.hour == 9 and 15 <= now.minute <= 16
+    
+    @staticmethod
+    def is_eod_time(now) -> bool:
+        """3:20 PM - EOD Tasks"""
+        return now.hour == 15 and 20 <= now.minute <= 21
     
     def check_schedule(self):
         """Check time and run scheduled tasks based on IST"""
         now = now_ist()
         
-        # 9:15 AM - Generate Watchlist
-        # We check a range to ensure we don't miss it if the loop is slightly delayed
-        if now.hour == 9 and 15 <= now.minute <= 16:
+        if self.is_watchlist_time(now):
             self.ensure_daily_watchlist()
             
-        # 3:20 PM - EOD Tasks
-        if now.hour == 15 and 20 <= now.minute <= 21:
+        if self.is_eod_time(now):
             self.end_of_day_tasks()
 
     def start(self):
         """Start the autonomous trading bot"""
         logger.info("🚀 Starting Autonomous Trading Bot...")
         
-        self.initialize()
         self.is_running = True
+        restored = self.restore_snapshot()
+        if restored:
+            # Trade from the snapshot right away; DB checks (DDL, positions, watchlist) run behind
+            threading.Thread(target=self.reconcile_with_db, name="db-reconcile", daemon=True).start()
+        else:
+            self.initialize()
+        
+        if SHARD_WORKERS > 0:
+            self.shard_pool = ShardPool(SHARD_WORKERS)
+            logger.info("🧩 Sharded mode: %s worker processes", SHARD_WORKERS)
+        
+        if METRICS_PORT > 0:
+            self.metrics_server = start_metrics_server(METRICS_PORT)
+            logger.info("📈 Metrics: http://127.0.0.1:%s/metrics", METRICS_PORT)
         
         # ALWAYS check/generate watchlist on startup
         # This ensures DB is populated even if bot is restarted or started late
-        logger.info("Bot started, checking watchlist status...")
-        self.ensure_daily_watchlist()
+        if not restored:
+            logger.info("Bot started, checking watchlist status...")
+            self.ensure_daily_watchlist()
+        
+        if ENGINE_MODE == "async":
+            self._run_async()
+            return
         
         # Schedule tasks
         # We run a time checker every minute to handle Timezone differences (Server UTC vs Market IST)
         schedule.every(1).minutes.do(self.check_schedule)
         
-        # Monitor trades every 30 seconds
-        schedule.every(30).seconds.do(self.monitor_and_trade)
+        # Exit monitor and entry scanner run concurrently on their own threads,
+        # so a slow scan over a large watchlist never delays a stop loss
+        self._start_periodic("exit-monitor", EXIT_MONITOR_SECONDS, self.monitor_exits)
+        self._start_periodic("entry-scanner", self.entry_scan_seconds, self.scan_entries)
+        self._start_periodic("snapshot", SNAPSHOT_SECONDS, self.save_snapshot)
+        self._start_periodic("metrics-log", METRICS_LOG_SECONDS, self.log_metrics_summary)
         
         logger.info("📅 Scheduled tasks:")
         logger.info("  - Time Check (IST): Every minute")
         logger.info("    -> Generate watchlist: 9:15 AM IST")
         logger.info("    -> EOD tasks: 3:20 PM IST")
-        logger.info("  - Monitor & trade: Every 30 seconds")
+        logger.info("  - Exit monitor: Every %s seconds", EXIT_MONITOR_SECONDS)
+        logger.info("  - Entry scanner: Every %s seconds", self.entry_scan_seconds)
+        logger.info("  - State snapshot: Every %s seconds", SNAPSHOT_SECONDS)
+        logger.info("  - Latency summary: Every %s seconds", METRICS_LOG_SECONDS)
         
         # Main loop
         try:
             while self.is_running:
                 schedule.run_pending()
-                time.sleep(1)
+                sleep(1)
         except KeyboardInterrupt:
             logger.info("⏹️ Stopping bot (KeyboardInterrupt)...")
-            self.is_running = False
+            self.stop()
         except Exception as e:
-            logger.error(f"❌ Unexpected error: {e}", exc_info=True)
-            self.is_running = False
+            logger.error("❌ Unexpected error: %s", e, exc_info=True)
+            self.stop()
+    
+    def _start_periodic(self, name: str, interval: float, task):
+        """Run task every interval seconds on a daemon thread until the bot stops"""
+        def run():
+            next_run = time.monotonic()
+            while not self._stop_event.is_set():
+                task()
+                next_run += interval
+                delay = next_run - time.monotonic()
+                if delay < 0:
+                    # Task overran its interval - skip missed runs instead of bunching them up
+                    next_run = time.monotonic()
+                    delay = 0
+                self._stop_event.wait(delay)
+        
+        worker = threading.Thread(target=run, name=name, daemon=True)
+        worker.start()
+        self._workers.append(worker)
+    
+    # ============= ASYNC ENGINE MODE =============
+    
+    def _run_async(self):
+        """Run the bot on a single asyncio event loop (ENGINE_MODE=async)"""
+        logger.info("⚡ Running in async engine mode")
+        logger.info("  - Exit monitor: Every %s seconds", EXIT_MONITOR_SECONDS)
+        logger.info("  - Entry scanner: Every %s seconds", self.entry_scan_seconds)
+        logger.info("  - State snapshot: Every %s seconds", SNAPSHOT_SECONDS)
+        logger.info("  - Time Check (IST): Every %s seconds", SCHEDULE_CHECK_SECONDS)
+        logger.info("  - Quote concurrency: %s, DB concurrency: %s", QUOTE_CONCURRENCY, DB_CONCURRENCY)
+        try:
+            asyncio.run(self._main_async())
+        except KeyboardInterrupt:
+            logger.info("⏹️ Stopping bot (KeyboardInterrupt)...")
+        except Exception as e:
+            logger.error("❌ Unexpected error: %s", e, exc_info=True)
+        finally:
+            self.stop()
+    
+    async def _main_async(self):
+        """Run the periodic coroutines concurrently until the bot stops"""
+        self._async_lock = asyncio.Lock()
+        self._db_semaphore = asyncio.Semaphore(DB_CONCURRENCY)
+        
+        # Each pass is cancelled if it overruns its deadline so one slow tick
+        # can never stall the next one
+        tasks = [
+            self._periodic_async(EXIT_MONITOR_SECONDS, self.monitor_exits_async,
+                                 deadline=EXIT_PASS_DEADLINE_SECONDS),
+            self._periodic_async(self.entry_scan_seconds, self.scan_entries_async,
+                                 deadline=PASS_DEADLINE_TICKS * self.entry_scan_seconds),
+            self._periodic_async(SCHEDULE_CHECK_SECONDS, self.check_schedule_async,
+                                 deadline=15 * 60),
+            self._periodic_async(SNAPSHOT_SECONDS, self.save_snapshot_async),
+            self._periodic_async(METRICS_LOG_SECONDS, self.log_metrics_summary_async),
+        ]
+        await asyncio.gather(*tasks)
+    
+    async def _periodic_async(self, interval: float, task, deadline: float = None):
+        """Await task every interval seconds, cancelling any pass that runs past its deadline"""
+        loop = asyncio.get_running_loop()
+        deadline = deadline or interval
+        next_run = loop.time()
+        while self.is_running:
+            try:
+                await asyncio.wait_for(task(), timeout=deadline)
+            except asyncio.TimeoutError:
+                logger.warning("⏱️ %s exceeded its %ss deadline, cancelled", task.__name__, deadline,
+                               extra={"task": task.__name__})
+            except Exception as e:
+                logger.error("❌ Error in %s: %s", task.__name__, e, exc_info=True)
+            next_run += interval
+            delay = next_run - loop.time()
+            if delay < 0:
+                next_run = loop.time()
+                delay = 0
+            await asyncio.sleep(delay)
+    
+    async def save_snapshot_async(self):
+        """Write the state snapshot off the event loop"""
+        await run_blocking(self.save_snapshot)
+    
+    async def log_metrics_summary_async(self):
+        """Latency summary line (in-memory only, so it runs on the loop)"""
+        self.log_metrics_summary()
+    
+    async def _db(self, func, *args):
+        """Run a blocking DB-backed engine function off the event loop"""
+        return await run_blocking(func, *args, semaphore=self._db_semaphore)
+    
+    async def monitor_exits_async(self):
+        """Async exit monitor - prices all open positions concurrently"""
+        if not self.in_trading_window():
+            return
+        
+        with self._tick("exit_monitor", EXIT_MONITOR_SECONDS):
+            if is_eod_exit_time(now_ist()):
+                # The DB closes can't be taken back, so the state update must not be cancelled either
+                await asyncio.shield(asyncio.ensure_future(self._eod_exit_async()))
+                return
+            
+            # Price outside the lock, bounded to half a tick
+            symbols = self._due_symbols(self._open_symbols())
+            with timed("trader_phase_seconds", phase="price_positions"):
+                fresh = await self._price_positions_async(symbols, EXIT_QUOTE_TIMEOUT_SECONDS)
+            self.bars.record(fresh, now_ist())
+            
+            # Once started, the rule/DB phase runs to completion even if the pass is cancelled
+            await asyncio.shield(asyncio.ensure_future(self._apply_exits_async(fresh)))
+    
+    async def _price_positions_async(self, symbols: list, timeout: float, priority: int = PRIORITY_EXIT) -> dict:
+        """Price symbols (across the shard pool when enabled), leaving out any not priced within timeout"""
+        if not symbols:
+            return {}
+        if not self.shard_pool:
+            return await fetch_prices_async(symbols, timeout=timeout, priority=priority)
+        try:
+            return await asyncio.wait_for(run_blocking(self._price_positions, symbols, priority), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shard pricing deadline hit, %d symbols unpriced", len(symbols))
+            return {}
+    
+    async def _eod_exit_async(self):
+        """EOD exit pass: force_eod_exit quotes every position concurrently, within its deadline"""
+        async with self._async_lock:
+            with timed("trader_phase_seconds", phase="reload_positions"):
+                positions = await self._db(get_open_trades)
+            with timed("trader_phase_seconds", phase="eod_exit"):
+                positions, eod_messages = await self._db(force_eod_exit, positions)
+            self.positions = positions
+            self._mark_closed(positions)
+        
+        await self._db(self._publish_marks, positions)
+        
+        log_trade_events(eod_messages, "exit")
+    
+    async def _apply_exits_async(self, fresh: dict):
+        """Rule/DB phase of an exit pass: reload positions, apply the exit rules and update state"""
+        async with self._async_lock:
+            with timed("trader_phase_seconds", phase="reload_positions"):
+                positions = await self._db(get_open_trades)
+            prices = self._with_last_prices(positions, fresh)
+            with timed("trader_phase_seconds", phase="exit_eval"):
+                positions, exit_messages = await self._db(update_positions_and_apply_exits, positions, prices)
+            self._reschedule_positions(positions, fresh)
+            self.positions = positions
+            self._mark_closed(positions)
+        
+        await self._db(self._publish_marks, positions)
+        
+        log_trade_events(exit_messages, "exit")
+    
+    async def scan_entries_async(self):
+        """Async entry scanner - prices every strategy's watchlist concurrently"""
+        if not self.in_trading_window():
+            return
+        
+        plan, candidates = self._plan_entry_scan()
+        if not plan:
+            return
+        
+        logger.info("📊 Scanning watchlist for entries...")
+        
+        with self._tick("entry_scan", self.entry_scan_seconds):
+            # Pricing gets half a tick, leaving the rest of the pass to the entry rules
+            quote_timeout = self.entry_scan_seconds / 2
+            with timed("trader_phase_seconds", phase="entry_prices"):
+                if self.poller:
+                    symbols = self._due_symbols(candidates, PRIORITY_ENTRY)
+                    prices = await self._price_positions_async(symbols, quote_timeout, PRIORITY_ENTRY)
+                elif self.shard_pool:
+                    try:
+                        _, prices = await asyncio.wait_for(
+                            run_blocking(self.shard_pool.evaluate, (), candidates), quote_timeout)
+                    except asyncio.TimeoutError:
+                        logger.warning("Shard entry screen deadline hit, %d symbols unpriced", len(candidates))
+                        prices = {}
+                else:
+                    prices = await fetch_prices_async(candidates, timeout=quote_timeout, priority=PRIORITY_ENTRY)
+            self.bars.record(prices, now_ist())
+            self._reschedule_candidates(candidates, prices)
+            
+            # Once started, the entry rules (DB inserts and merge) run to completion even if the pass is cancelled
+            await asyncio.shield(asyncio.ensure_future(self._open_entries_async(plan, prices)))
+    
+    async def _open_entries_async(self, plan: list, prices: dict):
+        """Rule/DB phase of an entry scan: open positions for each strategy and merge them"""
+        with timed("trader_phase_seconds", phase="entry_rules"):
+            capital_left = self._capital_left()
+            for strategy, held in plan:
+                new_positions = await self._db(self._open_positions, strategy, held, prices, capital_left)
+                capital_left = self._spend(capital_left, new_positions)
+                async with self._async_lock:
+                    self._merge_new_positions(new_positions)
+        
+        open_count = len(self.positions[self.positions['is_open']]) if not self.positions.empty else 0
+        logger.info("Current open positions: %d", open_count)
+    
+    async def check_schedule_async(self):
+        """Run the IST time checks off the event loop (watchlist generation, EOD tasks)"""
+        now = now_ist()
+        
+        if self.is_watchlist_time(now):
+            await run_blocking(self.ensure_daily_watchlist)
+        
+        if self.is_eod_time(now):
+            async with self._async_lock:
+                await run_blocking(self.end_of_day_tasks)
     
     def stop(self):
         """Stop the bot"""
         logger.info("Stopping trading bot...")
         self.is_running = False
+        self._stop_event.set()
+        for worker in self._workers:
+            worker.join(timeout=10)
+        self._workers = []
+        if self.shard_pool:
+            self.shard_pool.shutdown()
+            self.shard_pool = None
+        if self.metrics_server:
+            self.metrics_server.shutdown()
+            self.metrics_server = None
+        close_quote_journal()
+        self.save_snapshot()
 
 
 def main():
     """Main entry point"""
+    setup_logging()
+    validate_config()
     logger.info("=" * 80)
     logger.info("AUTONOMOUS TRADING BOT")
     logger.info("=" * 80)
     
     bot = TradingBot()
     
+    # Railway stops the worker with SIGTERM - treat it like Ctrl+C so the bot
+    # shuts down cleanly and writes its state snapshot
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    # `kill -USR1 <pid>` (or creating profile.trigger) profiles the next ticks
+    bot.profiler.install_signal_handler()
+    
     try:
         bot.start()
     except Exception as e:
-        logger.error(f"Fatal error: {e}", exc_info=True)
+        logger.error("Fatal error: %s", e, exc_info=True)
     finally:
         logger.info("Trading bot shutdown complete")
 
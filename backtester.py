@@ -0,0 +1,294 @@
+"""
+Backtester - Replay historical bhavcopies and intraday bars through the live trading rules
+Screening, entry and exit rules come from trading_engine; the simulation is vectorized
+across symbols and days, and results are shaped like the trades and daily_pnl tables
+"""
+
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from nsepython import get_bhavcopy as nse_get_bhavcopy
+import yfinance as yf
+
+from config import CAPITAL_PER_TRADE, PRICE_CHANGE_THRESHOLD, VOLUME_RATIO_THRESHOLD
+from trading_engine import (
+    IST, DEFAULT_STRATEGY, ENTRY_BUFFER_PCT, STOP_LOSS_PCT, TRAIL_STOP_PCT,
+    is_trading_day, add_screen_metrics, screen_mask, exit_reason_for
+)
+
+logger = logging.getLogger(__name__)
+
+# Session rules, in minutes after midnight IST (same as the live engine)
+ENTRY_START_MINUTE = 9 * 60 + 20
+EOD_EXIT_MINUTE = 15 * 60 + 15
+
+TRADE_COLUMNS = [
+    "id", "symbol", "entry_price", "qty", "max_profit_pct", "is_open", "exit_reason",
+    "entry_time", "exit_time", "exit_price", "pnl_pct", "strategy"
+]
+
+
+# ============= DATA LOADING =============
+
+def load_bhavcopy_history(start_date: date, end_date: date) -> pd.DataFrame:
+    """
+    Download the bhavcopy of every trading day in [start_date, end_date].
+    Days without data (unlisted holidays, download errors) are skipped.
+
+    Returns:
+        All days stacked, with a 'date' column added
+    """
+    frames = []
+    day = start_date
+    while day <= end_date:
+        if is_trading_day(day):
+            try:
+                data = pd.DataFrame(nse_get_bhavcopy(day.strftime('%d-%m-%Y')))
+            except Exception as e:
+                logger.warning("No bhavcopy for %s: %s", day, e)
+                data = pd.DataFrame()
+            if not data.empty:
+                data["date"] = day
+                frames.append(data)
+        day += timedelta(days=1)
+
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
+
+
+def bhavcopy_metrics_history(bhav_history: pd.DataFrame) -> pd.DataFrame:
+    """
+    Pair every bhavcopy day with the one before it (as generate_watchlist does for
+    a single day) and compute the screening metrics for all days at once.
+    Parameter-independent, so it can be computed once and screened many times.
+
+    Returns:
+        Merged rows with '_last' / '_previous' columns, metrics and a 'trade_date'
+        column (the trading day the watchlist is used on)
+    """
+    days = sorted(bhav_history["date"].unique())
+    day_index = {day: i for i, day in enumerate(days)}
+
+    history = bhav_history.copy()
+    history["_day"] = history["date"].map(day_index)
+    previous = history.copy()
+    previous["_day"] += 1
+
+    data_merged = pd.merge(history, previous, on=["SYMBOL", "_day"], suffixes=('_last', '_previous'))
+    data_merged = data_merged.dropna(subset=[' CLOSE_PRICE_last', ' CLOSE_PRICE_previous',
+                                             ' TTL_TRD_QNTY_last', ' TTL_TRD_QNTY_previous',
+                                             ' OPEN_PRICE_last'])
+    data_merged = add_screen_metrics(data_merged)
+
+    # The watchlist built from days (k-1, k) is traded on day k+1
+    next_day = dict(zip(range(len(days) - 1), days[1:]))
+    data_merged["trade_date"] = data_merged["_day"].map(next_day)
+    return data_merged.dropna(subset=["trade_date"]).drop(columns="_day")
+
+
+def screen_history(metrics: pd.DataFrame,
+                   price_change_threshold: float = PRICE_CHANGE_THRESHOLD,
+                   volume_ratio_threshold: float = VOLUME_RATIO_THRESHOLD) -> pd.DataFrame:
+    """
+    Apply the live watchlist screen to every day of bhavcopy_metrics_history.
+
+    Returns:
+        Watchlist rows (same columns as the live watchlist) plus 'trade_date'
+    """
+    filtered = metrics[screen_mask(metrics, price_change_threshold, volume_ratio_threshold)]
+    signals = filtered[["trade_date", "SYMBOL", "price_change_pct", "volume_ratio",
+                        " HIGH_PRICE_last", " CLOSE_PRICE_last", " CLOSE_PRICE_previous"]]
+    signals = signals.rename(columns={
+        " HIGH_PRICE_last": "HIGH_PRICE_last",
+        " CLOSE_PRICE_last": "CLOSE_PRICE_last",
+        " CLOSE_PRICE_previous": "CLOSE_PRICE_previous"
+    })
+    signals = signals.drop_duplicates(subset=["trade_date", "SYMBOL"])
+    return signals.sort_values(["trade_date", "price_change_pct"], ascending=[True, False]).reset_index(drop=True)
+
+
+def load_intraday_bars(signals: pd.DataFrame, interval: str = "5m") -> pd.DataFrame:
+    """
+    Download intraday bars for each watchlist symbol on the days it is traded.
+    Uses the same listings as get_current_price (SME first, then main board).
+    yfinance keeps 1m bars for ~7 days and 5m bars for ~60 days; use '1h' for longer history.
+
+    Returns:
+        DataFrame with columns SYMBOL, datetime (IST), close
+    """
+    frames = []
+    for symbol, days in signals.groupby("SYMBOL")["trade_date"]:
+        start = min(days)
+        end = max(days) + timedelta(days=1)
+        history = pd.DataFrame()
+        for ticker in (f"{symbol}-SM.NS", f"{symbol}.NS"):
+            try:
+                history = yf.Ticker(ticker).history(start=start, end=end, interval=interval)
+            except Exception as e:
+                logger.warning("Error fetching bars for %s: %s", ticker, e)
+            if not history.empty:
+                break
+        if history.empty:
+            continue
+
+        bars = pd.DataFrame({
+            "SYMBOL": symbol,
+            "datetime": history.index.tz_convert(IST),
+            "close": history["Close"].to_numpy(),
+        })
+        frames.append(bars[bars["datetime"].dt.date.isin(set(days))])
+
+    if not frames:
+        return pd.DataFrame(columns=["SYMBOL", "datetime", "close"])
+    return pd.concat(frames, ignore_index=True)
+
+
+# ============= SIMULATION =============
+
+def simulate(signals: pd.DataFrame, bars: pd.DataFrame,
+             capital_per_trade: float = CAPITAL_PER_TRADE,
+             entry_buffer_pct: float = ENTRY_BUFFER_PCT,
+             stop_loss_pct: float = STOP_LOSS_PCT,
+             trail_stop_pct: float = TRAIL_STOP_PCT,
+             strategy: str = DEFAULT_STRATEGY,
+             trade_days: Optional[List[date]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Run the live entry/exit rules over intraday bars for every watchlist symbol-day at once.
+
+    Per symbol and day, mirroring open_positions_for_watchlist / update_positions_and_apply_exits
+    / force_eod_exit with bar closes as the polled price:
+    - Entry at the first bar from 9:20 to before 3:15 above previous close + entry buffer
+    - One trade per symbol per day (no re-entry after exit)
+    - Exit at the first later bar hitting the stop loss or the trailing stop from peak
+    - Otherwise exit at the first bar from 3:15 (EOD Exit)
+
+    Returns:
+        Tuple of (trades, daily_pnl) shaped like the trades and daily_pnl tables
+    """
+    empty = (pd.DataFrame(columns=TRADE_COLUMNS), pd.DataFrame(columns=["date", "total_pnl"]))
+    if signals.empty or bars.empty:
+        return empty[0], _daily_pnl(empty[0], trade_days)
+
+    bars = bars.assign(trade_date=bars["datetime"].dt.date)
+    bars = bars.merge(signals[["trade_date", "SYMBOL", "CLOSE_PRICE_last"]], on=["trade_date", "SYMBOL"])
+    bars = bars.sort_values(["trade_date", "SYMBOL", "datetime"]).reset_index(drop=True)
+
+    group = [bars["trade_date"], bars["SYMBOL"]]
+    minutes = (bars["datetime"].dt.hour * 60 + bars["datetime"].dt.minute).to_numpy()
+    close = bars["close"].to_numpy(dtype=float)
+
+    # Entry: first bar in the entry window that clears the entry level
+    entry_level = bars["CLOSE_PRICE_last"].to_numpy(dtype=float) * (1 + entry_buffer_pct / 100.0)
+    can_enter = pd.Series((minutes >= ENTRY_START_MINUTE) & (minutes < EOD_EXIT_MINUTE) & (close > entry_level))
+    is_entry = can_enter & (can_enter.astype(int).groupby(group).cumsum() == 1)
+    entry_price = pd.Series(np.where(is_entry, close, np.nan)).groupby(group).ffill()
+    in_trade = entry_price.notna()
+    after_entry = in_trade & ~is_entry
+
+    # EOD: first bar from 3:15, or the day's last bar if the data stops earlier
+    is_eod_time = pd.Series(minutes >= EOD_EXIT_MINUTE)
+    eod_seen = is_eod_time.astype(int).groupby(group).cumsum()
+    is_last_bar = bars.groupby(["trade_date", "SYMBOL"]).cumcount(ascending=False) == 0
+    is_eod_bar = (is_eod_time & (eod_seen == 1)) | (is_last_bar & (eod_seen == 0))
+    past_eod = (eod_seen >= 1) & ~is_eod_bar
+
+    # Stop loss / trailing stop, evaluated on every bar after the entry bar
+    pnl_pct = (close - entry_price) / entry_price * 100.0
+    live_pnl = pnl_pct.where(after_entry & ~past_eod)
+    max_profit_pct = live_pnl.groupby(group).cummax().clip(lower=0.0)
+    rule_exit = (live_pnl <= -stop_loss_pct) | ((max_profit_pct > 0) & (max_profit_pct - live_pnl >= trail_stop_pct))
+
+    exit_candidate = (after_entry & ~past_eod & rule_exit) | (in_trade & is_eod_bar)
+    is_exit = exit_candidate & (exit_candidate.astype(int).groupby(group).cumsum() == 1)
+
+    entries = bars[is_entry.to_numpy()]
+    exits = bars[is_exit.to_numpy()]
+    exit_pnl = pnl_pct[is_exit].fillna(0.0).to_numpy()
+    exit_max_profit = max_profit_pct[is_exit].fillna(0.0).to_numpy()
+
+    # Both frames are in (trade_date, SYMBOL) order with exactly one row per trade
+    entry_prices = entries["close"].to_numpy(dtype=float)
+    trades = pd.DataFrame({
+        "symbol": entries["SYMBOL"].to_numpy(),
+        "entry_price": entry_prices,
+        "qty": np.maximum(1, (capital_per_trade // entry_prices)).astype(int),
+        "max_profit_pct": np.maximum(exit_max_profit, exit_pnl),
+        "is_open": False,
+        "exit_reason": [
+            exit_reason_for(pnl, peak, stop_loss_pct, trail_stop_pct) if not eod else "EOD Exit"
+            for pnl, peak, eod in zip(exit_pnl, exit_max_profit,
+                                      (is_eod_bar[is_exit] & ~rule_exit[is_exit].fillna(False)).to_numpy())
+        ],
+        "entry_time": entries["datetime"].dt.tz_localize(None).to_numpy(),
+        "exit_time": exits["datetime"].dt.tz_localize(None).to_numpy(),
+        "exit_price": exits["close"].to_numpy(dtype=float),
+        "pnl_pct": exit_pnl,
+        "strategy": strategy,
+    })
+    trades = trades.sort_values("entry_time", kind="stable").reset_index(drop=True)
+    trades.insert(0, "id", np.arange(1, len(trades) + 1))
+
+    return trades[TRADE_COLUMNS], _daily_pnl(trades, trade_days)
+
+
+def _daily_pnl(trades: pd.DataFrame, trade_days: Optional[List[date]] = None) -> pd.DataFrame:
+    """Sum realized P&L per exit date, like calculate_and_save_daily_pnl (0 on days without trades)"""
+    if trades.empty:
+        daily = pd.Series(dtype=float)
+    else:
+        profit = (trades["exit_price"] - trades["entry_price"]) * trades["qty"]
+        daily = profit.groupby(pd.to_datetime(trades["exit_time"]).dt.date).sum()
+    if trade_days is not None:
+        daily = daily.reindex(sorted(set(trade_days) | set(daily.index)), fill_value=0.0)
+    daily_pnl = daily.round(2).rename("total_pnl").rename_axis("date").reset_index()
+    return daily_pnl
+
+
+def run_backtest(start_date: date, end_date: date, interval: str = "5m",
+                 capital_per_trade: float = CAPITAL_PER_TRADE,
+                 price_change_threshold: float = PRICE_CHANGE_THRESHOLD,
+                 volume_ratio_threshold: float = VOLUME_RATIO_THRESHOLD) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Download history for [start_date, end_date] and simulate the live strategy over it"""
+    bhav_history = load_bhavcopy_history(start_date, end_date)
+    if bhav_history.empty:
+        logger.warning("No bhavcopy data in range")
+        return simulate(pd.DataFrame(), pd.DataFrame())
+
+    metrics = bhavcopy_metrics_history(bhav_history)
+    signals = screen_history(metrics, price_change_threshold, volume_ratio_threshold)
+    bars = load_intraday_bars(signals, interval)
+    trade_days = sorted(metrics["trade_date"].unique())
+    return simulate(signals, bars, capital_per_trade, trade_days=trade_days)
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Backtest the momentum strategy on historical data")
+    parser.add_argument("--start", required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", default=datetime.now(IST).strftime("%Y-%m-%d"), help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--interval", default="5m", help="Intraday bar interval (1m, 5m, 15m, 1h)")
+    parser.add_argument("--output", default="backtest", help="Prefix for the trades/daily_pnl CSV files")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    trades, daily_pnl = run_backtest(
+        datetime.strptime(args.start, "%Y-%m-%d").date(),
+        datetime.strptime(args.end, "%Y-%m-%d").date(),
+        args.interval
+    )
+    trades.to_csv(f"{args.output}_trades.csv", index=False)
+    daily_pnl.to_csv(f"{args.output}_daily_pnl.csv", index=False)
+
+    total_pnl = daily_pnl["total_pnl"].sum() if not daily_pnl.empty else 0.0
+    print(f"Trades: {len(trades)} | Total P&L: ₹{total_pnl:,.2f}")
+    print(f"Saved {args.output}_trades.csv and {args.output}_daily_pnl.csv")
+
+
+if __name__ == "__main__":
+    main()
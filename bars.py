@@ -0,0 +1,173 @@
+"""
+Intraday Bars - 1-minute OHLC bars built from the quotes the bot polls anyway
+Each symbol gets a fixed-size numpy ring buffer, so memory per symbol stays
+constant however long the bot runs; rules read bars instead of fetching history
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from trading_engine import IST
+
+BAR_SECONDS = 60
+# A full NSE session (9:15 AM - 3:30 PM) is 375 one-minute bars
+BAR_CAPACITY = 375
+
+BAR_COLUMNS = ["symbol", "start", "open", "high", "low", "close", "ticks"]
+
+
+class BarRing:
+    """The most recent `capacity` 1-minute bars of one symbol"""
+
+    def __init__(self, capacity: int = BAR_CAPACITY):
+        # Bar start in epoch seconds, and open/high/low/close per slot
+        self.starts = np.zeros(capacity, dtype=np.int64)
+        self.ohlc = np.zeros((capacity, 4), dtype=np.float64)
+        self.ticks = np.zeros(capacity, dtype=np.int32)
+        self.count = 0
+        self._newest = -1
+
+    def add(self, price: float, epoch: int):
+        """Fold one quote into its minute's bar (quotes older than the newest bar are dropped)"""
+        start = epoch - epoch % BAR_SECONDS
+        if self.count:
+            newest_start = self.starts[self._newest]
+            if start == newest_start:
+                bar = self.ohlc[self._newest]
+                bar[1] = max(bar[1], price)
+                bar[2] = min(bar[2], price)
+                bar[3] = price
+                self.ticks[self._newest] += 1
+                return
+            if start < newest_start:
+                return
+
+        # New minute - overwrite the oldest slot once the ring is full
+        self._newest = (self._newest + 1) % len(self.starts)
+        self.starts[self._newest] = start
+        self.ohlc[self._newest] = price
+        self.ticks[self._newest] = 1
+        self.count = min(self.count + 1, len(self.starts))
+
+    def _order(self) -> np.ndarray:
+        """Slot indices, oldest bar first"""
+        return (np.arange(self.count) + self._newest + 1 - self.count) % len(self.starts)
+
+    def completed_closes(self, epoch: int, since: int = 0) -> np.ndarray:
+        """Closes of the bars started at or after since whose minute has ended by epoch, oldest first"""
+        order = self._order()
+        starts = self.starts[order]
+        return self.ohlc[order[(starts >= since) & (starts + BAR_SECONDS <= epoch)], 3]
+
+
+class BarStore:
+    """Thread-safe map of symbol -> BarRing, fed with each tick's quotes"""
+
+    def __init__(self, capacity: int = BAR_CAPACITY):
+        self.capacity = capacity
+        self._rings: Dict[str, BarRing] = {}
+        self._lock = threading.Lock()
+
+    def record(self, prices: Dict[str, float], when: datetime):
+        """Add one tick's quotes (missing and NaN prices are skipped)"""
+        epoch = int(when.timestamp())
+        with self._lock:
+            for symbol, price in prices.items():
+                if price is None or not price > 0:
+                    continue
+                ring = self._rings.get(symbol)
+                if ring is None:
+                    ring = self._rings[symbol] = BarRing(self.capacity)
+                ring.add(float(price), epoch)
+
+    def completed_closes(self, symbol: str, now: datetime) -> np.ndarray:
+        """Closes of the symbol's finished 1-minute bars from now's date, oldest first (empty if none)"""
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        with self._lock:
+            ring = self._rings.get(symbol)
+            if ring is None:
+                return np.empty(0)
+            return ring.completed_closes(int(now.timestamp()), int(day_start.timestamp()))
+
+    def clear(self):
+        """Drop every symbol's bars (start of a new session)"""
+        with self._lock:
+            self._rings = {}
+
+    def to_frame(self) -> pd.DataFrame:
+        """All bars as rows of BAR_COLUMNS (start in IST), oldest first per symbol"""
+        frames = []
+        with self._lock:
+            for symbol, ring in self._rings.items():
+                order = ring._order()
+                ohlc = ring.ohlc[order]
+                frames.append(pd.DataFrame({
+                    "symbol": symbol,
+                    "start": ring.starts[order],
+                    "open": ohlc[:, 0], "high": ohlc[:, 1], "low": ohlc[:, 2], "close": ohlc[:, 3],
+                    "ticks": ring.ticks[order],
+                }))
+        if not frames:
+            return pd.DataFrame(columns=BAR_COLUMNS)
+        bars = pd.concat(frames, ignore_index=True)
+        bars["start"] = pd.to_datetime(bars["start"], unit="s", utc=True).dt.tz_convert(IST)
+        return bars
+
+    @classmethod
+    def from_frame(cls, bars: pd.DataFrame, capacity: int = BAR_CAPACITY) -> "BarStore":
+        """Rebuild a store from to_frame() rows"""
+        store = cls(capacity)
+        starts = pd.to_datetime(bars["start"]).map(lambda start: int(start.timestamp()))
+        for symbol, rows in bars.assign(epoch=starts).groupby("symbol", sort=False):
+            ring = store._rings[symbol] = BarRing(capacity)
+            for row in rows.tail(capacity).itertuples(index=False):
+                ring._newest = (ring._newest + 1) % capacity
+                ring.starts[ring._newest] = row.epoch
+                ring.ohlc[ring._newest] = (row.open, row.high, row.low, row.close)
+                ring.ticks[ring._newest] = row.ticks
+                ring.count = min(ring.count + 1, capacity)
+        return store
+
+
+# ============= PERSISTENCE =============
+
+def bars_path(directory: str, session_date) -> str:
+    """Where one session's bars are saved"""
+    return os.path.join(directory, f"bars_{session_date:%Y%m%d}.npz")
+
+
+def save_bars(store: BarStore, path: str):
+    """Write all bars to a compressed .npz, one array per column"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    bars = store.to_frame()
+    np.savez_compressed(
+        path,
+        symbol=bars["symbol"].to_numpy(dtype=str),
+        start=bars["start"].map(lambda start: int(start.timestamp())).to_numpy(dtype=np.int64),
+        **{column: bars[column].to_numpy(dtype=float) for column in ("open", "high", "low", "close")},
+        ticks=bars["ticks"].to_numpy(dtype=np.int32),
+    )
+
+
+def load_bars(path: str, capacity: int = BAR_CAPACITY) -> BarStore:
+    """Read bars written by save_bars"""
+    with np.load(path) as saved:
+        bars = pd.DataFrame({column: saved[column] for column in BAR_COLUMNS})
+    bars["start"] = pd.to_datetime(bars["start"], unit="s", utc=True).dt.tz_convert(IST)
+    return BarStore.from_frame(bars, capacity)
+
+
+def quotes_from_bars(bars: pd.DataFrame) -> pd.DataFrame:
+    """
+    Replay quotes (timestamp, symbol, price) from saved bars: each bar's open at
+    its first second and its close at its last, so every bar closes where it did live.
+    """
+    opens = pd.DataFrame({"timestamp": bars["start"], "symbol": bars["symbol"], "price": bars["open"]})
+    closes = pd.DataFrame({"timestamp": bars["start"] + pd.Timedelta(seconds=BAR_SECONDS - 1),
+                           "symbol": bars["symbol"], "price": bars["close"]})
+    return pd.concat([opens, closes], ignore_index=True).sort_values("timestamp", kind="stable")
@@ -0,0 +1,334 @@
+"""
+Engine Benchmarks - Time the hot trading_engine functions against in-process fakes
+A fake psycopg2 connection stands in for Postgres and a fake quote source for the
+price providers, so the real SQL-building and rule code is what gets measured
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import trading_engine
+from trading_engine import (
+    IST, SimulatedClock, set_clock, open_positions_for_watchlist,
+    update_positions_and_apply_exits, force_eod_exit, save_watchlist,
+    calculate_and_save_daily_pnl, fetch_prices
+)
+
+BASELINE_FILE = "benchmark_baseline.json"
+# A benchmark regresses when its median is this much slower than the baseline
+REGRESSION_THRESHOLD = 0.20
+
+# Cold-import times of the worker's startup path are benchmarked too
+IMPORT_MODULES = ["config", "trading_engine", "autonomous_trader"]
+
+SESSION_TIME = datetime(2025, 3, 14, 10, 30)
+EOD_TIME = datetime(2025, 3, 14, 15, 16)
+
+
+# ============= FAKE DATABASE =============
+
+class FakeDatabase:
+    """In-memory tables answering exactly the statements trading_engine issues"""
+
+    def __init__(self):
+        self.trades: Dict[int, list] = {}
+        self.watchlist: List[tuple] = []
+        self.daily_pnl: Dict[str, float] = {}
+
+    def connect(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+
+    def cursor(self):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, db: FakeDatabase):
+        self.db = db
+        self._result = None
+
+    def execute(self, query: str, params: tuple = ()):
+        statement = " ".join(query.split())
+        db = self.db
+        if statement.startswith("INSERT INTO trades"):
+            trade_id = len(db.trades) + 1
+            # symbol, entry_price, qty, max_profit_pct, is_open, exit_reason, entry_time, exit_time, exit_price, pnl_pct, strategy
+            db.trades[trade_id] = list(params)
+            self._result = (trade_id,)
+        elif statement.startswith("UPDATE trades AS t"):
+            for trade_id, exit_reason, exit_time, exit_price, pnl_pct, max_profit_pct in zip(*params):
+                row = db.trades[trade_id]
+                if row[4]:
+                    row[3], row[4], row[5], row[7], row[8], row[9] = (
+                        max_profit_pct, False, exit_reason, exit_time, exit_price, pnl_pct)
+        elif statement.startswith("UPDATE trades"):
+            is_open, exit_reason, exit_time, exit_price, pnl_pct, max_profit_pct, trade_id = params
+            row = db.trades[trade_id]
+            row[3], row[4], row[5], row[7], row[8], row[9] = (
+                max_profit_pct, is_open, exit_reason, exit_time, exit_price, pnl_pct)
+        elif statement.startswith("DELETE FROM watchlist"):
+            db.watchlist = [row for row in db.watchlist if row[0] != params[0]]
+        elif statement.startswith("INSERT INTO watchlist"):
+            db.watchlist.append(params)
+        elif statement.startswith("SELECT SUM((exit_price - entry_price) * qty)"):
+            total = sum((row[8] - row[1]) * row[2] for row in db.trades.values()
+                        if not row[4] and row[7] and row[7].startswith(params[0]))
+            self._result = (total or None,)
+        elif statement.startswith("INSERT INTO daily_pnl"):
+            db.daily_pnl[params[0]] = params[1]
+        else:
+            raise NotImplementedError(f"FakeCursor does not handle: {statement[:60]}")
+
+    def fetchone(self):
+        return self._result
+
+    def close(self):
+        pass
+
+
+# ============= FIXTURES =============
+
+def make_watchlist(size: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Watchlist rows shaped like get_watchlist_from_db"""
+    close = rng.uniform(50, 2000, size)
+    return pd.DataFrame({
+        "SYMBOL": [f"SYM{i:05d}" for i in range(size)],
+        "price_change_pct": rng.uniform(5, 20, size),
+        "volume_ratio": rng.uniform(5, 30, size),
+        "HIGH_PRICE_last": close * 1.02,
+        "CLOSE_PRICE_last": close,
+        "CLOSE_PRICE_previous": close / 1.08,
+    })
+
+
+def make_positions(size: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Open positions shaped like get_open_trades"""
+    entry = rng.uniform(50, 2000, size)
+    return pd.DataFrame({
+        "id": np.arange(1, size + 1),
+        "SYMBOL": [f"SYM{i:05d}" for i in range(size)],
+        "entry_price": entry,
+        "qty": (10000 // entry).astype(int),
+        "max_profit_pct": rng.uniform(0, 5, size),
+        "is_open": True,
+        "exit_reason": "",
+        "entry_time": pd.Timestamp(SESSION_TIME),
+        "exit_time": None,
+        "exit_price": None,
+        "pnl_pct": 0.0,
+        "current_price": None,
+        "pnl_abs": 0,
+        "strategy": trading_engine.DEFAULT_STRATEGY,
+    })
+
+
+def seed_trades(db: FakeDatabase, positions: pd.DataFrame):
+    """Insert positions into the fake trades table as they would be after save_trade"""
+    for row in positions.itertuples():
+        db.trades[row.id] = [row.SYMBOL, row.entry_price, row.qty, row.max_profit_pct, True, "",
+                             "2025-03-14 10:30:00", None, None, 0.0, row.strategy]
+
+
+def quote_provider(reference: Dict[str, float], rng: np.random.Generator) -> Callable:
+    """Fake _fetch_price_from: reference price moved by up to +/-4%, so some rules fire"""
+    moves = {symbol: rng.uniform(0.96, 1.04) for symbol in reference}
+
+    def fetch(symbol: str, source: str) -> float:
+        return reference[symbol] * moves[symbol]
+    return fetch
+
+
+# ============= RUNNER =============
+
+def measure(run: Callable, setup: Callable, repeat: int) -> List[float]:
+    """Time run(setup()) repeat times, excluding setup"""
+    timings = []
+    for _ in range(repeat):
+        args = setup()
+        started = time.perf_counter()
+        run(*args)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def measure_import(module: str, repeat: int) -> List[float]:
+    """Time `import module` repeat times, each in a fresh interpreter"""
+    code = f"import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+    timings = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        timings.append(float(result.stdout.split()[-1]))
+    return timings
+
+
+def run_benchmarks(watchlist_sizes: List[int], position_counts: List[int], repeat: int = 5,
+                   import_modules: Optional[List[str]] = None) -> Dict[str, Dict]:
+    """
+    Run every benchmark at every size against a fresh fake DB and quote source,
+    plus the cold-import time of each of import_modules (default IMPORT_MODULES).
+
+    Returns:
+        Dict of benchmark name -> {"median": seconds, "min": seconds}
+    """
+    rng = np.random.default_rng(42)
+    db = FakeDatabase()
+    # The fake quote source is called in-process, with no rate limit or journal
+    # (they would time the quote service, governor and disk instead)
+    originals = (trading_engine.get_db_connection, trading_engine._fetch_price_from,
+                 trading_engine.QUOTE_GOVERNOR, trading_engine.QUOTE_JOURNAL, trading_engine.QUOTE_CLIENT)
+    clock = SimulatedClock(IST.localize(SESSION_TIME))
+    previous_clock = set_clock(clock)
+    results = {}
+
+    def record(name: str, timings: List[float]):
+        results[name] = {"median": statistics.median(timings), "min": min(timings)}
+        print(f"{name:<55} median {results[name]['median'] * 1000:9.2f} ms   min {results[name]['min'] * 1000:9.2f} ms")
+
+    for module in IMPORT_MODULES if import_modules is None else import_modules:
+        record(f"import[{module}]", measure_import(module, repeat))
+
+    try:
+        trading_engine.get_db_connection = db.connect
+        trading_engine.QUOTE_GOVERNOR = trading_engine.QUOTE_JOURNAL = trading_engine.QUOTE_CLIENT = None
+
+        for size in watchlist_sizes:
+            watchlist = make_watchlist(size, rng)
+            reference = dict(zip(watchlist["SYMBOL"], watchlist["CLOSE_PRICE_last"]))
+            trading_engine._fetch_price_from = quote_provider(reference, rng)
+            prices = fetch_prices(watchlist["SYMBOL"])
+
+            clock.advance_to(IST.localize(SESSION_TIME))
+            record(f"fetch_prices[watchlist={size}]",
+                   measure(fetch_prices, lambda: (watchlist["SYMBOL"],), repeat))
+            record(f"open_positions_for_watchlist[watchlist={size}]",
+                   measure(lambda w, p: open_positions_for_watchlist(w, p, prices=prices, traded_today=set()),
+                           lambda: (watchlist, pd.DataFrame()), repeat))
+            record(f"save_watchlist[watchlist={size}]",
+                   measure(save_watchlist, lambda: (watchlist,), repeat))
+
+        for count in position_counts:
+            positions = make_positions(count, rng)
+            reference = dict(zip(positions["SYMBOL"], positions["entry_price"]))
+            trading_engine._fetch_price_from = quote_provider(reference, rng)
+            prices = fetch_prices(positions["SYMBOL"])
+
+            def fresh_positions():
+                db.trades.clear()
+                seed_trades(db, positions)
+                return positions.copy(), prices
+
+            clock.advance_to(IST.localize(SESSION_TIME))
+            record(f"update_positions_and_apply_exits[positions={count}]",
+                   measure(update_positions_and_apply_exits, fresh_positions, repeat))
+
+            clock.advance_to(IST.localize(EOD_TIME))
+            record(f"force_eod_exit[positions={count}]",
+                   measure(force_eod_exit, fresh_positions, repeat))
+
+            # Every position closed at EOD, then the day's P&L is summed
+            db.trades.clear()
+            seed_trades(db, positions)
+            force_eod_exit(positions.copy(), prices)
+            record(f"calculate_and_save_daily_pnl[positions={count}]",
+                   measure(calculate_and_save_daily_pnl, lambda: (), repeat))
+    finally:
+        (trading_engine.get_db_connection, trading_engine._fetch_price_from,
+         trading_engine.QUOTE_GOVERNOR, trading_engine.QUOTE_JOURNAL, trading_engine.QUOTE_CLIENT) = originals
+        set_clock(previous_clock)
+
+    return results
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                     threshold: float = REGRESSION_THRESHOLD) -> List[Tuple[str, float, float]]:
+    """
+    Compare medians against the baseline.
+
+    Returns:
+        List of (benchmark name, baseline median, current median) that got slower than threshold allows
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and result["median"] > previous["median"] * (1 + threshold):
+            regressions.append((name, previous["median"], result["median"]))
+    return regressions
+
+
+def load_baseline(path: str) -> Optional[Dict[str, Dict]]:
+    """Read a baseline written by --save-baseline (None if there is none)"""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def _ints(text: str) -> List[int]:
+    """Parse a comma separated list of integers"""
+    return [int(value) for value in text.split(",")]
+
+
+def _names(text: str) -> List[str]:
+    """Parse a comma separated list of names (empty text = none)"""
+    return [value for value in text.split(",") if value]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Benchmark the hot trading engine functions")
+    parser.add_argument("--watchlist", type=_ints, default=[50, 200, 1000], help="Watchlist sizes")
+    parser.add_argument("--positions", type=_ints, default=[10, 50, 200], help="Open position counts")
+    parser.add_argument("--imports", type=_names, default=IMPORT_MODULES,
+                        help="Modules whose cold import is timed (empty to skip)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Record these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="Allowed slowdown vs baseline (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.watchlist, args.positions, args.repeat, args.imports)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    baseline = load_baseline(args.baseline)
+    if baseline is None:
+        print(f"No baseline at {args.baseline} - run with --save-baseline first")
+        return
+
+    regressions = find_regressions(results, baseline, args.threshold)
+    for name, before, after in regressions:
+        print(f"❌ REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms (+{(after / before - 1) * 100:.0f}%)")
+    if regressions:
+        raise SystemExit(1)
+    print(f"✅ No regressions beyond {args.threshold:.0%} of baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,64 @@
 """
 Configuration loader - Load environment variables from .env file or Streamlit secrets
+Secrets are read straight from secrets.toml, so loading config never imports streamlit
 """
 
 import os
+import json
 from dotenv import load_dotenv
 from pathlib import Path
 
-# Try to load from Streamlit secrets first (when deployed on Streamlit Cloud)
 try:
-    import streamlit as st
-    if hasattr(st, 'secrets'):
-        # Running on Streamlit Cloud - use secrets
-        DB_CONFIG = {
-            'host': st.secrets.get('SUPABASE_HOST'),
-            'database': st.secrets.get('SUPABASE_DB', 'postgres'),
-            'user': st.secrets.get('SUPABASE_USER', 'postgres.lmthbkyiwtfbvjvtedjs'),
-            'password': st.secrets.get('SUPABASE_PASSWORD'),
-            'port': st.secrets.get('SUPABASE_PORT', '6543')
-        }
-        CAPITAL_PER_TRADE = float(st.secrets.get('CAPITAL_PER_TRADE', '10000'))
-        PRICE_CHANGE_THRESHOLD = float(st.secrets.get('PRICE_CHANGE_THRESHOLD', '5.0'))
-        VOLUME_RATIO_THRESHOLD = float(st.secrets.get('VOLUME_RATIO_THRESHOLD', '5.0'))
-    else:
-        raise ImportError("Streamlit secrets not available")
-except (ImportError, FileNotFoundError):
+    import tomllib
+except ImportError:  # Python < 3.11 - secrets.toml is then ignored
+    tomllib = None
+
+# Where Streamlit looks for secrets; the project file overrides the user-wide one
+SECRETS_PATHS = (
+    Path.home() / '.streamlit' / 'secrets.toml',
+    Path.cwd() / '.streamlit' / 'secrets.toml',
+)
+
+
+def load_secrets(paths=SECRETS_PATHS) -> dict:
+    """Merged contents of the secrets.toml files that exist (empty if none)"""
+    secrets = {}
+    if tomllib is None:
+        return secrets
+    for path in paths:
+        if path.is_file():
+            with open(path, 'rb') as f:
+                secrets.update(tomllib.load(f))
+    return secrets
+
+
+_secrets = load_secrets()
+
+# Use Streamlit secrets when present (deployed on Streamlit Cloud)
+if _secrets:
+    DB_CONFIG = {
+        'host': _secrets.get('SUPABASE_HOST'),
+        'database': _secrets.get('SUPABASE_DB', 'postgres'),
+        'user': _secrets.get('SUPABASE_USER', 'postgres.lmthbkyiwtfbvjvtedjs'),
+        'password': _secrets.get('SUPABASE_PASSWORD'),
+        'port': _secrets.get('SUPABASE_PORT', '6543')
+    }
+    CAPITAL_PER_TRADE = float(_secrets.get('CAPITAL_PER_TRADE', '10000'))
+    PRICE_CHANGE_THRESHOLD = float(_secrets.get('PRICE_CHANGE_THRESHOLD', '5.0'))
+    VOLUME_RATIO_THRESHOLD = float(_secrets.get('VOLUME_RATIO_THRESHOLD', '5.0'))
+    ENGINE_MODE = _secrets.get('ENGINE_MODE', 'threads')
+    STRATEGIES_JSON = _secrets.get('STRATEGIES', '')
+    SHARD_WORKERS = int(_secrets.get('SHARD_WORKERS', '0'))
+    MAX_CAPITAL_DEPLOYED = float(_secrets.get('MAX_CAPITAL_DEPLOYED', '0'))
+    SNAPSHOT_PATH = _secrets.get('SNAPSHOT_PATH', '')
+    METRICS_PORT = int(_secrets.get('METRICS_PORT', '0'))
+    BARS_DIR = _secrets.get('BARS_DIR', '')
+    POLL_BUDGET = float(_secrets.get('POLL_BUDGET', '0'))
+    QUOTE_RATE = float(_secrets.get('QUOTE_RATE', '0'))
+    TRADE_RETENTION_DAYS = int(_secrets.get('TRADE_RETENTION_DAYS', '0'))
+    QUOTE_JOURNAL_DIR = _secrets.get('QUOTE_JOURNAL_DIR', '')
+    QUOTE_SERVICE_URL = _secrets.get('QUOTE_SERVICE_URL', '')
+else:
     # Not running on Streamlit or secrets not configured - use .env file
     env_path = Path(__file__).parent / '.env'
     load_dotenv(dotenv_path=env_path)
@@ -39,12 +74,81 @@ except (ImportError, FileNotFoundError):
     CAPITAL_PER_TRADE = float(os.getenv('CAPITAL_PER_TRADE', '10000'))
     PRICE_CHANGE_THRESHOLD = float(os.getenv('PRICE_CHANGE_THRESHOLD', '5.0'))
     VOLUME_RATIO_THRESHOLD = float(os.getenv('VOLUME_RATIO_THRESHOLD', '5.0'))
+    
+    # Trading bot engine: 'threads' (default) or 'async'
+    ENGINE_MODE = os.getenv('ENGINE_MODE', 'threads')
+    
+    # Optional: JSON list of named strategies run side by side by one bot process
+    STRATEGIES_JSON = os.getenv('STRATEGIES', '')
+    
+    # Optional: price/evaluate the watchlist across this many worker processes (0 = off)
+    SHARD_WORKERS = int(os.getenv('SHARD_WORKERS', '0'))
+    
+    # Optional: cap on capital in open positions across all strategies (0 = no cap)
+    MAX_CAPITAL_DEPLOYED = float(os.getenv('MAX_CAPITAL_DEPLOYED', '0'))
+    
+    # Optional: local snapshot of the bot's state for fast restarts (empty = disabled)
+    SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '')
+    
+    # Optional: serve latency metrics at http://127.0.0.1:<port>/metrics (0 = off)
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+    
+    # Optional: each session's 1-minute bars are saved here at EOD for replay (empty = not saved)
+    BARS_DIR = os.getenv('BARS_DIR', '')
+    
+    # Optional: adaptive polling - quote symbols near a trigger more often, within
+    # this many quote requests per second across the whole bot (0 = poll everything every tick)
+    POLL_BUDGET = float(os.getenv('POLL_BUDGET', '0'))
+    
+    # Optional: hard cap on upstream quote requests per second, exits served before entries (0 = no cap).
+    # With SHARD_WORKERS, the bot and each worker get an equal share of it
+    QUOTE_RATE = float(os.getenv('QUOTE_RATE', '0'))
+    
+    # Optional: at EOD, move trades closed more than this many days ago to trades_archive (0 = never)
+    TRADE_RETENTION_DAYS = int(os.getenv('TRADE_RETENTION_DAYS', '0'))
+    
+    # Optional: every quote received is journaled here, one binary file per day (empty = not journaled)
+    QUOTE_JOURNAL_DIR = os.getenv('QUOTE_JOURNAL_DIR', '')
+    
+    # Optional: read quotes from the local quote service (python quote_service.py) instead of fetching
+    QUOTE_SERVICE_URL = os.getenv('QUOTE_SERVICE_URL', '')
+
+
+def load_strategies(raw: str) -> list:
+    """
+    Parse the STRATEGIES setting into a list of strategy dicts.
+    
+    Each entry needs a unique 'name'; thresholds and capital not given fall back
+    to the global CAPITAL_PER_TRADE / PRICE_CHANGE_THRESHOLD / VOLUME_RATIO_THRESHOLD.
+    'require_breakout': true also requires a 1-minute close above the previous day's high.
+    Without the setting a single 'default' strategy uses the globals.
+    """
+    entries = json.loads(raw) if raw else [{'name': 'default'}]
+    
+    strategies = []
+    for entry in entries:
+        strategies.append({
+            'name': str(entry['name']),
+            'capital_per_trade': float(entry.get('capital_per_trade', CAPITAL_PER_TRADE)),
+            'price_change_threshold': float(entry.get('price_change_threshold', PRICE_CHANGE_THRESHOLD)),
+            'volume_ratio_threshold': float(entry.get('volume_ratio_threshold', VOLUME_RATIO_THRESHOLD)),
+            'require_breakout': bool(entry.get('require_breakout', False)),
+        })
+    
+    names = [strategy['name'] for strategy in strategies]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate strategy names in STRATEGIES: {names}")
+    
+    return strategies
+
+
+STRATEGIES = load_strategies(STRATEGIES_JSON)
 
 
 def validate_config():
     """Validate that all required configuration is present"""
-    required_vars = ['SUPABASE_HOST', 'SUPABASE_PASSWORD']
-    missing = [var for var in required_vars if not os.getenv(var)]
+    required_vars = {'SUPABASE_HOST': DB_CONFIG['host'], 'SUPABASE_PASSWORD': DB_CONFIG['password']}
+    missing = [var for var, value in required_vars.items() if not value]
     
     if missing:
         raise ValueError(f"Missing required environment variables: {', '.join(missing)}")
@@ -62,6 +166,18 @@ if __name__ == "__main__":
     print(f"Capital per trade: ₹{CAPITAL_PER_TRADE:,.2f}")
     print(f"Price change threshold: {PRICE_CHANGE_THRESHOLD}%")
     print(f"Volume ratio threshold: {VOLUME_RATIO_THRESHOLD}x")
+    print(f"Engine mode: {ENGINE_MODE}")
+    print(f"Strategies: {', '.join(strategy['name'] for strategy in STRATEGIES)}")
+    print(f"Shard workers: {SHARD_WORKERS or 'off'}")
+    print(f"Max capital deployed: {f'₹{MAX_CAPITAL_DEPLOYED:,.2f}' if MAX_CAPITAL_DEPLOYED else 'no cap'}")
+    print(f"Snapshot path: {SNAPSHOT_PATH or 'disabled'}")
+    print(f"Metrics port: {METRICS_PORT or 'off'}")
+    print(f"Bars directory: {BARS_DIR or 'not saved'}")
+    print(f"Poll budget: {f'{POLL_BUDGET:g} quotes/s' if POLL_BUDGET else 'off'}")
+    print(f"Quote rate limit: {f'{QUOTE_RATE:g} requests/s' if QUOTE_RATE else 'none'}")
+    print(f"Quote journal: {QUOTE_JOURNAL_DIR or 'off'}")
+    print(f"Quote service: {QUOTE_SERVICE_URL or 'off (fetch in-process)'}")
+    print(f"Trade retention: {f'{TRADE_RETENTION_DAYS} days, then archived' if TRADE_RETENTION_DAYS else 'keep all'}")
     
     try:
         validate_config()
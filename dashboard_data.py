@@ -0,0 +1,93 @@
+"""
+Dashboard Data - Cached, shared DB reads for the Streamlit dashboard
+Results are shared by every viewer session and keyed by the version of the
+table they read, so a rerun only queries the DB when that data has changed
+"""
+
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+import streamlit as st
+
+from trading_engine import (
+    get_data_versions, get_open_trades, get_cumulative_pnl, get_daily_pnl,
+    get_pnl_rollup, get_watchlist_from_db, last_two_trading_days, get_live_marks,
+    get_trade_history, get_trade_history_summary, get_exit_reasons
+)
+
+# How stale the version check may be - at most one version query per this many seconds, for all viewers
+VERSION_TTL_SECONDS = 5
+# Live marks are republished by the trader every exit-monitor tick (5 s)
+MARKS_TTL_SECONDS = 5
+# Upper bound on any cached result, in case a change doesn't move a table's version
+DATA_TTL_SECONDS = 600
+
+
+@st.cache_data(ttl=VERSION_TTL_SECONDS, show_spinner=False)
+def data_versions() -> Dict[str, str]:
+    """Current version of each table (see get_data_versions)"""
+    return get_data_versions()
+
+
+@st.cache_data(ttl=MARKS_TTL_SECONDS, show_spinner=False)
+def live_marks() -> pd.DataFrame:
+    """Latest marks of open positions as published by the trader (no quote calls)"""
+    return get_live_marks()
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def open_trades(version: str) -> pd.DataFrame:
+    """Open trades at this trades-table version"""
+    return get_open_trades()
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def trade_history_page(start_date: date, end_date: date, symbol: str, exit_reason: Optional[str],
+                       after: Optional[Tuple[datetime, int]], version: str) -> pd.DataFrame:
+    """One keyset page of closed trades (see get_trade_history) at this trades-table version"""
+    return get_trade_history(start_date, end_date, symbol, exit_reason, after=after)
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def trade_history_summary(start_date: date, end_date: date, symbol: str, exit_reason: Optional[str],
+                          version: str) -> Dict[str, float]:
+    """Count, winners, losers, win rate and total profit of the filtered trade history"""
+    return get_trade_history_summary(start_date, end_date, symbol, exit_reason)
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def exit_reasons(version: str) -> List[str]:
+    """Distinct exit reasons of closed trades at this trades-table version"""
+    return get_exit_reasons()
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def watchlist(version: str) -> pd.DataFrame:
+    """Today's watchlist at this watchlist-table version"""
+    return get_watchlist_from_db()
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def cumulative_pnl(version: str) -> float:
+    """Sum of all saved daily P&L at this daily_pnl version"""
+    return float(get_cumulative_pnl())
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def daily_pnl(date_str: str, version: str) -> float:
+    """Saved P&L of one day at this daily_pnl version"""
+    return get_daily_pnl(date_str)
+
+
+@st.cache_data(ttl=DATA_TTL_SECONDS, show_spinner=False)
+def pnl_rollup(period: str, version: str, start_date=None, end_date=None) -> pd.DataFrame:
+    """Weekly/monthly/yearly P&L and win/loss stats, aggregated in SQL, at this daily_pnl version"""
+    return get_pnl_rollup(period, start_date, end_date)
+
+
+@st.cache_data(ttl=6 * 60 * 60, show_spinner=False)
+def trading_days(today: date) -> Tuple[date, date]:
+    """The last two trading days before today (holiday calendar fetched once per day, shared)"""
+    trade_date_last = last_two_trading_days(today)
+    return trade_date_last, last_two_trading_days(trade_date_last)
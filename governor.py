@@ -0,0 +1,84 @@
+"""
+Quote Governor - Process-wide token bucket for upstream quote requests
+Exit checks (and EOD exits) on open positions always get quota ahead of new-entry
+scans: entries leave a reserve of tokens untouched and yield to any waiting exit
+"""
+
+import threading
+import time
+
+from metrics import inc, observe
+
+# Priority classes, most urgent first
+PRIORITY_EXIT = 0
+PRIORITY_ENTRY = 1
+PRIORITY_NAMES = {PRIORITY_EXIT: "exit", PRIORITY_ENTRY: "entry"}
+
+# Longest a request waits for a token before it is deferred (skipped this tick)
+MAX_WAIT_SECONDS = {PRIORITY_EXIT: 5.0, PRIORITY_ENTRY: 1.0}
+
+# Share of the bucket only exits may spend
+EXIT_RESERVE_FRACTION = 0.25
+
+
+class QuoteGovernor:
+    """
+    Token bucket refilled at `rate` requests/second, holding up to one second's worth
+    (and at low rates always enough for one entry on top of the exit reserve)
+    """
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.reserve = max(1.0, rate) * EXIT_RESERVE_FRACTION
+        self.capacity = max(rate, 1.0 + self.reserve)
+        self._tokens = self.capacity
+        self._refilled = time.monotonic()
+        self._exits_waiting = 0
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._refilled) * self.rate)
+        self._refilled = now
+
+    def _needed(self, priority: int) -> float:
+        """Tokens that must be in the bucket for this priority to take one"""
+        return 1.0 if priority == PRIORITY_EXIT else 1.0 + self.reserve
+
+    def acquire(self, priority: int = PRIORITY_EXIT) -> bool:
+        """
+        Take one token, waiting up to MAX_WAIT_SECONDS for the priority.
+
+        Returns:
+            True if the request may go ahead, False if it was deferred
+        """
+        name = PRIORITY_NAMES[priority]
+        started = time.monotonic()
+        deadline = started + MAX_WAIT_SECONDS[priority]
+        throttled = False
+        with self._cond:
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    needed = self._needed(priority)
+                    blocked_by_exits = priority != PRIORITY_EXIT and self._exits_waiting
+                    if self._tokens >= needed and not blocked_by_exits:
+                        self._tokens -= 1.0
+                        break
+                    if not throttled:
+                        throttled = True
+                        inc("trader_quote_throttled_total", priority=name)
+                        if priority == PRIORITY_EXIT:
+                            self._exits_waiting += 1
+                    if now >= deadline:
+                        inc("trader_quote_deferred_total", priority=name)
+                        return False
+                    # Sleep until enough tokens should have accrued (or an exit finishes waiting)
+                    shortfall = max(needed - self._tokens, 0.0) / self.rate
+                    self._cond.wait(min(max(shortfall, 0.001), deadline - now))
+            finally:
+                if throttled and priority == PRIORITY_EXIT:
+                    self._exits_waiting -= 1
+                    self._cond.notify_all()
+        observe("trader_quote_wait_seconds", time.monotonic() - started, priority=name)
+        return True
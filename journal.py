@@ -0,0 +1,161 @@
+"""
+Quote Journal - Every quote the bot receives, appended to a per-day binary file
+Records are fixed-width (QUOTE_RECORD, 21 bytes), so a day's file opens as a numpy
+structured array through np.memmap without parsing; symbol names live in a small
+text sidecar whose line number is the record's symbol_id
+"""
+
+import glob
+import os
+import struct
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# symbol_id, time the quote was received in epoch milliseconds, price, source (index into trading_engine.PRICE_SOURCES)
+QUOTE_RECORD = np.dtype([
+    ("symbol_id", "<u4"),
+    ("timestamp_ms", "<i8"),
+    ("price", "<f8"),
+    ("source", "u1"),
+])
+_PACK = struct.Struct("<IqdB")
+assert _PACK.size == QUOTE_RECORD.itemsize
+
+# Buffered records reach the file at least this often (by a background thread), so readers see a live day
+FLUSH_SECONDS = 5.0
+
+
+def journal_path(directory: str, session_date, suffix: str = "") -> str:
+    """Where one day's quotes are journaled (suffix keeps other writer processes apart)"""
+    return os.path.join(directory, f"quotes_{session_date:%Y%m%d}{suffix}.bin")
+
+
+def _symbols_path(path: str) -> str:
+    return path[:-len(".bin")] + ".symbols"
+
+
+class QuoteJournal:
+    """Thread-safe appender of quote records, rolling to a new file each day"""
+
+    def __init__(self, directory: str, suffix: str = ""):
+        self.directory = directory
+        self.suffix = suffix
+        self._date = None
+        self._file = None
+        self._symbols_file = None
+        self._symbol_ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._flusher = None
+        self._stop_flusher = threading.Event()
+
+    def _open(self, session_date):
+        """Switch to session_date's file, picking up symbols already journaled there"""
+        self._close()
+        os.makedirs(self.directory, exist_ok=True)
+        path = journal_path(self.directory, session_date, self.suffix)
+        symbols = read_symbols(_symbols_path(path))
+        self._symbol_ids = {symbol: i for i, symbol in enumerate(symbols)}
+        # Drop any torn record a crash left at the end, so every record stays aligned
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            if size % QUOTE_RECORD.itemsize:
+                os.truncate(path, size - size % QUOTE_RECORD.itemsize)
+        self._file = open(path, "ab")
+        self._symbols_file = open(_symbols_path(path), "a", encoding="utf-8")
+        self._date = session_date
+        if self._flusher is None:
+            self._stop_flusher.clear()
+            self._flusher = threading.Thread(target=self._flush_periodically, name="quote-journal-flush",
+                                             daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        """Flush every FLUSH_SECONDS, whether or not new quotes arrive, until close()"""
+        while not self._stop_flusher.wait(FLUSH_SECONDS):
+            self.flush()
+
+    def _close(self):
+        for handle in (self._file, self._symbols_file):
+            if handle is not None:
+                handle.close()
+        self._file = self._symbols_file = None
+        self._date = None
+
+    def record(self, symbol: str, price: float, source: int, when: datetime):
+        """Append one quote"""
+        with self._lock:
+            if when.date() != self._date:
+                self._open(when.date())
+            symbol_id = self._symbol_ids.get(symbol)
+            if symbol_id is None:
+                symbol_id = self._symbol_ids[symbol] = len(self._symbol_ids)
+                # The name must be on disk before any record that refers to it
+                self._symbols_file.write(symbol + "\n")
+                self._symbols_file.flush()
+            self._file.write(_PACK.pack(symbol_id, int(when.timestamp() * 1000), price, source))
+
+    def flush(self):
+        """Push buffered records to the file"""
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        """Flush and close the current day's files, and stop the background flush"""
+        with self._lock:
+            self._close()
+            flusher, self._flusher = self._flusher, None
+        self._stop_flusher.set()
+        if flusher is not None and flusher is not threading.current_thread():
+            flusher.join()
+
+
+# ============= READING =============
+
+def read_symbols(path: str) -> List[str]:
+    """Symbol names of a journal, indexed by symbol_id"""
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as handle:
+        return handle.read().splitlines()
+
+
+def read_journal(path: str) -> Tuple[np.ndarray, List[str]]:
+    """
+    Memory-map one journal file (no copy; a torn last record is left out).
+
+    Returns:
+        Tuple of (QUOTE_RECORD array, symbol names indexed by symbol_id)
+    """
+    symbols = read_symbols(_symbols_path(path))
+    count = os.path.getsize(path) // QUOTE_RECORD.itemsize
+    if count == 0:
+        return np.empty(0, dtype=QUOTE_RECORD), symbols
+    return np.memmap(path, dtype=QUOTE_RECORD, mode="r", shape=(count,)), symbols
+
+
+def journal_frame(records: np.ndarray, symbols: Sequence[str],
+                  sources: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """Journal records as (timestamp in IST, symbol, price, source) rows, in journal order"""
+    frame = pd.DataFrame({
+        "timestamp": pd.to_datetime(records["timestamp_ms"], unit="ms", utc=True).tz_convert("Asia/Kolkata"),
+        "symbol": np.asarray(symbols, dtype=object)[records["symbol_id"]] if len(records) else [],
+        "price": records["price"],
+        "source": records["source"],
+    })
+    if sources is not None:
+        frame["source"] = np.asarray(sources, dtype=object)[frame["source"].to_numpy(dtype=int)]
+    return frame
+
+
+def load_journal(directory: str, session_date, sources: Optional[Sequence[str]] = None) -> pd.DataFrame:
+    """A day's quotes from every writer process (main bot and shard workers), oldest first"""
+    pattern = os.path.join(directory, f"quotes_{session_date:%Y%m%d}*.bin")
+    frames = [journal_frame(*read_journal(path), sources) for path in sorted(glob.glob(pattern))]
+    if not frames:
+        return journal_frame(np.empty(0, dtype=QUOTE_RECORD), [], sources)
+    return pd.concat(frames, ignore_index=True).sort_values("timestamp", kind="stable", ignore_index=True)
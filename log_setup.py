@@ -0,0 +1,116 @@
+"""
+Logging Setup - Non-blocking, structured logging for the trading bot
+Callers only enqueue records; a background listener writes JSON lines to a
+size-rotated file and readable lines to the console
+"""
+
+import atexit
+import json
+import logging
+import multiprocessing
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Tuple
+
+LOG_FILE = "trading_bot.log"
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUP_COUNT = 5
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# Fields passed via `extra=` that are copied into each JSON event
+STRUCTURED_FIELDS = ("symbol", "strategy", "phase", "task", "source", "latency_ms",
+                     "event", "exit_reason", "price", "qty", "pnl_pct")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, thread, message and any structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": datetime.fromtimestamp(record.created).astimezone().isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        # Records relayed from shard worker processes (see setup_worker_logging)
+        if record.processName != "MainProcess":
+            event["process"] = record.processName
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                event[field] = value
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: int = logging.INFO, log_file: str = LOG_FILE,
+                  max_bytes: int = LOG_MAX_BYTES, backup_count: int = LOG_BACKUP_COUNT) -> QueueListener:
+    """
+    Route all logging through an unbounded queue so log I/O never blocks the caller.
+
+    Returns:
+        The running listener (stopped automatically at exit; stop() flushes it earlier)
+    """
+    log_queue = queue.SimpleQueue()
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=max_bytes, backupCount=backup_count,
+                                       encoding="utf-8")
+    file_handler.setFormatter(JsonFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+    listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener.start()
+    atexit.register(_stop_listener, listener)
+    return listener
+
+
+def _stop_listener(listener: QueueListener):
+    """Flush and stop a listener, unless it was already stopped"""
+    if listener._thread is not None:
+        listener.stop()
+
+
+# ============= WORKER PROCESSES =============
+
+class _ParentHandler(logging.Handler):
+    """Re-log a worker process's record through this process's own handlers"""
+
+    def emit(self, record: logging.LogRecord):
+        logging.getLogger(record.name).handle(record)
+
+
+def start_worker_log_listener() -> Tuple[multiprocessing.Queue, QueueListener]:
+    """
+    Queue that worker processes log into (see setup_worker_logging), drained
+    into this process's logging by a background listener.
+
+    Returns:
+        Tuple of (queue to hand to the workers, running listener - stop() it after the workers exit)
+    """
+    log_queue = multiprocessing.Queue()
+    listener = QueueListener(log_queue, _ParentHandler())
+    listener.start()
+    return log_queue, listener
+
+
+def setup_worker_logging(log_queue: multiprocessing.Queue, level: int = logging.INFO):
+    """
+    In a worker process: send all logging to the parent's queue.
+    A forked worker inherits the parent's in-process queue but not the thread that
+    drains it, so without this its records would pile up unwritten.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(level)
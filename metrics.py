@@ -0,0 +1,157 @@
+"""
+Metrics - In-process latency histograms and counters for the trading bot
+Exposed in Prometheus text format over a small local HTTP endpoint
+"""
+
+import bisect
+import contextlib
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+# Upper bounds (seconds) of the histogram buckets, from in-memory work to slow quote calls
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Recent observations kept per series for p50/p95/p99
+RESERVOIR_SIZE = 2048
+
+HELP = {
+    "trader_tick_seconds": "Duration of one exit-monitor or entry-scan pass",
+    "trader_phase_seconds": "Duration of each phase of a trading pass",
+    "trader_quote_seconds": "Duration of one quote request, per price source",
+    "trader_quotes_total": "Quote requests per price source and result (hit, miss, error)",
+    "trader_quote_wait_seconds": "Time a quote request waited for the quote governor, per priority",
+    "trader_quote_throttled_total": "Quote requests that had to wait for a governor token, per priority",
+    "trader_quote_deferred_total": "Quote requests skipped after waiting too long for a token, per priority",
+    "trader_quote_service_requests_total": "Quote service lookups by result (cached, coalesced, fetched)",
+    "trader_db_seconds": "Duration of each database call",
+    "trader_db_errors_total": "Database calls that raised",
+}
+
+
+class Histogram:
+    """Cumulative-bucket histogram plus a window of recent observations"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+        self.recent.append(value)
+
+
+class MetricsRegistry:
+    """Thread-safe store of histograms and counters keyed by (name, labels)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+
+    def observe(self, name: str, seconds: float, **labels):
+        """Record one duration"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        """Increment a counter"""
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    @contextlib.contextmanager
+    def timed(self, name: str, **labels):
+        """Record the wall time of the with-block (also when it raises)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def quantiles(self, name: str, qs=(50, 95, 99), **labels) -> Optional[Tuple[Tuple[float, ...], int]]:
+        """
+        Percentiles of the recent observations of one series.
+
+        Returns:
+            Tuple of (percentile values in seconds, total count), or None if nothing was recorded
+        """
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            histogram = self._histograms.get(name, {}).get(key)
+            if histogram is None or not histogram.recent:
+                return None
+            recent = np.fromiter(histogram.recent, dtype=float)
+            count = histogram.count
+        return tuple(np.percentile(recent, qs)), count
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} histogram"]
+                for key, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, bucket_count in zip(BUCKETS + (float("inf"),), histogram.bucket_counts):
+                        cumulative += bucket_count
+                        le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                        lines.append(f"{name}_bucket{_labels(key + (('le', le),))} {cumulative}")
+                    lines.append(f"{name}_sum{_labels(key)} {histogram.total:.6f}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(key: Tuple) -> str:
+    """Format a label tuple as {a="x",b="y"}"""
+    if not key:
+        return ""
+    return "{" + ",".join(f'{label}="{value}"' for label, value in key) + "}"
+
+
+# Process-wide registry used by the engine and the bot
+REGISTRY = MetricsRegistry()
+observe = REGISTRY.observe
+inc = REGISTRY.inc
+timed = REGISTRY.timed
+
+
+def start_metrics_server(port: int, registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve GET /metrics on localhost:port from a daemon thread"""
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes every few seconds would flood the bot log
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
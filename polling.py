@@ -0,0 +1,148 @@
+"""
+Adaptive Polling - Quote each symbol about as often as it could reach a trigger
+A priority queue orders symbols by their next poll time, which is set from the
+distance to the nearest entry/exit trigger and the symbol's recent volatility;
+a shared request budget caps how many quotes are taken per second overall.
+Exit and entry schedules are kept apart, so a symbol that is both held and on
+a watchlist is still quoted for its position at least every MAX_EXIT_POLL_SECONDS
+"""
+
+import heapq
+import itertools
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+from governor import PRIORITY_EXIT
+from trading_engine import ENTRY_BUFFER_PCT, STOP_LOSS_PCT, TRAIL_STOP_PCT
+
+# Never poll more often than the exit monitor ticks
+MIN_POLL_SECONDS = 5.0
+# Open positions are quoted at least this often, however far from a stop
+MAX_EXIT_POLL_SECONDS = 30.0
+# Watchlist names far below their entry level can wait longer
+MAX_ENTRY_POLL_SECONDS = 120.0
+
+# Poll again before a move of this many standard deviations could reach the trigger
+Z_SCORE = 3.0
+# Per-minute volatility (%) assumed until a symbol has enough 1-minute bars
+DEFAULT_VOLATILITY_PCT = 0.25
+MIN_VOLATILITY_PCT = 0.05
+VOLATILITY_BARS = 15
+
+# Share of the saved-up budget that only exit polls may spend
+EXIT_RESERVE_FRACTION = 0.25
+
+
+def exit_distance_pct(pnl_pct: float, max_profit_pct: float,
+                      stop_loss_pct: float = STOP_LOSS_PCT, trail_stop_pct: float = TRAIL_STOP_PCT) -> float:
+    """Percentage points the position's P&L can fall before the stop loss or trailing stop fires"""
+    distance = pnl_pct + stop_loss_pct
+    if max_profit_pct > 0:
+        distance = min(distance, trail_stop_pct - (max_profit_pct - pnl_pct))
+    return max(distance, 0.0)
+
+
+def entry_distance_pct(price: float, last_day_close: float, entry_buffer_pct: float = ENTRY_BUFFER_PCT) -> float:
+    """How far (% of price) the price is from the entry level, on either side (0 if unknown)"""
+    if price is None or np.isnan(price) or price <= 0:
+        return 0.0
+    return abs(last_day_close * (1 + entry_buffer_pct / 100.0) - price) / price * 100.0
+
+
+def volatility_pct(closes: np.ndarray, window: int = VOLATILITY_BARS) -> float:
+    """Standard deviation (%) of recent 1-minute returns"""
+    closes = closes[-(window + 1):]
+    if len(closes) < 3:
+        return DEFAULT_VOLATILITY_PCT
+    return max(float(np.std(np.diff(closes) / closes[:-1]) * 100.0), MIN_VOLATILITY_PCT)
+
+
+def poll_interval(distance_pct: float, volatility: float, max_interval: float) -> float:
+    """
+    Seconds until the next quote: the time a Z_SCORE-sigma random walk at this
+    per-minute volatility needs to cover the distance, clamped to [MIN_POLL_SECONDS, max_interval].
+    """
+    if not distance_pct > 0:
+        return MIN_POLL_SECONDS
+    sigmas = distance_pct / (Z_SCORE * max(volatility, MIN_VOLATILITY_PCT))
+    return float(min(max(60.0 * sigmas ** 2, MIN_POLL_SECONDS), max_interval))
+
+
+class PollScheduler:
+    """
+    Thread-safe priority queue of (priority, symbol) by next poll time, under a
+    quotes-per-second budget. Priorities are the quote governor's: exit polls may
+    spend the whole budget, entry polls leave EXIT_RESERVE_FRACTION of it to exits.
+    """
+
+    def __init__(self, budget_per_second: float):
+        self.budget_per_second = budget_per_second
+        # At most one exit-monitor tick's worth of quotes can be saved up, and never
+        # less than one entry quote on top of the exit reserve
+        self._reserve = budget_per_second * MIN_POLL_SECONDS * EXIT_RESERVE_FRACTION
+        self._capacity = max(budget_per_second * MIN_POLL_SECONDS, 1.0 + self._reserve)
+        self._allowance = self._capacity
+        self._last_refill = None
+        # Heap of (due, seq, priority, symbol); entries whose due no longer matches _due are stale
+        self._heap: List[tuple] = []
+        self._due: Dict[Tuple[int, str], float] = {}
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, key: Tuple[int, str], due: float):
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._seq)) + key)
+
+    def take(self, symbols: Iterable[str], now: float, priority: int = PRIORITY_EXIT) -> List[str]:
+        """
+        Claim the symbols among `symbols` whose `priority` schedule is due at `now`
+        (epoch seconds), most overdue first, as far as the budget allows. Symbols not
+        seen before at this priority are due at once; due symbols at this priority
+        that are no longer in `symbols` are forgotten.
+        Every claimed symbol must be given back with reschedule() at the same priority.
+        """
+        with self._lock:
+            if self._last_refill is not None:
+                self._allowance = min(self._capacity,
+                                      self._allowance + (now - self._last_refill) * self.budget_per_second)
+            self._last_refill = now
+            # Allowance that must be left after each claimed quote
+            floor = 0.0 if priority == PRIORITY_EXIT else self._reserve
+
+            wanted = {(priority, symbol) for symbol in symbols}
+            for key in wanted:
+                if key not in self._due:
+                    self._push(key, now)
+
+            taken, others = [], []
+            while (self._heap and self._heap[0][0] <= now
+                   and self._allowance - len(taken) >= 1.0 + floor):
+                entry = heapq.heappop(self._heap)
+                due, key = entry[0], entry[2:]
+                if self._due.get(key) != due:
+                    continue
+                if key in wanted:
+                    del self._due[key]
+                    taken.append(key[1])
+                elif key[0] == priority:
+                    # No longer held / watched at this priority
+                    del self._due[key]
+                else:
+                    others.append(entry)
+            for entry in others:
+                heapq.heappush(self._heap, entry)
+            self._allowance -= len(taken)
+            return taken
+
+    def reschedule(self, symbol: str, now: float, interval: float, priority: int = PRIORITY_EXIT):
+        """Set a claimed symbol's next poll time at `priority`"""
+        with self._lock:
+            self._push((priority, symbol), now + interval)
+
+    def clear(self):
+        """Forget every symbol (start of a new session)"""
+        with self._lock:
+            self._heap = []
+            self._due = {}
@@ -0,0 +1,106 @@
+"""
+Profiling - On-demand cProfile capture of the trading bot's ticks
+Armed by SIGUSR1 or a trigger file; profiles the next N ticks, writes the
+stats to disk and switches itself off again
+"""
+
+import contextlib
+import cProfile
+import io
+import logging
+import os
+import pstats
+import signal
+import threading
+import time
+
+from trading_engine import now_ist
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROFILE_TICKS = 20
+# Create this file (optionally containing a tick count) to start a capture
+TRIGGER_FILE = "profile.trigger"
+PROFILE_DIR = "profiles"
+# How often an idle profiler looks for the trigger file
+TRIGGER_POLL_SECONDS = 5.0
+
+
+class TickProfiler:
+    """Profiles the next N ticks when requested; a flag check and a rare stat() when idle"""
+
+    def __init__(self, trigger_file: str = TRIGGER_FILE, output_dir: str = PROFILE_DIR):
+        self.trigger_file = trigger_file
+        self.output_dir = output_dir
+        self._remaining = 0
+        self._profile = None
+        # One tick is profiled at a time; cProfile only follows the thread that enabled it
+        self._lock = threading.Lock()
+        self._next_poll = 0.0
+
+    def request(self, ticks: int = DEFAULT_PROFILE_TICKS):
+        """Profile the next `ticks` ticks (safe to call from a signal handler - it only sets a count)"""
+        if not self._remaining:
+            self._remaining = max(1, ticks)
+
+    def install_signal_handler(self):
+        """Arm the profiler on SIGUSR1 (not available on Windows - use the trigger file there)"""
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, lambda signum, frame: self.request())
+
+    def _poll_trigger_file(self):
+        """Arm the profiler if the trigger file exists, consuming it"""
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + TRIGGER_POLL_SECONDS
+        if not os.path.exists(self.trigger_file):
+            return
+        try:
+            with open(self.trigger_file) as f:
+                content = f.read().strip()
+            os.remove(self.trigger_file)
+            self.request(int(content) if content else DEFAULT_PROFILE_TICKS)
+        except (OSError, ValueError) as e:
+            logger.error("❌ Bad profile trigger file %s: %s", self.trigger_file, e)
+
+    @contextlib.contextmanager
+    def tick(self):
+        """Wrap one tick; profiled only while a capture is armed"""
+        if not self._remaining:
+            self._poll_trigger_file()
+        if not self._remaining or not self._lock.acquire(blocking=False):
+            yield
+            return
+
+        try:
+            if self._profile is None:
+                logger.info("🔬 Profiling the next %s ticks", self._remaining)
+                self._profile = cProfile.Profile()
+            self._profile.enable()
+            try:
+                yield
+            finally:
+                self._profile.disable()
+                self._remaining -= 1
+                if self._remaining <= 0:
+                    self._dump()
+        finally:
+            self._lock.release()
+
+    def _dump(self):
+        """Write the capture as .prof (for snakeviz/pstats) and a text top-list, then reset"""
+        profile, self._profile = self._profile, None
+        self._remaining = 0
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            base = os.path.join(self.output_dir, f"profile_{now_ist():%Y%m%d_%H%M%S}")
+            profile.dump_stats(f"{base}.prof")
+
+            text = io.StringIO()
+            pstats.Stats(profile, stream=text).sort_stats("cumulative").print_stats(40)
+            with open(f"{base}.txt", "w") as f:
+                f.write(text.getvalue())
+            logger.info("🔬 Profile saved to %s.prof", base)
+        except Exception as e:
+            logger.error("❌ Error saving profile: %s", e)
@@ -0,0 +1,81 @@
+"""
+Quote Client - Read quotes from the local quote service (quote_service.py)
+Used by trading_engine.get_current_price/fetch_prices when QUOTE_SERVICE_URL is set;
+one keep-alive HTTP connection per thread, and a backoff when the service is down
+"""
+
+import http.client
+import json
+import threading
+import time
+from typing import Dict, Iterable
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+# After a failed request the service is skipped for this long (callers fetch directly meanwhile)
+RETRY_SECONDS = 30.0
+# Long enough for the service to wait on the quote governor and try every source
+TIMEOUT_SECONDS = 30.0
+# Symbols per request, keeping the request line well under http.server's 64 KB limit
+BATCH_SIZE = 500
+
+
+class QuoteServiceUnavailable(Exception):
+    """The quote service could not be reached or gave a bad answer"""
+
+
+class QuoteClient:
+    """Thread-safe client of one quote service"""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self._local = threading.local()
+        self._down_until = 0.0
+
+    @property
+    def available(self) -> bool:
+        """False while backing off after a failure"""
+        return time.monotonic() >= self._down_until
+
+    def _get(self, path: str) -> dict:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=TIMEOUT_SECONDS)
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise QuoteServiceUnavailable(f"HTTP {response.status}")
+            return json.loads(body)
+        except (OSError, http.client.HTTPException, ValueError, QuoteServiceUnavailable) as e:
+            connection.close()
+            self._local.connection = None
+            self._down_until = time.monotonic() + RETRY_SECONDS
+            if isinstance(e, QuoteServiceUnavailable):
+                raise
+            raise QuoteServiceUnavailable(str(e)) from e
+
+    def prices(self, symbols: Iterable[str], priority: int = 0) -> Dict[str, float]:
+        """
+        Quotes for many symbols in as few requests as possible.
+
+        Returns:
+            Dict of symbol -> price (NaN where every source failed)
+
+        Raises:
+            QuoteServiceUnavailable: if any request fails
+        """
+        symbols = list(dict.fromkeys(symbols))
+        prices = {}
+        for start in range(0, len(symbols), BATCH_SIZE):
+            batch = symbols[start:start + BATCH_SIZE]
+            answer = self._get("/quotes?" + urlencode({"symbols": ",".join(batch), "priority": priority}))
+            for symbol in batch:
+                price = answer.get(symbol)
+                prices[symbol] = np.nan if price is None else float(price)
+        return prices
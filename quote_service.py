@@ -0,0 +1,168 @@
+"""
+Quote Service - One local process that owns quote fetching and caching
+The trading bot, its shard workers and any other local process pricing symbols read
+quotes from here (QUOTE_SERVICE_URL) instead of each calling yfinance/Google: requests for
+the same symbol share one upstream fetch, and a quote is reused for CACHE_SECONDS
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+import trading_engine
+from config import QUOTE_SERVICE_URL, QUOTE_JOURNAL_DIR
+from governor import PRIORITY_EXIT, PRIORITY_ENTRY, PRIORITY_NAMES
+from journal import QuoteJournal
+from metrics import REGISTRY, inc
+from trading_engine import fetch_quote, close_quote_journal, QUOTE_CONCURRENCY
+from log_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# A quote younger than this is served from the cache (below the exit monitor's 5s tick)
+CACHE_SECONDS = 2.0
+DEFAULT_PORT = 8765
+# Separate from the bot's trading_bot.log, so the two processes never rotate the same file
+LOG_FILE = "quote_service.log"
+
+
+class QuoteCache:
+    """
+    Thread-safe quote cache where concurrent misses on one symbol share a single fetch.
+    A fetch is only shared with callers of the same or lower priority: an exit never
+    waits on an entry fetch, which the governor may defer.
+    """
+
+    def __init__(self, fetch=fetch_quote, ttl: float = CACHE_SECONDS, workers: int = QUOTE_CONCURRENCY):
+        self._fetch = fetch
+        self.ttl = ttl
+        # symbol -> (price, monotonic time fetched); failed fetches are not cached
+        self._quotes: Dict[str, tuple] = {}
+        # symbol -> (Future, priority) of the most urgent fetch in flight
+        self._in_flight: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        # Exits get their own pool, so they never queue behind a large entry batch
+        self._executors = {
+            PRIORITY_EXIT: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote-fetch-exit"),
+            PRIORITY_ENTRY: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="quote-fetch-entry"),
+        }
+
+    def get(self, symbol: str, priority: int = PRIORITY_EXIT) -> float:
+        """Cached quote, the result of a fetch already in flight, or a new fetch"""
+        with self._lock:
+            cached = self._quotes.get(symbol)
+            if cached is not None and time.monotonic() - cached[1] < self.ttl:
+                inc("trader_quote_service_requests_total", result="cached")
+                return cached[0]
+            in_flight = self._in_flight.get(symbol)
+            owner = in_flight is None or priority < in_flight[1]
+            if owner:
+                pending = Future()
+                self._in_flight[symbol] = (pending, priority)
+            else:
+                pending = in_flight[0]
+        if not owner:
+            inc("trader_quote_service_requests_total", result="coalesced")
+            return pending.result()
+
+        inc("trader_quote_service_requests_total", result="fetched")
+        try:
+            price = self._fetch(symbol, priority)
+        except Exception as e:
+            logger.warning("Error fetching %s: %s", symbol, e, extra={"symbol": symbol})
+            price = np.nan
+        with self._lock:
+            if not np.isnan(price):
+                self._quotes[symbol] = (price, time.monotonic())
+            # An exit fetch may have taken over the slot from this one
+            if self._in_flight.get(symbol, (None,))[0] is pending:
+                del self._in_flight[symbol]
+        pending.set_result(price)
+        return price
+
+    def get_many(self, symbols: Iterable[str], priority: int = PRIORITY_EXIT) -> Dict[str, float]:
+        """Quotes for many symbols, fetched concurrently on the priority's own thread pool"""
+        symbols = list(dict.fromkeys(symbols))
+        executor = self._executors[priority]
+        return dict(zip(symbols, executor.map(lambda symbol: self.get(symbol, priority), symbols)))
+
+
+def start_quote_service(port: int, cache: QuoteCache = None) -> ThreadingHTTPServer:
+    """
+    Serve GET /quotes?symbols=A,B&priority=0 as JSON {symbol: price or null},
+    plus /metrics, on 127.0.0.1:port in a background thread.
+    """
+    cache = cache or QuoteCache()
+
+    class QuoteHandler(BaseHTTPRequestHandler):
+        # Keep-alive, so each client thread reuses one connection
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            if url.path == "/quotes":
+                query = parse_qs(url.query)
+                symbols = [symbol for symbol in query.get("symbols", [""])[0].split(",") if symbol]
+                try:
+                    priority = int(query.get("priority", [PRIORITY_EXIT])[0])
+                except ValueError:
+                    priority = PRIORITY_EXIT
+                if priority not in PRIORITY_NAMES:
+                    priority = PRIORITY_EXIT
+                prices = cache.get_many(symbols, priority)
+                body = json.dumps({symbol: None if np.isnan(price) else price
+                                   for symbol, price in prices.items()}).encode("utf-8")
+                content_type = "application/json"
+            elif url.path == "/metrics":
+                body = REGISTRY.render().encode("utf-8")
+                content_type = "text/plain; version=0.0.4"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), QuoteHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="quote-service-http", daemon=True).start()
+    return server
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Local quote service shared by the bot and its shard workers")
+    parser.add_argument("--port", type=int, default=urlsplit(QUOTE_SERVICE_URL).port or DEFAULT_PORT)
+    args = parser.parse_args()
+
+    setup_logging(log_file=LOG_FILE)
+    if QUOTE_JOURNAL_DIR:
+        # The service writes the day's main journal file, even when it shares the bot's QUOTE_SERVICE_URL
+        trading_engine.QUOTE_JOURNAL = QuoteJournal(QUOTE_JOURNAL_DIR)
+    server = start_quote_service(args.port)
+    logger.info("💹 Quote service on http://127.0.0.1:%s/quotes (cache %gs)", args.port, CACHE_SECONDS)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        logger.info("⏹️ Stopping quote service...")
+    finally:
+        server.shutdown()
+        close_quote_journal()
+
+
+if __name__ == "__main__":
+    main()
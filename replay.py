@@ -0,0 +1,243 @@
+"""
+Session Replay - Run TradingBot through a recorded trading day on a simulated clock
+Recorded quotes and the day's watchlist stand in for the quote sources and the DB,
+and the bot's tasks fire on their live cadence as fast as the CPU allows
+"""
+
+import argparse
+import contextlib
+import logging
+import os
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import trading_engine
+import autonomous_trader
+from trading_engine import IST, SimulatedClock, set_clock
+from autonomous_trader import (
+    TradingBot, EXIT_MONITOR_SECONDS, SCHEDULE_CHECK_SECONDS
+)
+from backtester import TRADE_COLUMNS
+from bars import load_bars, quotes_from_bars
+from journal import load_journal
+
+logger = logging.getLogger(__name__)
+
+SESSION_START = time(9, 15)
+SESSION_END = time(15, 30)
+
+
+# ============= RECORDED QUOTES =============
+
+class QuoteTape:
+    """Recorded quotes (timestamp, symbol, price); a symbol's price at t is its last quote at or before t"""
+
+    def __init__(self, quotes: pd.DataFrame):
+        quotes = quotes.sort_values("timestamp", kind="stable")
+        self._series = {}
+        for symbol, rows in quotes.groupby("symbol", sort=False):
+            # Compare as epoch nanoseconds so lookups are a binary search
+            times = pd.to_datetime(rows["timestamp"]).to_numpy(dtype="datetime64[ns]").astype(np.int64)
+            self._series[symbol] = (times, rows["price"].to_numpy(dtype=float))
+
+    def price_at(self, symbol: str, when: datetime) -> float:
+        """Last recorded price of symbol at or before when (NaN if none yet)"""
+        series = self._series.get(symbol)
+        if series is None:
+            return np.nan
+        times, prices = series
+        i = np.searchsorted(times, pd.Timestamp(when).value, side="right") - 1
+        return prices[i] if i >= 0 else np.nan
+
+
+# ============= IN-MEMORY DATABASE =============
+
+class ReplayStore:
+    """In-memory stand-in for the trades, watchlist and daily_pnl tables"""
+
+    def __init__(self, watchlists: Dict[str, pd.DataFrame], watchlist_date: date):
+        self.trades: List[dict] = []
+        self.watchlists = watchlists
+        self.watchlist_date = watchlist_date
+        self.daily_pnl: Dict[str, float] = {}
+        self.live_marks = pd.DataFrame()
+
+    def init_db(self):
+        pass
+
+    def save_trade(self, trade: dict) -> int:
+        row = {key: trade.get(key) for key in (
+            "SYMBOL", "entry_price", "qty", "max_profit_pct", "is_open", "exit_reason",
+            "entry_time", "exit_time", "exit_price", "pnl_pct")}
+        row["strategy"] = trade.get("strategy", trading_engine.DEFAULT_STRATEGY)
+        row["id"] = len(self.trades) + 1
+        self.trades.append(row)
+        return row["id"]
+
+    def update_trade(self, trade: dict):
+        row = self.trades[int(trade["id"]) - 1]
+        for key in ("is_open", "exit_reason", "exit_time", "exit_price", "pnl_pct", "max_profit_pct"):
+            value = trade[key]
+            row[key] = None if not isinstance(value, str) and pd.isna(value) else value
+        row["is_open"] = bool(row["is_open"])
+
+    def close_trades(self, trades: List[dict]):
+        for trade in trades:
+            if self.trades[int(trade["id"]) - 1]["is_open"]:
+                self.update_trade(trade)
+
+    def get_open_trades(self, strategy: Optional[str] = None) -> pd.DataFrame:
+        rows = [dict(row, current_price=None, pnl_abs=0) for row in self.trades
+                if row["is_open"] and (strategy is None or row["strategy"] == strategy)]
+        return pd.DataFrame(rows)
+
+    def get_trades_by_date(self, selected_date: str, strategy: Optional[str] = None) -> pd.DataFrame:
+        rows = [dict(row, profit_abs=(row["exit_price"] - row["entry_price"]) * row["qty"])
+                for row in self.trades
+                if not row["is_open"] and row["exit_time"].strftime("%Y-%m-%d") == selected_date
+                and (strategy is None or row["strategy"] == strategy)]
+        return pd.DataFrame(rows)
+
+    def calculate_and_save_daily_pnl(self, current_time: datetime = None) -> float:
+        current_time = current_time or trading_engine.now_ist()
+        closed = self.get_trades_by_date(current_time.strftime("%Y-%m-%d"))
+        total_pnl = float(closed["profit_abs"].sum()) if not closed.empty else 0.0
+        self.daily_pnl[current_time.strftime("%Y-%m-%d")] = total_pnl
+        return total_pnl
+
+    def publish_live_marks(self, positions: pd.DataFrame):
+        self.live_marks = positions
+
+    def get_watchlist_date(self, strategy: str = trading_engine.DEFAULT_STRATEGY):
+        return self.watchlist_date if strategy in self.watchlists else None
+
+    def get_watchlist_from_db(self, strategy: str = trading_engine.DEFAULT_STRATEGY) -> pd.DataFrame:
+        return self.watchlists[strategy]
+
+    def save_watchlist(self, watchlist_df: pd.DataFrame, strategy: str = trading_engine.DEFAULT_STRATEGY):
+        self.watchlists[strategy] = watchlist_df
+
+
+@contextlib.contextmanager
+def replay_environment(clock: SimulatedClock, store: ReplayStore, tape: QuoteTape):
+    """Point the engine and the bot at the simulated clock, in-memory store and quote tape"""
+    replacements = [
+        (trading_engine, "save_trade", store.save_trade),
+        (trading_engine, "update_trade", store.update_trade),
+        (trading_engine, "close_trades", store.close_trades),
+        (trading_engine, "get_trades_by_date", store.get_trades_by_date),
+        (trading_engine, "get_current_price", lambda symbol, *_: tape.price_at(symbol, clock.now())),
+        (autonomous_trader, "init_db", store.init_db),
+        (autonomous_trader, "get_open_trades", store.get_open_trades),
+        (autonomous_trader, "calculate_and_save_daily_pnl", store.calculate_and_save_daily_pnl),
+        (autonomous_trader, "get_watchlist_date", store.get_watchlist_date),
+        (autonomous_trader, "get_watchlist_from_db", store.get_watchlist_from_db),
+        (autonomous_trader, "save_watchlist", store.save_watchlist),
+        (autonomous_trader, "publish_live_marks", store.publish_live_marks),
+        (autonomous_trader, "BARS_DIR", ""),
+        (autonomous_trader, "TRADE_RETENTION_DAYS", 0),
+    ]
+    originals = [(module, name, getattr(module, name)) for module, name, _ in replacements]
+    previous_clock = set_clock(clock)
+    try:
+        for module, name, replacement in replacements:
+            setattr(module, name, replacement)
+        yield
+    finally:
+        for module, name, original in originals:
+            setattr(module, name, original)
+        set_clock(previous_clock)
+
+
+# ============= REPLAY DRIVER =============
+
+def replay_session(quotes: pd.DataFrame, watchlists: Dict[str, pd.DataFrame],
+                   session_date: date) -> Tuple[pd.DataFrame, float]:
+    """
+    Replay one trading day: the bot starts at 9:15 like the live service, then the
+    exit monitor, entry scanner and schedule check fire at their live intervals
+    (exits first when they coincide, as in monitor_and_trade) until 3:30 PM.
+
+    Returns:
+        Tuple of (trades in trades-table shape, daily P&L saved at EOD)
+    """
+    start = IST.localize(datetime.combine(session_date, SESSION_START))
+    end = IST.localize(datetime.combine(session_date, SESSION_END))
+    clock = SimulatedClock(start)
+    store = ReplayStore(dict(watchlists), session_date)
+
+    with replay_environment(clock, store, QuoteTape(quotes)):
+        bot = TradingBot()
+        for name in bot.strategies:
+            # Strategies without a recorded watchlist sit the day out instead of downloading bhavcopies
+            store.watchlists.setdefault(name, pd.DataFrame(columns=["SYMBOL", "CLOSE_PRICE_last"]))
+        bot.initialize()
+        bot.ensure_daily_watchlist()
+
+        # [next run, interval, task]; the periodic threads run immediately, schedule after a minute
+        tasks = [
+            [start, timedelta(seconds=EXIT_MONITOR_SECONDS), bot.monitor_exits],
+            [start, timedelta(seconds=bot.entry_scan_seconds), bot.scan_entries],
+            [start + timedelta(seconds=SCHEDULE_CHECK_SECONDS),
+             timedelta(seconds=SCHEDULE_CHECK_SECONDS), bot.check_schedule],
+        ]
+        while True:
+            task = min(tasks, key=lambda t: t[0])
+            if task[0] > end:
+                break
+            clock.advance_to(task[0])
+            task[2]()
+            task[0] += task[1]
+
+    trades = pd.DataFrame(store.trades, columns=["id", "SYMBOL", "entry_price", "qty", "max_profit_pct",
+                                                 "is_open", "exit_reason", "entry_time", "exit_time",
+                                                 "exit_price", "pnl_pct", "strategy"])
+    trades = trades.rename(columns={"SYMBOL": "symbol"})[TRADE_COLUMNS]
+    return trades, store.daily_pnl.get(session_date.strftime("%Y-%m-%d"), 0.0)
+
+
+def load_watchlists(path: str) -> Dict[str, pd.DataFrame]:
+    """Read a watchlist CSV (get_watchlist_from_db columns, optional 'strategy') into per-strategy frames"""
+    watchlist = pd.read_csv(path)
+    if "strategy" not in watchlist.columns:
+        return {trading_engine.DEFAULT_STRATEGY: watchlist}
+    return {name: rows.drop(columns="strategy").reset_index(drop=True)
+            for name, rows in watchlist.groupby("strategy")}
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Replay a recorded trading day through the bot")
+    parser.add_argument("--date", required=True, help="Session date (YYYY-MM-DD)")
+    parser.add_argument("--quotes", required=True,
+                        help="CSV of recorded quotes (timestamp, symbol, price), a bars_YYYYMMDD.npz "
+                             "or a quotes_YYYYMMDD.bin journal written by the bot")
+    parser.add_argument("--watchlist", required=True, help="CSV of the day's watchlist")
+    parser.add_argument("--output", default="replay_trades.csv")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    session_date = datetime.strptime(args.date, "%Y-%m-%d").date()
+
+    if args.quotes.endswith(".npz"):
+        quotes = quotes_from_bars(load_bars(args.quotes).to_frame())
+    elif args.quotes.endswith(".bin"):
+        # Also picks up the shard workers' journals of the same day
+        quotes = load_journal(os.path.dirname(args.quotes) or ".", session_date)
+    else:
+        quotes = pd.read_csv(args.quotes)
+        quotes["timestamp"] = pd.to_datetime(quotes["timestamp"])
+        if quotes["timestamp"].dt.tz is None:
+            quotes["timestamp"] = quotes["timestamp"].dt.tz_localize(IST)
+
+    trades, total_pnl = replay_session(quotes, load_watchlists(args.watchlist), session_date)
+    trades.to_csv(args.output, index=False)
+    print(f"Trades: {len(trades)} | Daily P&L: ₹{total_pnl:,.2f}")
+    print(f"Saved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
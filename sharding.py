@@ -0,0 +1,116 @@
+"""
+Sharded Pricing - Split watchlist pricing and rule evaluation across worker processes
+Symbols are assigned to workers by a stable hash; the trading bot acts as coordinator
+and applies the merged decisions (DB writes, duplicate checks, capital cap) itself
+"""
+
+import logging
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from typing import Dict, List, Iterable, Tuple
+
+import trading_engine
+from config import QUOTE_RATE, QUOTE_JOURNAL_DIR
+from governor import QuoteGovernor, EXIT_RESERVE_FRACTION, PRIORITY_EXIT, PRIORITY_ENTRY
+from journal import QuoteJournal
+from log_setup import start_worker_log_listener, setup_worker_logging
+from trading_engine import get_current_price, entry_triggered
+
+logger = logging.getLogger(__name__)
+
+
+def shard_for(symbol: str, shards: int) -> int:
+    """Stable shard index for a symbol (same in every process, unlike hash())"""
+    return zlib.crc32(symbol.encode("utf-8")) % shards
+
+
+def _init_worker(quote_rate: float, log_queue, log_level: int):
+    """
+    Worker: log through the coordinator, take its share of the process-wide
+    quote rate limit, and journal to its own file
+    """
+    setup_worker_logging(log_queue, log_level)
+    trading_engine.QUOTE_GOVERNOR = QuoteGovernor(quote_rate) if quote_rate > 0 else None
+    if 0 < quote_rate * (1 - EXIT_RESERVE_FRACTION) < 1:
+        logger.warning("⚠️ Worker quote rate is %.2f requests/s: under one entry quote per second, "
+                       "raise QUOTE_RATE or lower SHARD_WORKERS", quote_rate)
+    if QUOTE_JOURNAL_DIR:
+        trading_engine.QUOTE_JOURNAL = QuoteJournal(QUOTE_JOURNAL_DIR, suffix=f".{os.getpid()}")
+        # Worker processes skip atexit; a multiprocessing finalizer still runs when the pool shuts down
+        Finalize(trading_engine.QUOTE_JOURNAL, trading_engine.QUOTE_JOURNAL.close, exitpriority=10)
+
+
+def _evaluate_shard(exit_symbols: List[str], entry_candidates: List[Tuple[str, float]],
+                    priority: int = PRIORITY_EXIT) -> Tuple[Dict[str, float], Dict[str, float]]:
+    """
+    Worker: price one shard and evaluate the entry rule on it.
+    exit_symbols are quoted at `priority`, entry candidates at entry priority.
+    
+    Returns:
+        Tuple of (prices for exit_symbols, prices of entry candidates whose entry rule triggered)
+    """
+    exit_prices = {symbol: get_current_price(symbol, priority) for symbol in exit_symbols}
+    
+    entry_prices = {}
+    for symbol, last_day_close in entry_candidates:
+        price = exit_prices.get(symbol)
+        if price is None:
+            price = get_current_price(symbol, PRIORITY_ENTRY)
+        if entry_triggered(price, last_day_close):
+            entry_prices[symbol] = price
+    
+    return exit_prices, entry_prices
+
+
+class ShardPool:
+    """Process pool that prices symbols and screens entries shard by shard"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        # Worker log records are written by this process's handlers
+        self._log_queue, self._log_listener = start_worker_log_listener()
+        # The workers and this process (EOD exits) all quote upstream, so QUOTE_RATE is
+        # split evenly between them and their combined rate stays within it
+        quote_rate = QUOTE_RATE / (workers + 1)
+        if QUOTE_RATE > 0:
+            trading_engine.QUOTE_GOVERNOR = QuoteGovernor(quote_rate)
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(quote_rate, self._log_queue, logging.getLogger().getEffectiveLevel()))
+    
+    def evaluate(self, exit_symbols: Iterable[str] = (), entry_candidates: Dict[str, float] = None,
+                 priority: int = PRIORITY_EXIT) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """
+        Price exit_symbols (at `priority`) and screen entry_candidates (symbol -> previous close) across the pool.
+        
+        Returns:
+            Tuple of (exit prices, triggered entry prices) merged over all shards
+        """
+        entry_candidates = entry_candidates or {}
+        
+        exit_shards = [[] for _ in range(self.workers)]
+        entry_shards = [[] for _ in range(self.workers)]
+        for symbol in dict.fromkeys(exit_symbols):
+            exit_shards[shard_for(symbol, self.workers)].append(symbol)
+        for symbol, last_day_close in entry_candidates.items():
+            entry_shards[shard_for(symbol, self.workers)].append((symbol, last_day_close))
+        
+        futures = [
+            self._executor.submit(_evaluate_shard, exit_shards[i], entry_shards[i], priority)
+            for i in range(self.workers)
+            if exit_shards[i] or entry_shards[i]
+        ]
+        
+        exit_prices, entry_prices = {}, {}
+        for future in futures:
+            shard_exit_prices, shard_entry_prices = future.result()
+            exit_prices.update(shard_exit_prices)
+            entry_prices.update(shard_entry_prices)
+        return exit_prices, entry_prices
+    
+    def shutdown(self):
+        """Stop the worker processes, letting each close its quote journal"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._log_listener.stop()
@@ -0,0 +1,39 @@
+"""
+State Snapshot - Compact local snapshot of the trading bot's in-memory state
+Lets a restarted bot resume trading straight away instead of rebuilding everything from the DB
+"""
+
+import os
+import pickle
+import logging
+from typing import Optional
+
+# Bump when the snapshot layout changes; older snapshots are then ignored
+SNAPSHOT_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def save_snapshot(path: str, state: dict):
+    """Write state to path atomically (a crash mid-write never leaves a torn snapshot)"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump({"version": SNAPSHOT_VERSION, "state": state}, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path: str) -> Optional[dict]:
+    """Read a snapshot written by save_snapshot; None if missing, unreadable or outdated"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+    except Exception as e:
+        logger.warning("Ignoring unreadable snapshot %s: %s", path, e)
+        return None
+    
+    if payload.get("version") != SNAPSHOT_VERSION:
+        logger.warning("Ignoring snapshot %s with version %s", path, payload.get('version'))
+        return None
+    return payload["state"]
@@ -0,0 +1,191 @@
+"""
+Parameter Sweep - Evaluate a grid of strategy parameters over historical data
+Parameter-independent work (bhavcopies, per-day metrics, intraday bars) is computed once
+and cached on disk; each grid point only re-screens and re-simulates in a process pool
+"""
+
+import argparse
+import itertools
+import logging
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from config import CAPITAL_PER_TRADE
+from trading_engine import IST
+from backtester import (
+    load_bhavcopy_history, bhavcopy_metrics_history, screen_history,
+    load_intraday_bars, simulate
+)
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = ".backtest_cache"
+
+
+# ============= CACHED INPUTS =============
+
+def _cached(name: str, loader: Callable):
+    """Load a pickled result from CACHE_DIR, computing and saving it on a miss"""
+    path = os.path.join(CACHE_DIR, f"{name}.pkl")
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    result = loader()
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(path, "wb") as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    return result
+
+
+def load_sweep_inputs(start_date: date, end_date: date, interval: str,
+                      min_price_change: float, min_volume_ratio: float):
+    """
+    Load everything the grid points share.
+    Bars are fetched for the loosest thresholds in the grid, which covers every
+    symbol-day that any grid point can trade.
+
+    Returns:
+        Tuple of (per-day bhavcopy metrics, intraday bars)
+    """
+    span = f"{start_date:%Y%m%d}_{end_date:%Y%m%d}"
+    bhav_history = _cached(f"bhav_{span}", lambda: load_bhavcopy_history(start_date, end_date))
+    if bhav_history.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    metrics = _cached(f"metrics_{span}", lambda: bhavcopy_metrics_history(bhav_history))
+
+    signals = screen_history(metrics, min_price_change, min_volume_ratio)
+    bars = _cached(f"bars_{span}_{interval}_{min_price_change:g}_{min_volume_ratio:g}",
+                   lambda: load_intraday_bars(signals, interval))
+    return metrics, bars
+
+
+# ============= GRID EVALUATION =============
+
+# Shared inputs, set once per worker process by _init_worker
+_metrics = None
+_bars = None
+_trade_days = None
+
+
+def _init_worker(metrics: pd.DataFrame, bars: pd.DataFrame):
+    """Pool initializer - receive the shared inputs once instead of once per task"""
+    global _metrics, _bars, _trade_days
+    _metrics = metrics
+    _bars = bars
+    _trade_days = sorted(metrics["trade_date"].unique())
+
+
+def _evaluate_screen(screen: tuple, exit_grid: List[tuple], capital_per_trade: float) -> List[Dict]:
+    """Screen once for a (price change, volume ratio) pair, then simulate each entry/exit setting"""
+    price_change_threshold, volume_ratio_threshold = screen
+    signals = screen_history(_metrics, price_change_threshold, volume_ratio_threshold)
+    bars = _bars[_bars["SYMBOL"].isin(signals["SYMBOL"].unique())]
+
+    results = []
+    for entry_buffer_pct, stop_loss_pct, trail_stop_pct in exit_grid:
+        trades, daily_pnl = simulate(signals, bars, capital_per_trade,
+                                     entry_buffer_pct, stop_loss_pct, trail_stop_pct,
+                                     trade_days=_trade_days)
+        results.append({
+            "price_change_threshold": price_change_threshold,
+            "volume_ratio_threshold": volume_ratio_threshold,
+            "entry_buffer_pct": entry_buffer_pct,
+            "stop_loss_pct": stop_loss_pct,
+            "trail_stop_pct": trail_stop_pct,
+            **summarize(trades, daily_pnl),
+        })
+    return results
+
+
+def summarize(trades: pd.DataFrame, daily_pnl: pd.DataFrame) -> Dict:
+    """P&L, max drawdown and hit rate of one backtest run"""
+    if trades.empty:
+        return {"trades": 0, "total_pnl": 0.0, "max_drawdown": 0.0, "hit_rate": 0.0}
+
+    profit = (trades["exit_price"] - trades["entry_price"]) * trades["qty"]
+    cumulative = daily_pnl["total_pnl"].cumsum().to_numpy()
+    peak = np.maximum.accumulate(np.concatenate([[0.0], cumulative]))[1:]
+    return {
+        "trades": len(trades),
+        "total_pnl": round(float(profit.sum()), 2),
+        "max_drawdown": round(float((peak - cumulative).max()), 2),
+        "hit_rate": round(float((profit > 0).mean() * 100.0), 2),
+    }
+
+
+def run_sweep(metrics: pd.DataFrame, bars: pd.DataFrame, grid: Dict[str, List[float]],
+              capital_per_trade: float = CAPITAL_PER_TRADE, workers: int = None) -> pd.DataFrame:
+    """
+    Evaluate every combination in grid (parameter name -> values) over the cached inputs.
+
+    Returns:
+        One row per grid point, ranked by total P&L, then drawdown, then hit rate
+    """
+    screens = list(itertools.product(grid["price_change_threshold"], grid["volume_ratio_threshold"]))
+    exit_grid = list(itertools.product(grid["entry_buffer_pct"], grid["stop_loss_pct"], grid["trail_stop_pct"]))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(metrics, bars)) as pool:
+        futures = [pool.submit(_evaluate_screen, screen, exit_grid, capital_per_trade) for screen in screens]
+        rows = [row for future in futures for row in future.result()]
+
+    results = pd.DataFrame(rows)
+    results = results.sort_values(["total_pnl", "max_drawdown", "hit_rate"],
+                                  ascending=[False, True, False]).reset_index(drop=True)
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    return results
+
+
+def _floats(text: str) -> List[float]:
+    """Parse a comma separated list of numbers"""
+    return [float(value) for value in text.split(",")]
+
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Sweep strategy parameters over historical data")
+    parser.add_argument("--start", required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--end", default=datetime.now(IST).strftime("%Y-%m-%d"), help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--interval", default="5m", help="Intraday bar interval (1m, 5m, 15m, 1h)")
+    parser.add_argument("--price-change", type=_floats, default=[3.0, 4.0, 5.0, 7.0])
+    parser.add_argument("--volume-ratio", type=_floats, default=[3.0, 5.0, 8.0])
+    parser.add_argument("--entry-buffer", type=_floats, default=[0.5, 1.0, 2.0])
+    parser.add_argument("--stop-loss", type=_floats, default=[1.5, 2.0, 3.0])
+    parser.add_argument("--trail-stop", type=_floats, default=[1.0, 2.0, 3.0])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    grid = {
+        "price_change_threshold": args.price_change,
+        "volume_ratio_threshold": args.volume_ratio,
+        "entry_buffer_pct": args.entry_buffer,
+        "stop_loss_pct": args.stop_loss,
+        "trail_stop_pct": args.trail_stop,
+    }
+    metrics, bars = load_sweep_inputs(
+        datetime.strptime(args.start, "%Y-%m-%d").date(),
+        datetime.strptime(args.end, "%Y-%m-%d").date(),
+        args.interval, min(args.price_change), min(args.volume_ratio)
+    )
+    if metrics.empty:
+        logger.warning("No bhavcopy data in range")
+        return
+
+    results = run_sweep(metrics, bars, grid, workers=args.workers)
+    results.to_csv(args.output, index=False)
+    print(results.head(10).to_string(index=False))
+    print(f"Saved {len(results)} grid points to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,23 +3,31 @@ Trading Engine Module - Core trading logic separated from UI
 This module contains all trading functions that can run autonomously
 """
 
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import pytz
-import requests
-from bs4 import BeautifulSoup
-import nselib
 import psycopg2
 #from psycopg2.extras import RealDictCursor
-from typing import Optional, Dict, List, Tuple
-import yfinance as yf
+from psycopg2.extras import execute_values
+from typing import Optional, Dict, List, Tuple, Iterable
 import logging
-# Load configuration
-from config import DB_CONFIG, validate_config
+# Load configuration (validated by the entry points - see config.validate_config)
+from config import DB_CONFIG, QUOTE_RATE, QUOTE_JOURNAL_DIR, QUOTE_SERVICE_URL
+from metrics import timed, inc
+from governor import QuoteGovernor, PRIORITY_EXIT
+from journal import QuoteJournal
+from quote_client import QuoteClient, QuoteServiceUnavailable, RETRY_SECONDS
 
-# Validate configuration on import
-validate_config()
+# yfinance, nselib, requests and BeautifulSoup are imported where they are used:
+# together they cost more than a second of startup that most callers never need
+
+logger = logging.getLogger(__name__)
 
 # Configuration
 IST = pytz.timezone("Asia/Kolkata")
@@ -28,12 +36,87 @@ MARKET_OPEN_MINUTE = 15
 MARKET_CLOSE_HOUR = 15
 MARKET_CLOSE_MINUTE = 15
 
+# Entry/exit rules
+ENTRY_BUFFER_PCT = 1.0   # Enter only above previous close + 1%
+STOP_LOSS_PCT = 2.0      # Exit at -2% from entry
+TRAIL_STOP_PCT = 2.0     # Exit when profit falls 2% from its peak
+
+# Trades and watchlist rows are tagged with the strategy that produced them
+DEFAULT_STRATEGY = "default"
+
+# Async engine limits
+QUOTE_CONCURRENCY = 16
+QUOTE_TIMEOUT_SECONDS = 10.0
+
+# Columns shared by trades and trades_archive, in table order
+TRADE_TABLE_COLUMNS = ("id, symbol, entry_price, qty, max_profit_pct, is_open, exit_reason, "
+                       "entry_time, exit_time, exit_price, pnl_pct, strategy")
+
+# EOD exit stops waiting for quotes after this long and closes the rest at their last mark
+EOD_QUOTE_DEADLINE_SECONDS = 10.0
+
+
+# ============= CLOCK =============
+# All time decisions go through the active clock, so a whole session can be
+# replayed on simulated time (see replay.py) instead of wall-clock time.
+
+class SystemClock:
+    """Wall-clock time"""
+    
+    def now(self) -> datetime:
+        return datetime.now(IST)
+    
+    def sleep(self, seconds: float):
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Clock that only moves when advanced - sleeping advances it instantly"""
+    
+    def __init__(self, start: datetime):
+        self._now = start
+    
+    def now(self) -> datetime:
+        return self._now
+    
+    def sleep(self, seconds: float):
+        self._now += timedelta(seconds=seconds)
+    
+    def advance_to(self, when: datetime):
+        """Move the clock forward to when (never backwards)"""
+        self._now = max(self._now, when)
+
+
+_clock = SystemClock()
+
+
+def set_clock(clock) -> object:
+    """
+    Install the clock used by now_ist() and sleep().
+    
+    Returns:
+        The previously installed clock, so callers can restore it
+    """
+    global _clock
+    previous, _clock = _clock, clock
+    return previous
+
+
+def get_clock():
+    """The currently installed clock"""
+    return _clock
+
 
 # ============= UTILITY FUNCTIONS =============
 
 def now_ist() -> datetime:
     """Get current time in IST timezone"""
-    return datetime.now(IST)
+    return _clock.now()
+
+
+def sleep(seconds: float):
+    """Sleep on the active clock"""
+    _clock.sleep(seconds)
 
 
 def is_market_hours() -> bool:
@@ -51,65 +134,230 @@ def is_market_open(now: datetime) -> bool:
     return start <= now <= end
 
 
-def last_two_trading_days(start_date):
-    """Find the most recent previous trading day excluding weekends and holidays"""
+def is_entry_time(now: datetime) -> bool:
+    """Check if new entries are allowed (9:20 AM - 3:15 PM IST)"""
+    entry_time = now.replace(hour=9, minute=20, second=0, microsecond=0)
+    exit_cutoff_time = now.replace(hour=15, minute=15, second=0, microsecond=0)
+    return entry_time <= now < exit_cutoff_time
+
+
+def is_eod_exit_time(now: datetime) -> bool:
+    """Check if open positions must be force-closed (from 3:15 PM IST)"""
+    return now >= now.replace(hour=MARKET_CLOSE_HOUR, minute=MARKET_CLOSE_MINUTE, second=0, microsecond=0)
+
+
+@functools.lru_cache(maxsize=1)
+def _trading_holidays(as_of) -> frozenset:
+    """NSE equity holidays, downloaded once per day (as_of is the cache key)"""
+    import nselib
     holiday_data = pd.DataFrame(nselib.trading_holiday_calendar())
     fil_holiday_data = holiday_data[holiday_data['Product'] == 'Equities']
-    holidays_set = set(pd.to_datetime(fil_holiday_data['tradingDate'], format='%d-%b-%Y').dt.date)
+    return frozenset(pd.to_datetime(fil_holiday_data['tradingDate'], format='%d-%b-%Y').dt.date)
+
+
+def is_trading_day(day) -> bool:
+    """Check if a date is an NSE trading day (not a weekend or equity holiday)"""
+    return day.weekday() < 5 and day not in _trading_holidays(now_ist().date())
 
+
+def last_two_trading_days(start_date):
+    """Find the most recent previous trading day excluding weekends and holidays"""
     current_date = start_date - timedelta(days=1)
-    while current_date.weekday() >= 5 or current_date in holidays_set:
+    while not is_trading_day(current_date):
         current_date -= timedelta(days=1)
     return current_date
 
 
-def get_current_price(symbol: str) -> float:
-    """Fetch current price from Google Finance"""
-    # First attempt: yfinance with plain symbol
-    try:
-        stock = yf.Ticker(f"{symbol}-SM.NS")
-        ltp = stock.fast_info['last_price']
-        if ltp is not None and ltp != 0:
-            return float(ltp)
-    except Exception:
-        logging.basicConfig(level=logging.WARNING)
-        logging.warning(f"Error fetching price for {symbol}")
-        pass  # Continue to next attempt
-    
-    # Second attempt: yfinance with -SM suffix
-    try:
-        stock = yf.Ticker(f"{symbol}.NS")
-        ltp = stock.fast_info['last_price']
-        if ltp is not None and ltp != 0:
-            return float(ltp)
-    except Exception:
-        logging.basicConfig(level=logging.WARNING)
-        logging.warning(f"Error fetching price for {symbol}")
-        pass  # Continue to fallback
-    
-    # Fallback: scrape Google Finance
-    try:
+# Quote sources, in default order of preference
+PRICE_SOURCES = ("yfinance_sm", "yfinance", "google")
+
+# Last source that worked per symbol, tried first next time
+_price_source_memo: Dict[str, str] = {}
+# Last good quote per symbol: symbol -> (price, time)
+_last_quotes: Dict[str, Tuple[float, datetime]] = {}
+
+# Rate limit on upstream quote requests, shared by every thread (QUOTE_RATE > 0)
+QUOTE_GOVERNOR: Optional[QuoteGovernor] = QuoteGovernor(QUOTE_RATE) if QUOTE_RATE > 0 else None
+
+# Every good quote is appended to a per-day binary journal (QUOTE_JOURNAL_DIR, see journal.py).
+# A quote service client only journals its direct-fetch fallback, to its own file, since the
+# service is writing the day's main file with its own symbol ids
+QUOTE_JOURNAL: Optional[QuoteJournal] = (
+    QuoteJournal(QUOTE_JOURNAL_DIR, suffix=f".{os.getpid()}" if QUOTE_SERVICE_URL else "")
+    if QUOTE_JOURNAL_DIR else None
+)
+
+# With QUOTE_SERVICE_URL set, quotes come from the local quote service (quote_service.py),
+# which then owns fetching, caching, the governor and the journal for every process
+QUOTE_CLIENT: Optional[QuoteClient] = QuoteClient(QUOTE_SERVICE_URL) if QUOTE_SERVICE_URL else None
+
+
+def _fetch_price_from(symbol: str, source: str) -> float:
+    """Fetch current price from one source (NaN if it has none)"""
+    if source.startswith("yfinance"):
+        import yfinance as yf
+    if source == "yfinance_sm":
+        ltp = yf.Ticker(f"{symbol}-SM.NS").fast_info['last_price']
+    elif source == "yfinance":
+        ltp = yf.Ticker(f"{symbol}.NS").fast_info['last_price']
+    else:
+        # Fallback: scrape Google Finance
+        import requests
+        from bs4 import BeautifulSoup
         url = f'https://www.google.com/finance/quote/{symbol}:NSE'
         response = requests.get(url)
         soup = BeautifulSoup(response.text, 'html.parser')
         price_element = soup.find(class_="YMlKec fxKbKc")
-        if price_element:
-            price_text = price_element.text.strip()[1:].replace(",", "")
-            return float(price_text)
-    except Exception as e:
-        logging.basicConfig(level=logging.WARNING)
-        logging.warning(f"Error fetching price for {symbol}")
+        if not price_element:
+            return np.nan
+        ltp = price_element.text.strip()[1:].replace(",", "")
+    
+    if ltp is None or float(ltp) == 0:
         return np.nan
+    return float(ltp)
+
+
+def _quotes_from_service(symbols: List[str], priority: int) -> Optional[Dict[str, float]]:
+    """Quotes from the quote service, or None when it is not configured or not reachable"""
+    if QUOTE_CLIENT is None or not QUOTE_CLIENT.available:
+        return None
+    try:
+        prices = QUOTE_CLIENT.prices(symbols, priority)
+    except QuoteServiceUnavailable as e:
+        logger.warning("Quote service unavailable, fetching directly for %.0fs: %s", RETRY_SECONDS, e)
+        return None
+    quoted_at = now_ist()
+    for symbol, price in prices.items():
+        if not np.isnan(price):
+            _last_quotes[symbol] = (price, quoted_at)
+    return prices
+
+
+def get_current_price(symbol: str, priority: int = PRIORITY_EXIT) -> float:
+    """Current price - from the quote service when one is configured and up, else fetched here"""
+    prices = _quotes_from_service([symbol], priority)
+    if prices is not None:
+        return prices[symbol]
+    return fetch_quote(symbol, priority)
+
+
+def fetch_quote(symbol: str, priority: int = PRIORITY_EXIT) -> float:
+    """
+    Fetch current price upstream (yfinance SME listing, yfinance main board, then Google Finance).
+    Each source request takes a QUOTE_GOVERNOR token at the given priority; a deferred
+    request gives up with NaN, as if every source had failed.
+    """
+    preferred = _price_source_memo.get(symbol)
+    sources = PRICE_SOURCES
+    if preferred:
+        # Start with whichever source worked last time for this symbol
+        sources = (preferred,) + tuple(source for source in PRICE_SOURCES if source != preferred)
+    
+    for source in sources:
+        if QUOTE_GOVERNOR is not None and not QUOTE_GOVERNOR.acquire(priority):
+            return np.nan
+        try:
+            with timed("trader_quote_seconds", source=source):
+                price = _fetch_price_from(symbol, source)
+        except Exception:
+            inc("trader_quotes_total", source=source, result="error")
+            logger.warning("Error fetching price for %s from %s", symbol, source,
+                           extra={"symbol": symbol, "source": source})
+            continue  # Continue to next attempt
         
+        if not np.isnan(price):
+            inc("trader_quotes_total", source=source, result="hit")
+            _price_source_memo[symbol] = source
+            quoted_at = now_ist()
+            _last_quotes[symbol] = (price, quoted_at)
+            if QUOTE_JOURNAL is not None:
+                QUOTE_JOURNAL.record(symbol, price, PRICE_SOURCES.index(source), quoted_at)
+            return price
+        inc("trader_quotes_total", source=source, result="miss")
+    
+    return np.nan
+
+
+def close_quote_journal():
+    """Flush and close today's quote journal files (reopened by the next quote)"""
+    if QUOTE_JOURNAL is not None:
+        QUOTE_JOURNAL.close()
+
+
+def get_price_cache_state() -> dict:
+    """Copy of the in-memory quote caches (price-source memo and last quotes)"""
+    return {
+        "price_sources": dict(_price_source_memo),
+        "last_quotes": dict(_last_quotes),
+    }
+
+
+def restore_price_cache_state(state: dict):
+    """Reload quote caches saved by get_price_cache_state"""
+    _price_source_memo.update(state.get("price_sources", {}))
+    _last_quotes.update(state.get("last_quotes", {}))
+
+
+def fetch_prices(symbols: Iterable[str], priority: int = PRIORITY_EXIT) -> Dict[str, float]:
+    """Fetch current prices for a set of symbols, one quote per distinct symbol"""
+    symbols = list(dict.fromkeys(symbols))
+    # One batched request, which the quote service fetches concurrently
+    prices = _quotes_from_service(symbols, priority) if symbols else None
+    if prices is not None:
+        return prices
+    return {symbol: get_current_price(symbol, priority) for symbol in symbols}
+
+
+def fetch_prices_within(symbols: Iterable[str], deadline_seconds: float,
+                        priority: int = PRIORITY_EXIT) -> Dict[str, float]:
+    """
+    Fetch prices for many symbols concurrently on the I/O pool, without waiting past the deadline.
+    
+    Returns:
+        Dict of symbol -> price for the symbols answered in time (NaN where every source failed)
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    
+    executor = _get_io_executor()
+    futures = {executor.submit(get_current_price, symbol, priority): symbol for symbol in symbols}
+    done, pending = wait(futures, timeout=deadline_seconds)
+    for future in pending:
+        future.cancel()
+    if pending:
+        logger.warning("Price fetch deadline hit, %d/%d symbols unpriced", len(pending), len(symbols))
+    return {futures[future]: future.result() for future in done if future.exception() is None}
+
+
+def _price_for(symbol: str, prices: Optional[Dict[str, float]]) -> float:
+    """Look up a pre-fetched price, or fetch it live when no prices were supplied"""
+    if prices is None:
+        return get_current_price(symbol)
+    return prices.get(symbol, np.nan)
 
 
 # ============= DATABASE FUNCTIONS =============
 
+def _timed_db(func):
+    """Record each call's duration (and failures) under the function's name"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            with timed("trader_db_seconds", op=func.__name__):
+                return func(*args, **kwargs)
+        except Exception:
+            inc("trader_db_errors_total", op=func.__name__)
+            raise
+    return wrapper
+
+
 def get_db_connection():
     """Create and return a database connection"""
     return psycopg2.connect(**DB_CONFIG)
 
 
+@_timed_db
 def init_db():
     """Initialize database tables if they don't exist"""
     conn = get_db_connection()
@@ -128,9 +376,11 @@ def init_db():
             entry_time TIMESTAMP,
             exit_time TIMESTAMP,
             exit_price DECIMAL(10, 2),
-            pnl_pct DECIMAL(10, 2)
+            pnl_pct DECIMAL(10, 2),
+            strategy VARCHAR(50) NOT NULL DEFAULT 'default'
         )
     """)
+    cursor.execute("ALTER TABLE trades ADD COLUMN IF NOT EXISTS strategy VARCHAR(50) NOT NULL DEFAULT 'default'")
     
     # Create daily_pnl table
     cursor.execute("""
@@ -143,13 +393,80 @@ def init_db():
     # Create watchlist table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS watchlist (
-            symbol VARCHAR(50) PRIMARY KEY,
+            strategy VARCHAR(50) NOT NULL DEFAULT 'default',
+            symbol VARCHAR(50),
             price_change_pct DECIMAL(10, 2),
             volume_ratio DECIMAL(10, 2),
             high_price_last DECIMAL(10, 2),
             close_price_last DECIMAL(10, 2),
             close_price_previous DECIMAL(10, 2),
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (strategy, symbol)
+        )
+    """)
+    
+    # Migrate single-strategy watchlists (keyed on symbol alone) to (strategy, symbol)
+    cursor.execute("ALTER TABLE watchlist ADD COLUMN IF NOT EXISTS strategy VARCHAR(50) NOT NULL DEFAULT 'default'")
+    cursor.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (
+                SELECT 1 FROM information_schema.key_column_usage
+                WHERE table_name = 'watchlist' AND constraint_name = 'watchlist_pkey'
+                AND column_name = 'strategy'
+            ) THEN
+                ALTER TABLE watchlist DROP CONSTRAINT IF EXISTS watchlist_pkey;
+                ALTER TABLE watchlist ADD PRIMARY KEY (strategy, symbol);
+            END IF;
+        END $$;
+    """)
+    
+    # Trade history is read newest-first in keyset pages over closed trades
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS trades_closed_exit_idx
+        ON trades (exit_time DESC, id DESC) WHERE is_open = FALSE
+    """)
+    
+    # Closed trades past the retention window move here (see archive_closed_trades),
+    # one partition per exit month, so the hot trades table stays small
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS trades_archive (
+            id INTEGER NOT NULL,
+            symbol VARCHAR(50),
+            entry_price DECIMAL(10, 2),
+            qty INTEGER,
+            max_profit_pct DECIMAL(10, 2),
+            is_open BOOLEAN,
+            exit_reason TEXT,
+            entry_time TIMESTAMP,
+            exit_time TIMESTAMP NOT NULL,
+            exit_price DECIMAL(10, 2),
+            pnl_pct DECIMAL(10, 2),
+            strategy VARCHAR(50) NOT NULL DEFAULT 'default',
+            PRIMARY KEY (id, exit_time)
+        ) PARTITION BY RANGE (exit_time)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS trades_archive_exit_idx ON trades_archive (exit_time DESC, id DESC)")
+    # Every trade, hot or archived - what the history, by-date and P&L queries read
+    cursor.execute(f"""
+        CREATE OR REPLACE VIEW trades_all AS
+        SELECT {TRADE_TABLE_COLUMNS} FROM trades
+        UNION ALL
+        SELECT {TRADE_TABLE_COLUMNS} FROM trades_archive
+    """)
+    
+    # Latest marks of open positions, replaced by the trader every exit-monitor tick
+    # so the dashboard never has to fetch quotes itself
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS live_marks (
+            trade_id INTEGER PRIMARY KEY,
+            symbol VARCHAR(50),
+            strategy VARCHAR(50),
+            current_price DECIMAL(10, 2),
+            pnl_abs DECIMAL(12, 2),
+            pnl_pct DECIMAL(10, 2),
+            max_profit_pct DECIMAL(10, 2),
+            marked_at TIMESTAMP
         )
     """)
     
@@ -159,18 +476,20 @@ def init_db():
     print("Database initialized successfully")
 
 
-def clear_watchlist():
-    """Clear the watchlist table"""
+@_timed_db
+def clear_watchlist(strategy: str = DEFAULT_STRATEGY):
+    """Clear a strategy's rows from the watchlist table"""
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("DELETE FROM watchlist")
+    cursor.execute("DELETE FROM watchlist WHERE strategy = %s", (strategy,))
     conn.commit()
     cursor.close()
     conn.close()
 
 
-def save_watchlist(watchlist_df: pd.DataFrame):
-    """Save watchlist to database"""
+@_timed_db
+def save_watchlist(watchlist_df: pd.DataFrame, strategy: str = DEFAULT_STRATEGY):
+    """Save a strategy's watchlist to database"""
     if watchlist_df.empty:
         return
         
@@ -178,13 +497,14 @@ def save_watchlist(watchlist_df: pd.DataFrame):
     cursor = conn.cursor()
     
     # Clear existing watchlist first
-    cursor.execute("DELETE FROM watchlist")
+    cursor.execute("DELETE FROM watchlist WHERE strategy = %s", (strategy,))
     
     for _, row in watchlist_df.iterrows():
         cursor.execute("""
-            INSERT INTO watchlist (symbol, price_change_pct, volume_ratio, high_price_last, close_price_last, close_price_previous)
-            VALUES (%s, %s, %s, %s, %s, %s)
+            INSERT INTO watchlist (strategy, symbol, price_change_pct, volume_ratio, high_price_last, close_price_last, close_price_previous)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
         """, (
+            strategy,
             row["SYMBOL"],
             row["price_change_pct"],
             row["volume_ratio"],
@@ -198,12 +518,13 @@ def save_watchlist(watchlist_df: pd.DataFrame):
     conn.close()
 
 
-def get_watchlist_date():
-    """Get the creation date of the current watchlist"""
+@_timed_db
+def get_watchlist_date(strategy: str = DEFAULT_STRATEGY):
+    """Get the creation date of a strategy's current watchlist"""
     try:
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT created_at FROM watchlist LIMIT 1")
+        cursor.execute("SELECT created_at FROM watchlist WHERE strategy = %s LIMIT 1", (strategy,))
         row = cursor.fetchone()
         cursor.close()
         conn.close()
@@ -213,12 +534,13 @@ def get_watchlist_date():
             return row[0].date()
         return None
     except Exception as e:
-        print(f"Error checking watchlist date: {e}")
+        logger.error("Error checking watchlist date: %s", e)
         return None
 
 
-def get_watchlist_from_db() -> pd.DataFrame:
-    """Retrieve watchlist from database"""
+@_timed_db
+def get_watchlist_from_db(strategy: str = DEFAULT_STRATEGY) -> pd.DataFrame:
+    """Retrieve a strategy's watchlist from database"""
     conn = get_db_connection()
     
     query = """
@@ -230,13 +552,15 @@ def get_watchlist_from_db() -> pd.DataFrame:
             close_price_last as "CLOSE_PRICE_last",
             close_price_previous as "CLOSE_PRICE_previous"
         FROM watchlist
+        WHERE strategy = %s
     """
     
-    df = pd.read_sql_query(query, conn)
+    df = pd.read_sql_query(query, conn, params=(strategy,))
     conn.close()
     return df
 
 
+@_timed_db
 def save_trade(trade: dict) -> Optional[int]:
     """Save a new trade to database"""
     conn = get_db_connection()
@@ -248,8 +572,8 @@ def save_trade(trade: dict) -> Optional[int]:
     
     cursor.execute("""
         INSERT INTO trades (symbol, entry_price, qty, max_profit_pct, is_open, exit_reason, 
-                           entry_time, exit_time, exit_price, pnl_pct)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                           entry_time, exit_time, exit_price, pnl_pct, strategy)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING id
     """, (
         trade["SYMBOL"],
@@ -262,6 +586,7 @@ def save_trade(trade: dict) -> Optional[int]:
         exit_time_str,
         trade["exit_price"],
         trade["pnl_pct"],
+        trade.get("strategy", DEFAULT_STRATEGY),
     ))
     
     trade_id = cursor.fetchone()[0]
@@ -271,11 +596,8 @@ def save_trade(trade: dict) -> Optional[int]:
     return trade_id
 
 
-def update_trade(trade: dict):
-    """Update an existing trade in database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def _exit_fields(trade: dict) -> Tuple:
+    """A trade's (exit_time, exit_price) in DB form - NaN/NaT become NULL"""
     # Convert datetime to string if it's a datetime object
     exit_time_str = trade["exit_time"]
     if isinstance(exit_time_str, datetime):
@@ -287,7 +609,16 @@ def update_trade(trade: dict):
     exit_price = trade["exit_price"]
     if pd.isna(exit_price):
         exit_price = None
+    return exit_time_str, exit_price
+
+
+@_timed_db
+def update_trade(trade: dict):
+    """Update an existing trade in database"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
     
+    exit_time_str, exit_price = _exit_fields(trade)
     cursor.execute("""
         UPDATE trades
         SET is_open = %s, exit_reason = %s, exit_time = %s, exit_price = %s, 
@@ -308,8 +639,79 @@ def update_trade(trade: dict):
     conn.close()
 
 
-def get_open_trades() -> pd.DataFrame:
-    """Retrieve all open trades from database"""
+@_timed_db
+def close_trades(trades: List[dict]):
+    """Close many trades in one statement and one transaction - all of them or none"""
+    if not trades:
+        return
+    columns = ([], [], [], [], [], [])
+    for trade in trades:
+        exit_time_str, exit_price = _exit_fields(trade)
+        for column, value in zip(columns, (int(trade["id"]), trade["exit_reason"], exit_time_str, exit_price,
+                                           float(trade["pnl_pct"]), float(trade["max_profit_pct"]))):
+            column.append(value)
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    # Trades already closed (e.g. by an earlier pass) are left as they are
+    cursor.execute("""
+        UPDATE trades AS t
+        SET is_open = FALSE, exit_reason = v.exit_reason, exit_time = v.exit_time,
+            exit_price = v.exit_price, pnl_pct = v.pnl_pct, max_profit_pct = v.max_profit_pct
+        FROM unnest(%s::int[], %s::text[], %s::timestamp[], %s::numeric[], %s::numeric[], %s::numeric[])
+             AS v(id, exit_reason, exit_time, exit_price, pnl_pct, max_profit_pct)
+        WHERE t.id = v.id AND t.is_open
+    """, columns)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+@_timed_db
+def archive_closed_trades(retention_days: int, current_time: datetime = None) -> int:
+    """
+    Move trades closed more than retention_days ago from trades into trades_archive,
+    creating its monthly partitions as needed, in one transaction. Queries that read
+    trades_all see the same trades before and after.
+    
+    Returns:
+        Number of trades archived
+    """
+    if current_time is None:
+        current_time = now_ist()
+    cutoff = (current_time - timedelta(days=retention_days)).strftime("%Y-%m-%d")
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT DISTINCT date_trunc('month', exit_time)::date
+        FROM trades WHERE is_open = FALSE AND exit_time < %s
+    """, (cutoff,))
+    for (month,) in cursor.fetchall():
+        next_month = (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS trades_archive_{month:%Y%m} PARTITION OF trades_archive
+            FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{next_month:%Y-%m-%d}')
+        """)
+    cursor.execute(f"""
+        WITH moved AS (
+            DELETE FROM trades
+            WHERE is_open = FALSE AND exit_time < %s
+            RETURNING {TRADE_TABLE_COLUMNS}
+        )
+        INSERT INTO trades_archive ({TRADE_TABLE_COLUMNS})
+        SELECT {TRADE_TABLE_COLUMNS} FROM moved
+    """, (cutoff,))
+    archived = cursor.rowcount
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return archived
+
+
+@_timed_db
+def get_open_trades(strategy: Optional[str] = None) -> pd.DataFrame:
+    """Retrieve open trades from database (all strategies unless one is given)"""
     conn = get_db_connection()
     
     query = """
@@ -326,12 +728,17 @@ def get_open_trades() -> pd.DataFrame:
             exit_price,
             pnl_pct,
             NULL as current_price,
-            0 as pnl_abs
+            0 as pnl_abs,
+            strategy
         FROM trades 
         WHERE is_open = TRUE
     """
+    params = ()
+    if strategy is not None:
+        query += " AND strategy = %s"
+        params = (strategy,)
     
-    df = pd.read_sql_query(query, conn)
+    df = pd.read_sql_query(query, conn, params=params)
     if not df.empty:
         df['is_open'] = df['is_open'].astype(bool)
     
@@ -339,8 +746,9 @@ def get_open_trades() -> pd.DataFrame:
     return df
 
 
-def get_trades_by_date(selected_date: str) -> pd.DataFrame:
-    """Retrieve all closed trades for a specific date"""
+@_timed_db
+def get_trades_by_date(selected_date: str, strategy: Optional[str] = None) -> pd.DataFrame:
+    """Retrieve all closed trades for a specific date (all strategies unless one is given)"""
     conn = get_db_connection()
     
     query = """
@@ -354,18 +762,150 @@ def get_trades_by_date(selected_date: str) -> pd.DataFrame:
             exit_reason,
             entry_time,
             exit_time,
-            (exit_price - entry_price) * qty as profit_abs
-        FROM trades 
+            (exit_price - entry_price) * qty as profit_abs,
+            strategy
+        FROM trades_all 
         WHERE is_open = FALSE 
         AND DATE(exit_time) = %s
-        ORDER BY exit_time
     """
+    params = (selected_date,)
+    if strategy is not None:
+        query += " AND strategy = %s"
+        params += (strategy,)
+    query += " ORDER BY exit_time"
     
-    df = pd.read_sql_query(query, conn, params=(selected_date,))
+    df = pd.read_sql_query(query, conn, params=params)
     conn.close()
     return df
 
 
+# Rows per page of the trade history explorer
+TRADE_HISTORY_PAGE_SIZE = 100
+
+
+def _trade_history_filter(start_date, end_date, symbol: Optional[str] = None,
+                          exit_reason: Optional[str] = None, strategy: Optional[str] = None) -> Tuple[str, dict]:
+    """WHERE clause and params shared by the trade history page and summary queries"""
+    where = "is_open = FALSE AND exit_time >= %(start_date)s AND exit_time < %(end_date)s::date + 1"
+    params = {"start_date": start_date, "end_date": end_date}
+    if symbol:
+        where += " AND symbol = %(symbol)s"
+        params["symbol"] = symbol.upper()
+    if exit_reason:
+        where += " AND exit_reason = %(exit_reason)s"
+        params["exit_reason"] = exit_reason
+    if strategy is not None:
+        where += " AND strategy = %(strategy)s"
+        params["strategy"] = strategy
+    return where, params
+
+
+@_timed_db
+def get_trade_history(start_date, end_date, symbol: Optional[str] = None,
+                      exit_reason: Optional[str] = None, strategy: Optional[str] = None,
+                      after: Optional[Tuple[datetime, int]] = None,
+                      page_size: int = TRADE_HISTORY_PAGE_SIZE) -> pd.DataFrame:
+    """
+    One page of closed trades in an inclusive date range, newest exit first.
+    
+    Args:
+        after: keyset cursor (exit_time, id) of the last row of the previous page;
+               None for the first page (see trade_history_cursor)
+    
+    Returns:
+        Up to page_size rows with the get_trades_by_date columns plus id
+    """
+    where, params = _trade_history_filter(start_date, end_date, symbol, exit_reason, strategy)
+    if after is not None:
+        where += " AND (exit_time, id) < (%(after_time)s, %(after_id)s)"
+        params["after_time"], params["after_id"] = after
+    params["page_size"] = page_size
+    
+    query = f"""
+        SELECT 
+            id,
+            symbol as "SYMBOL",
+            entry_price,
+            exit_price,
+            qty,
+            pnl_pct,
+            max_profit_pct,
+            exit_reason,
+            entry_time,
+            exit_time,
+            (exit_price - entry_price) * qty as profit_abs,
+            strategy
+        FROM trades_all
+        WHERE {where}
+        ORDER BY exit_time DESC, id DESC
+        LIMIT %(page_size)s
+    """
+    
+    conn = get_db_connection()
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+
+def trade_history_cursor(page: pd.DataFrame, page_size: int = TRADE_HISTORY_PAGE_SIZE) -> Optional[Tuple[datetime, int]]:
+    """Cursor for the page after this one, or None if this was the last page"""
+    if len(page) < page_size:
+        return None
+    last = page.iloc[-1]
+    return last["exit_time"].to_pydatetime(), int(last["id"])
+
+
+@_timed_db
+def get_trade_history_summary(start_date, end_date, symbol: Optional[str] = None,
+                              exit_reason: Optional[str] = None, strategy: Optional[str] = None) -> Dict[str, float]:
+    """
+    Summary of every closed trade matching the trade history filters, computed in SQL.
+    
+    Returns:
+        Dict with trades, winners, losers, win_rate (%) and total_profit
+    """
+    where, params = _trade_history_filter(start_date, end_date, symbol, exit_reason, strategy)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT COUNT(*),
+               COUNT(*) FILTER (WHERE exit_price > entry_price),
+               COUNT(*) FILTER (WHERE exit_price < entry_price),
+               COALESCE(SUM((exit_price - entry_price) * qty), 0)
+        FROM trades_all
+        WHERE {where}
+    """, params)
+    trades, winners, losers, total_profit = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return {
+        "trades": trades,
+        "winners": winners,
+        "losers": losers,
+        "win_rate": winners / trades * 100 if trades else 0.0,
+        "total_profit": float(total_profit),
+    }
+
+
+@_timed_db
+def get_exit_reasons() -> List[str]:
+    """Distinct exit reasons of closed trades, for filtering the trade history"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT DISTINCT exit_reason FROM trades_all WHERE is_open = FALSE AND exit_reason <> '' ORDER BY 1")
+    reasons = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    conn.close()
+    return reasons
+
+
+def get_traded_symbols(current_time: datetime, strategy: Optional[str] = None) -> set:
+    """Symbols with a trade closed on current_time's date"""
+    closed_trades = get_trades_by_date(current_time.strftime("%Y-%m-%d"), strategy)
+    return set(closed_trades["SYMBOL"].values) if not closed_trades.empty else set()
+
+
+@_timed_db
 def save_daily_pnl(date: str, total_pnl: float):
     """Save or update daily P&L"""
     conn = get_db_connection()
@@ -383,6 +923,7 @@ def save_daily_pnl(date: str, total_pnl: float):
     conn.close()
 
 
+@_timed_db
 def get_pnl_history() -> pd.DataFrame:
     """Get historical P&L data"""
     conn = get_db_connection()
@@ -393,6 +934,77 @@ def get_pnl_history() -> pd.DataFrame:
     return df
 
 
+# date_trunc units accepted by get_pnl_rollup
+PNL_PERIODS = ("week", "month", "year")
+
+
+@_timed_db
+def get_pnl_rollup(period: str, start_date=None, end_date=None) -> pd.DataFrame:
+    """
+    Roll daily P&L and closed trades up by week, month or year in SQL.
+    
+    Args:
+        period: 'week', 'month' or 'year'
+        start_date, end_date: optional inclusive date range
+    
+    Returns:
+        One row per period (oldest first): period_start, total_pnl, trading_days,
+        winning_days, losing_days, win_rate (% of days), best_day, worst_day,
+        trades, winning_trades, losing_trades
+    """
+    if period not in PNL_PERIODS:
+        raise ValueError(f"period must be one of {PNL_PERIODS}, got {period!r}")
+    
+    day_filter, trade_filter = "", ""
+    params = {"period": period, "start_date": start_date, "end_date": end_date}
+    if start_date is not None:
+        day_filter += " AND date >= %(start_date)s"
+        trade_filter += " AND exit_time >= %(start_date)s"
+    if end_date is not None:
+        day_filter += " AND date <= %(end_date)s"
+        trade_filter += " AND exit_time < %(end_date)s::date + 1"
+    
+    query = f"""
+        WITH days AS (
+            SELECT date_trunc(%(period)s, date)::date AS period_start,
+                   SUM(total_pnl) AS total_pnl,
+                   COUNT(*) AS trading_days,
+                   COUNT(*) FILTER (WHERE total_pnl > 0) AS winning_days,
+                   COUNT(*) FILTER (WHERE total_pnl < 0) AS losing_days,
+                   MAX(total_pnl) AS best_day,
+                   MIN(total_pnl) AS worst_day
+            FROM daily_pnl
+            WHERE TRUE {day_filter}
+            GROUP BY 1
+        ),
+        closed AS (
+            SELECT date_trunc(%(period)s, exit_time)::date AS period_start,
+                   COUNT(*) AS trades,
+                   COUNT(*) FILTER (WHERE exit_price > entry_price) AS winning_trades,
+                   COUNT(*) FILTER (WHERE exit_price < entry_price) AS losing_trades
+            FROM trades_all
+            WHERE is_open = FALSE {trade_filter}
+            GROUP BY 1
+        )
+        SELECT days.period_start, days.total_pnl, days.trading_days,
+               days.winning_days, days.losing_days,
+               ROUND(100.0 * days.winning_days / days.trading_days, 1) AS win_rate,
+               days.best_day, days.worst_day,
+               COALESCE(closed.trades, 0) AS trades,
+               COALESCE(closed.winning_trades, 0) AS winning_trades,
+               COALESCE(closed.losing_trades, 0) AS losing_trades
+        FROM days
+        LEFT JOIN closed USING (period_start)
+        ORDER BY days.period_start
+    """
+    
+    conn = get_db_connection()
+    df = pd.read_sql_query(query, conn, params=params)
+    conn.close()
+    return df
+
+
+@_timed_db
 def get_cumulative_pnl() -> float:
     """Calculate cumulative P&L from all historical data"""
     conn = get_db_connection()
@@ -405,10 +1017,185 @@ def get_cumulative_pnl() -> float:
     return cumulative
 
 
+@_timed_db
+def publish_live_marks(positions: pd.DataFrame):
+    """Replace the live_marks snapshot with the marks of the open positions, in one transaction"""
+    rows = []
+    if not positions.empty:
+        marked_at = now_ist().strftime("%Y-%m-%d %H:%M:%S")
+        open_positions = positions[positions["is_open"].astype(bool)]
+        for pos in open_positions.itertuples(index=False):
+            rows.append((
+                int(pos.id), pos.SYMBOL, getattr(pos, "strategy", DEFAULT_STRATEGY),
+                float(pos.current_price), float(pos.pnl_abs), float(pos.pnl_pct),
+                float(pos.max_profit_pct), marked_at
+            ))
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM live_marks")
+    if rows:
+        execute_values(cursor, """
+            INSERT INTO live_marks (trade_id, symbol, strategy, current_price, pnl_abs,
+                                    pnl_pct, max_profit_pct, marked_at)
+            VALUES %s
+        """, rows)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+@_timed_db
+def get_live_marks() -> pd.DataFrame:
+    """Latest marks published by the trader, one row per open trade"""
+    conn = get_db_connection()
+    df = pd.read_sql_query("""
+        SELECT trade_id as id, current_price, pnl_abs, pnl_pct, max_profit_pct, marked_at
+        FROM live_marks
+    """, conn)
+    conn.close()
+    return df
+
+
+@_timed_db
+def get_daily_pnl(date: str) -> float:
+    """Saved P&L for one day (0 if none saved yet)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT total_pnl FROM daily_pnl WHERE date = %s", (date,))
+    result = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return float(result[0]) if result and result[0] is not None else 0.0
+
+
+@_timed_db
+def get_data_versions() -> Dict[str, str]:
+    """
+    Cheap fingerprints of the trades, watchlist and daily_pnl tables, in one round trip.
+    A fingerprint changes whenever rows are added, closed or replaced, so readers can
+    cache results per version instead of re-querying.
+    
+    Returns:
+        Dict of table name -> version string
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT
+            (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) || ':' || COUNT(*) FILTER (WHERE is_open)
+                    || ':' || COALESCE(MAX(exit_time)::text, '') FROM trades),
+            (SELECT COUNT(*) || ':' || COALESCE(MAX(created_at)::text, '') FROM watchlist),
+            (SELECT COUNT(*) || ':' || COALESCE(SUM(total_pnl), 0) FROM daily_pnl)
+    """)
+    trades, watchlist, daily_pnl = cursor.fetchone()
+    cursor.close()
+    conn.close()
+    return {"trades": trades, "watchlist": watchlist, "daily_pnl": daily_pnl}
+
+
 # ============= TRADING LOGIC FUNCTIONS =============
 
+class TradeEvent:
+    """
+    One entry/exit outcome: the readable message, plus the fields (symbol,
+    exit_reason, price, ...) the trader passes to the JSON log with `extra=`
+    """
+    
+    def __init__(self, message: str, **fields):
+        self.message = message
+        self.fields = {name: value for name, value in fields.items() if value is not None}
+    
+    def __str__(self) -> str:
+        return self.message
+    
+    def __repr__(self) -> str:
+        return f"TradeEvent({self.message!r}, {self.fields!r})"
+
+
+def _exit_event(message: str, pos: pd.Series, exit_reason: str, price: float, pnl_pct: float) -> TradeEvent:
+    return TradeEvent(message, event="exit", symbol=pos["SYMBOL"], strategy=pos.get("strategy"),
+                      exit_reason=exit_reason, price=float(price), pnl_pct=round(float(pnl_pct), 2))
+
+
+def add_screen_metrics(data_merged: pd.DataFrame) -> pd.DataFrame:
+    """Add price_change_pct and volume_ratio to a bhavcopy merged on SYMBOL (_last/_previous)"""
+    data_merged["price_change_pct"] = (
+        (data_merged[" CLOSE_PRICE_last"] - data_merged[" CLOSE_PRICE_previous"]) / 
+        data_merged[" CLOSE_PRICE_previous"] * 100.0
+    )
+    data_merged["volume_ratio"] = (
+        data_merged[" TTL_TRD_QNTY_last"] / data_merged[" TTL_TRD_QNTY_previous"]
+    )
+    return data_merged
+
+
+def screen_mask(data_merged: pd.DataFrame, price_change_threshold: float,
+                volume_ratio_threshold: float) -> pd.Series:
+    """
+    Watchlist screening rule on merged bhavcopy metrics:
+    1. Price change >= Threshold
+    2. Volume ratio >= Threshold
+    3. Bullish candle: Close > Open
+    """
+    return (
+        (data_merged["price_change_pct"] >= price_change_threshold) &
+        (data_merged["volume_ratio"] >= volume_ratio_threshold) &
+        (data_merged[" CLOSE_PRICE_last"] > data_merged[" OPEN_PRICE_last"])
+    )
+
+
+def entry_triggered(price: float, last_day_close: float,
+                    entry_buffer_pct: float = ENTRY_BUFFER_PCT) -> bool:
+    """Entry rule: a valid price above the previous close plus the entry buffer"""
+    if price is None or np.isnan(price) or price <= 0.0:
+        return False
+    return price > last_day_close * (1 + entry_buffer_pct / 100.0)
+
+
+def breakout_triggered(completed_closes: np.ndarray, prev_day_high: float) -> bool:
+    """Breakout rule: the last finished 1-minute bar closed above the previous day's high"""
+    if len(completed_closes) == 0 or prev_day_high is None or not prev_day_high > 0:
+        return False
+    return completed_closes[-1] > prev_day_high
+
+
+def exit_reason_for(pnl_pct: float, max_profit_pct: float,
+                    stop_loss_pct: float = STOP_LOSS_PCT,
+                    trail_stop_pct: float = TRAIL_STOP_PCT) -> Optional[str]:
+    """Exit rules: returns the exit reason if the position should close, else None"""
+    # Exit condition 1: Stop loss
+    if pnl_pct <= -stop_loss_pct:
+        return f"Stop Loss -{stop_loss_pct:g}%"
+    # Exit condition 2: Trailing stop - if profit drops from peak
+    if max_profit_pct > 0 and (max_profit_pct - pnl_pct >= trail_stop_pct):
+        return f"Trail {trail_stop_pct:g}% from peak"
+    return None
+
+
+def _fallback_price(pos: pd.Series) -> float:
+    """Last known price of a position when no fresh quote is available"""
+    current_price = pos.get("current_price")
+    if current_price is None or pd.isna(current_price) or current_price <= 0:
+        return pos["entry_price"]
+    return current_price
+
+
+def _last_mark(pos: pd.Series) -> float:
+    """Last known mark of a position: its current price, else the last good quote, else entry price"""
+    current_price = pos.get("current_price")
+    if (current_price is None or pd.isna(current_price) or current_price <= 0) and pos["SYMBOL"] in _last_quotes:
+        return _last_quotes[pos["SYMBOL"]][0]
+    return _fallback_price(pos)
+
+
 def open_positions_for_watchlist(watchlist: pd.DataFrame, positions: pd.DataFrame, 
-                                 capital_per_trade: float = 10000.0) -> Tuple[pd.DataFrame, List[str]]:
+                                 capital_per_trade: float = 10000.0,
+                                 prices: Optional[Dict[str, float]] = None,
+                                 strategy: str = DEFAULT_STRATEGY,
+                                 max_new_capital: Optional[float] = None,
+                                 traded_today: Optional[set] = None,
+                                 bars=None, require_breakout: bool = False) -> Tuple[pd.DataFrame, List[str]]:
     """
     Open new positions from the watchlist if entry conditions are met.
     
@@ -416,9 +1203,18 @@ def open_positions_for_watchlist(watchlist: pd.DataFrame, positions: pd.DataFram
     1. Entry price must be > 1.01 * Previous Day's Close (1% higher)
     2. Time must be after 9:20 AM (no entries in first 5 minutes)
     3. Time must be before 3:15 PM (no new entries near close)
+    4. With require_breakout, the last finished 1-minute bar in `bars` (a
+       bars.BarStore) must have closed above the previous day's high
+    
+    If prices is given (symbol -> price), those quotes are used instead of
+    fetching live; symbols missing from it are skipped this round.
+    New trades are tagged with `strategy`; positions should hold only that strategy's trades.
+    If max_new_capital is given, entries stop once that much capital has been committed.
+    traded_today is the set of symbols this strategy already traded today; it is
+    loaded from the DB when not given, and updated in place with new entries.
     
     Returns:
-        Tuple of (updated positions DataFrame, list of messages)
+        Tuple of (updated positions DataFrame, list of TradeEvents)
     """
     messages = []
     now = now_ist()
@@ -428,38 +1224,48 @@ def open_positions_for_watchlist(watchlist: pd.DataFrame, positions: pd.DataFram
     exit_cutoff_time = now.replace(hour=15, minute=15, second=0, microsecond=0)
     
     if now < entry_time:
-        messages.append(f"⏰ Waiting for 9:20 AM to start entries (Current: {now.strftime('%H:%M:%S')})")
+        messages.append(TradeEvent(f"⏰ Waiting for 9:20 AM to start entries (Current: {now.strftime('%H:%M:%S')})"))
         return positions, messages
         
     if now >= exit_cutoff_time:
-        messages.append(f"⏰ Market closing soon (3:15 PM), no new entries allowed.")
+        messages.append(TradeEvent("⏰ Market closing soon (3:15 PM), no new entries allowed."))
         return positions, messages
     
+    # Symbols already traded today (closed positions) - prevents re-entry after exit
+    if traded_today is None:
+        traded_today = get_traded_symbols(now, strategy)
+    
+    capital_left = max_new_capital
+    
     for _, row in watchlist.iterrows():
         symbol = row["SYMBOL"]
         last_day_close = row.get("CLOSE_PRICE_last", 0)
-        lower_bound = last_day_close * 1.01
-        #upper_bound = last_day_close * 1.03
 
         # Skip if already in positions (Open positions)
         if not positions.empty and symbol in positions["SYMBOL"].values:
             continue
 
         # Check if we already traded this symbol today (Closed positions)
-        # This prevents re-entry after exit
-        today_str = now.strftime("%Y-%m-%d")
-        closed_trades = get_trades_by_date(today_str)
-        if not closed_trades.empty and symbol in closed_trades["SYMBOL"].values:
+        if symbol in traded_today:
             continue
 
-        entry_price = get_current_price(symbol)
+        if require_breakout:
+            closes = bars.completed_closes(symbol, now) if bars is not None else np.empty(0)
+            if not breakout_triggered(closes, row.get("HIGH_PRICE_last")):
+                continue
 
-        if np.isnan(entry_price) or entry_price <= 0.0:
-            continue
+        entry_price = _price_for(symbol, prices)
 
-        # Entry logic: entry price > last day's close and < 1.03 * last day's close
-        if entry_price > lower_bound: # and entry_price < upper_bound:
+        # Entry logic: entry price > 1.01 * last day's close
+        if entry_triggered(entry_price, last_day_close):
             qty = max(1, int(capital_per_trade // entry_price))
+            
+            # Global capital cap
+            if capital_left is not None:
+                if entry_price * qty > capital_left:
+                    messages.append(TradeEvent(f"💰 Capital cap reached, skipping {symbol}", event="skip",
+                                               symbol=symbol, strategy=strategy, price=float(entry_price)))
+                    continue
             new_pos = {
                 "SYMBOL": symbol,
                 "entry_price": entry_price,
@@ -473,6 +1279,7 @@ def open_positions_for_watchlist(watchlist: pd.DataFrame, positions: pd.DataFram
                 "pnl_pct": 0.0,
                 "current_price": entry_price,
                 "pnl_abs": 0.0,
+                "strategy": strategy,
             }
 
             try:
@@ -480,21 +1287,31 @@ def open_positions_for_watchlist(watchlist: pd.DataFrame, positions: pd.DataFram
                 if trade_id:
                     new_pos["id"] = trade_id
                     positions = pd.concat([positions, pd.DataFrame([new_pos])], ignore_index=True)
-                    messages.append(f"✅ Opened position: {symbol} @ ₹{entry_price:.2f}, Qty: {qty}")
+                    traded_today.add(symbol)
+                    if capital_left is not None:
+                        capital_left -= entry_price * qty
+                    messages.append(TradeEvent(f"✅ Opened position: {symbol} @ ₹{entry_price:.2f}, Qty: {qty}",
+                                               event="entry", symbol=symbol, strategy=strategy,
+                                               price=float(entry_price), qty=int(qty)))
             except Exception as e:
-                messages.append(f"❌ Error saving trade for {symbol}: {e}")
+                messages.append(TradeEvent(f"❌ Error saving trade for {symbol}: {e}", event="error",
+                                           symbol=symbol, strategy=strategy))
     
     return positions, messages
 
 
-def update_positions_and_apply_exits(positions: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+def update_positions_and_apply_exits(positions: pd.DataFrame,
+                                     prices: Optional[Dict[str, float]] = None) -> Tuple[pd.DataFrame, List[str]]:
     """
     Update positions with current prices and apply exit conditions:
     - Stop loss at -2%
     - Trailing stop at 10% drawdown from peak profit
     
+    If prices is given, those quotes are used instead of fetching live;
+    positions missing from it keep their last known price.
+    
     Returns:
-        Tuple of (updated positions DataFrame, list of messages)
+        Tuple of (updated positions DataFrame, list of TradeEvents)
     """
     messages = []
     now = now_ist()
@@ -505,9 +1322,9 @@ def update_positions_and_apply_exits(positions: pd.DataFrame) -> Tuple[pd.DataFr
     rows = []
     for _, pos in positions.iterrows():
         if pos["is_open"]:
-            current_price = get_current_price(pos["SYMBOL"])
+            current_price = _price_for(pos["SYMBOL"], prices)
             if np.isnan(current_price) or current_price <= 0:
-                current_price = pos.get("current_price", pos["entry_price"])
+                current_price = _fallback_price(pos)
             
             pnl_pct = (current_price - pos["entry_price"]) / pos["entry_price"] * 100.0
             position_pnl = (current_price - pos["entry_price"]) * pos["qty"]
@@ -524,25 +1341,19 @@ def update_positions_and_apply_exits(positions: pd.DataFrame) -> Tuple[pd.DataFr
                 "max_profit_pct": max_profit_pct
             })
             
-            # Exit condition 1: Stop loss at -2%
-            if pnl_pct <= -2.0:
+            exit_reason = exit_reason_for(pnl_pct, max_profit_pct)
+            if exit_reason:
                 pos_dict.update({
                     "is_open": False,
-                    "exit_reason": "Stop Loss -2%",
+                    "exit_reason": exit_reason,
                     "exit_time": now_ist(),
                     "exit_price": current_price
                 })
-                messages.append(f"🛑 Stop Loss: {pos['SYMBOL']} @ ₹{current_price:.2f}, P&L: {pnl_pct:.2f}%")
-            
-            # Exit condition 2: Trailing stop - if profit drops 2% from peak
-            elif max_profit_pct > 0 and (max_profit_pct - pnl_pct >= 2.0):
-                pos_dict.update({
-                    "is_open": False,
-                    "exit_reason": "Trail 2% from peak",
-                    "exit_time": now_ist(),
-                    "exit_price": current_price
-                })
-                messages.append(f"📉 Trailing Stop: {pos['SYMBOL']} @ ₹{current_price:.2f}, Peak: {max_profit_pct:.2f}%, Current: {pnl_pct:.2f}%")
+                if exit_reason.startswith("Stop Loss"):
+                    message = f"🛑 Stop Loss: {pos['SYMBOL']} @ ₹{current_price:.2f}, P&L: {pnl_pct:.2f}%"
+                else:
+                    message = f"📉 Trailing Stop: {pos['SYMBOL']} @ ₹{current_price:.2f}, Peak: {max_profit_pct:.2f}%, Current: {pnl_pct:.2f}%"
+                messages.append(_exit_event(message, pos, exit_reason, current_price, pnl_pct))
             
             # Update database if position was closed OR if max_profit_pct increased
             if "id" in pos_dict and pos_dict["id"]:
@@ -560,26 +1371,38 @@ def update_positions_and_apply_exits(positions: pd.DataFrame) -> Tuple[pd.DataFr
     return positions, messages
 
 
-def force_eod_exit(positions: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+def force_eod_exit(positions: pd.DataFrame,
+                   prices: Optional[Dict[str, float]] = None,
+                   deadline_seconds: float = EOD_QUOTE_DEADLINE_SECONDS) -> Tuple[pd.DataFrame, List[str]]:
     """
     Close all open positions at end of day (3:15 PM)
     
+    If prices is given, those quotes are used; otherwise every open position is quoted
+    concurrently, for at most deadline_seconds. Positions left unpriced close at their
+    last known mark, and all closes are written in one transaction.
+    
     Returns:
-        Tuple of (updated positions DataFrame, list of messages)
+        Tuple of (updated positions DataFrame, list of TradeEvents)
     """
     messages = []
     now = now_ist()
-    close_dt = now.replace(hour=MARKET_CLOSE_HOUR, minute=MARKET_CLOSE_MINUTE, second=0, microsecond=0)
     
-    if now < close_dt:
+    if not is_eod_exit_time(now) or positions.empty or not positions["is_open"].any():
         return positions, messages
     
+    started = time.perf_counter()
+    if prices is None:
+        prices = fetch_prices_within(positions.loc[positions["is_open"].astype(bool), "SYMBOL"], deadline_seconds)
+    
     rows = []
+    closing = []
+    at_last_mark = 0
     for _, pos in positions.iterrows():
         if pos["is_open"]:
-            current_price = get_current_price(pos["SYMBOL"])
+            current_price = _price_for(pos["SYMBOL"], prices)
             if np.isnan(current_price) or current_price <= 0:
-                current_price = pos.get("current_price", pos["entry_price"])
+                current_price = _last_mark(pos)
+                at_last_mark += 1
             
             pnl_pct = (current_price - pos["entry_price"]) / pos["entry_price"] * 100.0
             position_pnl = (current_price - pos["entry_price"]) * pos["qty"]
@@ -596,17 +1419,24 @@ def force_eod_exit(positions: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
             })
             
             if "id" in pos_dict and pos_dict["id"]:
-                update_trade(pos_dict)
+                closing.append(pos_dict)
             
-            messages.append(f"🌙 EOD Exit: {pos['SYMBOL']} @ ₹{current_price:.2f}, P&L: {pnl_pct:.2f}%")
+            messages.append(_exit_event(f"🌙 EOD Exit: {pos['SYMBOL']} @ ₹{current_price:.2f}, P&L: {pnl_pct:.2f}%",
+                                        pos, "EOD Exit", current_price, pnl_pct))
             rows.append(pos_dict)
         else:
             rows.append(pos.to_dict())
     
+    close_trades(closing)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info("🌙 EOD exit priced and closed %d positions in %.0f ms (%d at last mark)", len(messages), elapsed_ms,
+                at_last_mark, extra={"phase": "exit", "latency_ms": round(elapsed_ms, 1)})
+    
     positions = pd.DataFrame(rows)
     return positions, messages
 
 
+@_timed_db
 def calculate_and_save_daily_pnl(current_time: datetime = None) -> float:
     """
     Calculate and save total daily P&L from all closed trades today
@@ -625,7 +1455,7 @@ def calculate_and_save_daily_pnl(current_time: datetime = None) -> float:
     # Get all trades that were closed today
     cursor.execute("""
         SELECT SUM((exit_price - entry_price) * qty) as total_pnl
-        FROM trades
+        FROM trades_all
         WHERE is_open = FALSE
         AND DATE(exit_time) = %s
     """, (today_date,))
@@ -642,6 +1472,76 @@ def calculate_and_save_daily_pnl(current_time: datetime = None) -> float:
     return total_pnl
 
 
+# ============= ASYNC FUNCTIONS =============
+# Coroutine wrappers used by the async engine mode. The blocking quote and DB
+# calls above run on a dedicated thread pool so many can be in flight at once
+# from a single event loop; the sync functions stay usable as-is.
+
+_io_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _get_io_executor() -> ThreadPoolExecutor:
+    """Shared thread pool for blocking I/O issued from coroutines"""
+    global _io_executor
+    if _io_executor is None:
+        _io_executor = ThreadPoolExecutor(max_workers=QUOTE_CONCURRENCY + 4, thread_name_prefix="engine-io")
+    return _io_executor
+
+
+async def run_blocking(func, *args, semaphore: Optional[asyncio.Semaphore] = None, **kwargs):
+    """Run a blocking function on the I/O pool, optionally bounded by a semaphore"""
+    loop = asyncio.get_running_loop()
+    call = functools.partial(func, *args, **kwargs)
+    if semaphore is None:
+        return await loop.run_in_executor(_get_io_executor(), call)
+    async with semaphore:
+        return await loop.run_in_executor(_get_io_executor(), call)
+
+
+async def get_current_price_async(symbol: str, semaphore: Optional[asyncio.Semaphore] = None,
+                                  timeout: float = QUOTE_TIMEOUT_SECONDS) -> float:
+    """Fetch current price without blocking the event loop; NaN on timeout"""
+    try:
+        return await asyncio.wait_for(run_blocking(get_current_price, symbol, semaphore=semaphore), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Timed out fetching price for %s", symbol, extra={"symbol": symbol})
+        return np.nan
+
+
+async def fetch_prices_async(symbols: Iterable[str], concurrency: int = QUOTE_CONCURRENCY,
+                             timeout: float = QUOTE_TIMEOUT_SECONDS,
+                             priority: int = PRIORITY_EXIT) -> Dict[str, float]:
+    """
+    Fetch prices for many symbols concurrently.
+    
+    At most `concurrency` fetches are in flight at once and the whole batch is
+    cancelled after `timeout` seconds; symbols not priced by then are left out.
+    
+    Returns:
+        Dict of symbol -> price (NaN where every source failed)
+    """
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        return {}
+    
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = {
+        asyncio.ensure_future(run_blocking(get_current_price, symbol, priority, semaphore=semaphore)): symbol
+        for symbol in symbols
+    }
+    done, pending = await asyncio.wait(tasks, timeout=timeout)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning("Price fetch deadline hit, %d/%d symbols unpriced", len(pending), len(symbols))
+    
+    prices = {}
+    for task in done:
+        if not task.cancelled() and task.exception() is None:
+            prices[tasks[task]] = task.result()
+    return prices
+
+
 if __name__ == "__main__":
     # Test database connection
     print("Testing database connection...")